@@ -0,0 +1,374 @@
+from elasticsearch import AsyncElasticsearch, ConflictError, Elasticsearch
+from concurrent.futures import Future
+from collections import deque
+from typing import Callable
+import iDataStore as interface
+import indexManager
+import serializer
+import dataStore
+import threading
+import functools
+import callLog
+import metrics
+import asyncio
+import logging
+import json
+import time
+
+"""Set up module-level logger."""
+logger = logging.getLogger(__name__)
+#logger.setLevel(logging.DEBUG)
+
+class AsyncDataStore(interface.IDataStore):
+    """
+    Implementation of the IDataStore interface sending _bulk requests through the asyncio Elasticsearch client,
+    keeping up to max_in_flight requests running at the same time.
+
+    The client lives on a private event loop running in a background thread, so the store is used from
+    synchronous code like DataStore. When max_in_flight requests are pending, the next request blocks the
+    producer until one of them completes (backpressure). flush() and close() wait for the requests in the
+    order they were sent. The first request that failed is raised from every later call into the store,
+    close() included, so rows whose request was lost are never reported as flushed.
+    """
+
+    def __init__(self, elasticsearch_address: str, index_name: str, bulk_max_docs: int = 500,
+                 bulk_max_bytes: int = 5 * 1024 * 1024, max_in_flight: int = 4,
+                 serializer_backend: str = 'template', write_mode: str = 'create', index_rotate: str = 'none',
+                 index_mapping: dict | None = None, index_template: str | None = None, ingest_mode: bool = False) -> None:
+        """
+        Initialize the AsyncDataStore instance and connect to Elasticsearch.
+
+        Args:
+            elasticsearch_address (str): URL to the Elasticsearch instance.
+            index_name (str): Name of the Elasticsearch index.
+            bulk_max_docs (int): Number of buffered documents that triggers a _bulk request.
+            bulk_max_bytes (int): Size in bytes of the buffered _bulk payload that triggers a request.
+            max_in_flight (int): Maximum number of _bulk requests running concurrently.
+            serializer_backend (str): Backend of the NDJSON serializer used for batches: 'template' or 'orjson'.
+            write_mode (str): 'create', 'upsert' or 'append', see DataStore.
+            index_rotate (str): 'none', 'day' or 'month' time-based indices, see DataStore.
+            index_mapping (dict | None): Mapping of the time-based indices created on demand.
+            index_template (str | None): Existing index template the time-based indices are created from instead.
+            ingest_mode (bool): Disable refreshes and replicas of the indices written to for the duration
+                of the run, restoring their settings on close.
+
+        Attributes:
+            failed_documents (int): Number of documents rejected by Elasticsearch.
+            duplicate_documents (int): Number of documents already indexed, in 'create' mode.
+            backpressure_seconds (float): Time the producer spent waiting for a free request slot.
+
+        Raises:
+            ConnectionError: If connection to Elasticsearch fails.
+            ValueError: If the index name is invalid or missing, max_in_flight is lower than 1,
+                or the serializer backend, write mode or index rotation is unknown.
+        """
+        logger.info("Initializing AsyncDataStore...")
+        if not index_name or not dataStore.validate_index_name(index_name):
+            error_msg: str = f"Invalid or missing index name: {index_name}. Must be lowercase and not contain special characters."
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+        if max_in_flight < 1:
+            error_msg: str = f"Invalid max_in_flight: {max_in_flight}. Must be at least 1."
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+        if write_mode not in dataStore.DataStore.WRITE_MODES:
+            error_msg: str = f"Invalid write mode: {write_mode}. Must be one of {tuple(dataStore.DataStore.WRITE_MODES)}."
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+        self.index_name: str = index_name
+        self.write_mode: str = write_mode
+        self.bulk_action: bytes = dataStore.DataStore.WRITE_MODES[write_mode]
+        self.index_exists: bool = False
+        self.bulk_max_docs: int = bulk_max_docs
+        self.bulk_max_bytes: int = bulk_max_bytes
+        self.max_in_flight: int = max_in_flight
+        self.failed_documents: int = 0
+        self.duplicate_documents: int = 0
+        self.backpressure_seconds: float = 0.0
+        self.serializer = serializer.NdjsonSerializer(serializer_backend)
+        self.router = indexManager.IndexRouter(index_name, index_rotate)
+        self.es = None
+        self.indices: indexManager.IndexManager | None = None
+        self.__bulk_buffer: list[bytes] = []
+        self.__bulk_buffer_docs: int = 0
+        self.__bulk_buffer_bytes: int = 0
+        self.__window = threading.BoundedSemaphore(max_in_flight)
+        self.__in_flight: deque[Future] = deque()
+        self.__failure: BaseException | None = None
+        self.__loop = asyncio.new_event_loop()
+        self.__thread = threading.Thread(target=self.__loop.run_forever, name="async-datastore", daemon=True)
+        self.__thread.start()
+
+        try:
+            health = self.__run(self.__connect(elasticsearch_address))
+            logger.info(
+                f"Connected to Elasticsearch. Cluster status: {health['status']}")
+            # Index management is rare and synchronous, so it goes through a client of its own.
+            self.indices = indexManager.IndexManager(Elasticsearch(elasticsearch_address, verify_certs=False),
+                                                     self.router, index_mapping, index_template, ingest_mode)
+            if index_rotate != 'none':
+                # Time-based indices are created on demand.
+                self.index_exists = True
+            else:
+                response = self.__run(self.es.indices.exists(index=self.index_name))
+                self.index_exists = response.meta.status == 200
+        except Exception as e:
+            if self.es:
+                self.__run(self.es.close())
+            if self.indices:
+                self.indices.es.close()
+            self.__stop_loop()
+            error_msg = f"Failed to connect to Elasticsearch at {elasticsearch_address}: {e}"
+            logger.exception(error_msg)
+            raise ConnectionError(error_msg)
+
+    def create_mapping(self, mapping: dict) -> None:
+        """
+        Creates a new Elasticsearch index with the specified mapping.
+
+        Args:
+            mapping (dict): A dictionary defining the index mapping schema.
+
+        Raises:
+            ValueError: If index creation fails.
+        """
+        try:
+            self.__run(self.es.indices.create(index=self.index_name, body=mapping))
+            self.index_exists = True
+            logger.info(f"Index '{self.index_name}' created.")
+        except Exception as e:
+            error_msg = f"Failed to create index '{self.index_name}': {e}"
+            logger.exception(error_msg)
+            raise ValueError(error_msg)
+
+    def insert(self, json_log) -> None:
+        """
+        Index a single JSON-formatted log entry, sharing the request window with the _bulk requests.
+
+        Args:
+            json_log (str): A JSON-formatted string representing a call log entry.
+
+        Raises:
+            elasticsearch.ElasticsearchException: If an earlier request failed.
+        """
+        index_name = self.router.index_of_json(json.loads(json_log)['timestamp'])
+        self.indices.prepare([index_name])
+        if self.write_mode == 'append':
+            self.__submit(lambda: self.es.index(index=index_name, body=json_log), 1)
+        else:
+            self.__submit(lambda: self.__index(index_name, json_log), 1)
+
+    def insert_many(self, json_logs: list[str]) -> None:
+        """
+        Buffer a batch of JSON-formatted log entries for the Elasticsearch _bulk API.
+
+        A _bulk request is started as soon as the buffer reaches bulk_max_docs documents
+        or bulk_max_bytes bytes; call flush() to send what is left and wait for all requests.
+
+        Args:
+            json_logs (list[str]): JSON-formatted strings representing call log entries.
+
+        Raises:
+            elasticsearch.ElasticsearchException: If an earlier request failed.
+        """
+        for json_log in json_logs:
+            action, index_name = dataStore.bulk_action_line(self.bulk_action, json_log, self.router)
+            self.indices.prepare([index_name or self.index_name])
+            self.__buffer_bulk(action + json_log.encode('utf-8') + b"\n", 1)
+
+    def insert_batch(self, batch: callLog.CallLogBatch) -> None:
+        """
+        Render a CallLogBatch into a _bulk body and buffer it.
+
+        Args:
+            batch (CallLogBatch): The call logs to insert.
+
+        Raises:
+            elasticsearch.ElasticsearchException: If an earlier request failed.
+        """
+        with metrics.SERIALIZE_SECONDS.time():
+            payload = self.batch_renderer()(batch)
+        self.insert_rendered(payload, len(batch))
+
+    def batch_renderer(self) -> Callable[[callLog.CallLogBatch], tuple[bytes, bytes | None, list[str]]]:
+        """
+        Returns:
+            Callable[[CallLogBatch], tuple[bytes, bytes | None, list[str]]]: dataStore.render_batch bound to
+                the serializer, the _bulk action line and the index router.
+        """
+        return functools.partial(dataStore.render_batch, self.serializer, self.bulk_action,
+                                 self.router if self.router.rotate != 'none' else None, None)
+
+    def insert_rendered(self, payload: tuple[bytes, bytes | None, list[str]], documents: int) -> None:
+        """
+        Buffer a batch rendered by batch_renderer(), creating the indices it is routed to first;
+        the NDJSON export payload is ignored.
+
+        Args:
+            payload (tuple[bytes, bytes | None, list[str]]): The NDJSON export payload, the _bulk body
+                and the indices it writes to.
+            documents (int): Number of call logs in the payload.
+
+        Raises:
+            elasticsearch.ElasticsearchException: If an earlier request failed.
+        """
+        _, bulk, index_names = payload
+        if bulk:
+            self.indices.prepare(index_names or [self.index_name])
+            self.__buffer_bulk(bulk, documents)
+
+    def flush(self) -> None:
+        """
+        Send the documents still buffered and wait until every request in flight has completed,
+        in the order they were sent.
+
+        Raises:
+            elasticsearch.ElasticsearchException: If a request failed.
+        """
+        if self.__bulk_buffer:
+            self.__send_bulk()
+        while self.__in_flight:
+            self.__in_flight.popleft().exception()
+        self.__raise_failure()
+
+    def close(self) -> None:
+        """
+        Flush the buffered documents and wait for the requests in flight, then restore the settings
+        of the indices in ingest mode, close the Elasticsearch clients and stop the event loop.
+
+        Raises:
+            elasticsearch.ElasticsearchException: If a request failed, once everything is released.
+        """
+        try:
+            self.flush()
+        finally:
+            while self.__in_flight:
+                self.__in_flight.popleft().exception()
+            if self.indices:
+                self.indices.restore()
+                self.indices.es.close()
+                self.indices = None
+            if self.es:
+                self.__run(self.es.close())
+                self.es = None
+            self.__stop_loop()
+            if self.duplicate_documents:
+                logger.info(f"{self.duplicate_documents} documents were already indexed and left unchanged")
+            if self.backpressure_seconds:
+                logger.info(f"Producer waited {self.backpressure_seconds:.2f}s for free _bulk request slots")
+
+    async def __connect(self, elasticsearch_address: str) -> dict:
+        """
+        Create the client on the event loop thread and check the cluster health.
+
+        Returns:
+            dict: The cluster health response.
+        """
+        self.es = AsyncElasticsearch(elasticsearch_address, verify_certs=False)
+        return await self.es.cluster.health()
+
+    def __buffer_bulk(self, payload: bytes, documents: int) -> None:
+        """
+        Append action/document lines to the _bulk buffer and start a request once a threshold is reached.
+
+        Args:
+            payload (bytes): NDJSON action and document lines, newline terminated.
+            documents (int): Number of documents in the payload.
+        """
+        self.__raise_failure()
+        self.__bulk_buffer.append(payload)
+        self.__bulk_buffer_docs += documents
+        self.__bulk_buffer_bytes += len(payload)
+        if (self.__bulk_buffer_docs >= self.bulk_max_docs
+                or self.__bulk_buffer_bytes >= self.bulk_max_bytes):
+            self.__send_bulk()
+
+    def __send_bulk(self) -> None:
+        """
+        Start a _bulk request with the buffered documents and empty the buffer.
+        """
+        payload = b"".join(self.__bulk_buffer)
+        documents = self.__bulk_buffer_docs
+        self.__bulk_buffer = []
+        self.__bulk_buffer_docs = 0
+        self.__bulk_buffer_bytes = 0
+        self.__submit(lambda: self.__bulk(payload, documents), documents)
+
+    def __submit(self, request, documents: int) -> None:
+        """
+        Schedule a request on the event loop once a slot of the window is free.
+
+        Args:
+            request (Callable[[], Coroutine]): Builds the coroutine performing the request.
+            documents (int): Number of documents in the request.
+        """
+        self.__raise_failure()
+        if not self.__window.acquire(blocking=False):
+            waiting_since = time.perf_counter()
+            self.__window.acquire()
+            self.backpressure_seconds += time.perf_counter() - waiting_since
+            logger.debug(f"Waited for a free request slot ({self.max_in_flight} requests in flight)")
+        future = asyncio.run_coroutine_threadsafe(request(), self.__loop)
+        future.add_done_callback(self.__request_done)
+        self.__in_flight.append(future)
+        while self.__in_flight and self.__in_flight[0].done():
+            self.__in_flight.popleft()
+        self.__raise_failure()
+
+    async def __bulk(self, payload: bytes, documents: int) -> None:
+        """
+        Send a _bulk request and report the items that failed.
+        """
+        started = time.perf_counter()
+        response = await self.es.bulk(operations=payload, index=self.index_name)
+        metrics.BULK_SECONDS.observe(time.perf_counter() - started)
+        metrics.BULK_DOCUMENTS.inc(documents)
+        metrics.BULK_BYTES.inc(len(payload))
+        if response['errors']:
+            failed, duplicates = dataStore.report_bulk_errors(response['items'], self.failed_documents)
+            self.failed_documents += failed
+            self.duplicate_documents += duplicates
+            metrics.BULK_FAILED.inc(failed)
+            metrics.BULK_DUPLICATES.inc(duplicates)
+        logger.debug(f"Bulk request of {documents} documents completed in {response['took']} ms")
+
+    async def __index(self, index_name: str, json_log: str) -> None:
+        """
+        Index a single document under its uniqueCallReference, counting a conflict in 'create' mode as a duplicate.
+        """
+        try:
+            await self.es.index(index=index_name, body=json_log, id=dataStore.reference_of(json_log),
+                                op_type='create' if self.write_mode == 'create' else 'index')
+        except ConflictError:
+            self.duplicate_documents += 1
+
+    def __request_done(self, future: Future) -> None:
+        """
+        Free the slot of a completed request and keep the first failure to raise it in the producer.
+        """
+        self.__window.release()
+        if not future.cancelled() and future.exception() is not None and self.__failure is None:
+            self.__failure = future.exception()
+            logger.error(f"Elasticsearch request failed: {self.__failure}")
+
+    def __raise_failure(self) -> None:
+        """
+        Raise the first failed request; it stays recorded, so every later call raises it again.
+        """
+        if self.__failure is not None:
+            raise self.__failure
+
+    def __run(self, coroutine):
+        """
+        Run a coroutine on the event loop and wait for its result.
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, self.__loop).result()
+
+    def __stop_loop(self) -> None:
+        """
+        Stop the event loop and wait for its thread to exit.
+        """
+        if self.__loop.is_running():
+            self.__loop.call_soon_threadsafe(self.__loop.stop)
+            self.__thread.join()
+        self.__loop.close()
@@ -0,0 +1,58 @@
+from pathlib import Path
+import tempfile
+import argparse
+import logging
+import time
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import fakeElasticsearch
+import asyncDataStore
+import decoderBench
+import dataStore
+import loader
+
+"""Set up module-level logger."""
+logger = logging.getLogger(__name__)
+
+def measure(store, batches: list) -> float:
+    """
+    Insert the batches into a store and close it.
+
+    Returns:
+        float: Rows per second, including the final flush.
+    """
+    rows = sum(len(batch) for batch in batches)
+    start = time.perf_counter()
+    with store:
+        for batch in batches:
+            store.insert_batch(batch)
+    return rows / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="[%(levelname)s] - %(name)s: %(message)s")
+    parser = argparse.ArgumentParser(description="Compare DataStore with AsyncDataStore against a fake Elasticsearch with latency.")
+    parser.add_argument("--rows", type=int, default=50_000, help="number of rows in the sample file")
+    parser.add_argument("--bulk-docs", type=int, default=500, help="documents per _bulk request")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="latency of every request to the fake server")
+    parser.add_argument("--in-flight", type=int, nargs="+", default=[1, 2, 4, 8], help="windows of AsyncDataStore to measure")
+    parser.add_argument("--seed", type=int, default=42, help="seed of the sample data")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        sample = Path(folder) / "2025-01-01T10.00_logs.csv"
+        decoderBench.write_sample_file(sample, args.rows, args.seed)
+        batches = list(loader.CsvFileReader(sample).batches(args.bulk_docs))
+
+    with fakeElasticsearch.FakeElasticsearch(latency=args.latency_ms / 1000) as server:
+        rate = measure(dataStore.DataStore(None, server.address, "bench_sync", args.bulk_docs), batches)
+        logger.info(f"DataStore:                    {rate:,.0f} rows/s")
+        for in_flight in args.in_flight:
+            server.max_concurrent = 0
+            rate = measure(asyncDataStore.AsyncDataStore(
+                server.address, f"bench_async_{in_flight}", args.bulk_docs, max_in_flight=in_flight), batches)
+            logger.info(f"AsyncDataStore, {in_flight:>2} in flight: {rate:,.0f} rows/s "
+                        f"(server saw {server.max_concurrent} concurrent requests)")
+        logger.info(f"Documents received: {sum(server.documents.values()):,}")
@@ -0,0 +1,237 @@
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Callable
+from pathlib import Path
+import subprocess
+import tempfile
+import platform
+import argparse
+import logging
+import random
+import json
+import time
+import uuid
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src_logs_Generator')))
+import fakeElasticsearch
+import sqliteDataStore
+import asyncDataStore
+import dataStore
+import shortuuid
+import metrics
+import vectorLogs
+import loader
+import main
+import call
+
+"""Set up module-level logger."""
+logger = logging.getLogger(__name__)
+
+DATASET_MANIFEST: str = "dataset.json"
+
+def write_dataset(folder: Path, number_of_rows: int, number_of_files: int, seed: int, vectorized: bool = False) -> None:
+    """
+    Write a reproducible dataset of hourly CSV files with the generator's Call model.
+
+    The same seed always gives the same files: timestamps, participants and statuses come from
+    the seeded random module, and the uniqueCallReference is built from it instead of shortuuid.uuid().
+
+    Args:
+        folder (Path): Destination folder, created if missing.
+        number_of_rows (int): Number of data rows, spread evenly over the files.
+        number_of_files (int): Number of files, one per hour starting at 2025-01-01T00:00.
+        seed (int): Seed of the random generator.
+        vectorized (bool): Use the NumPy generator, with the same distributions, for large datasets.
+    """
+    random.seed(seed)
+    folder.mkdir(parents=True, exist_ok=True)
+    first_hour = datetime(2025, 1, 1)
+    for file_number in range(number_of_files):
+        starting_hour = first_hour + timedelta(hours=file_number)
+        rows = number_of_rows // number_of_files + (file_number < number_of_rows % number_of_files)
+        file_path = folder / f"{starting_hour.strftime('%Y-%m-%dT%H.00')}_logs.csv"
+        if vectorized:
+            vectorLogs.write_log_file(file_path, starting_hour, timedelta(hours=1), rows, [seed, file_number])
+            continue
+        with open(file_path, 'w', newline='') as file:
+            file.write("timestamp,caller,receiver,duration,status,uniqueCallReference\n")
+            for offset in sorted(random.randint(0, 3599) for _ in range(rows)):
+                log = call.Call((starting_hour + timedelta(seconds=offset)).strftime("%Y-%m-%dT%H:%M:%S"))
+                log.uniqueCallReference = shortuuid.encode(uuid.UUID(int=random.getrandbits(128), version=4))
+                file.write(f"{log}\n")
+        logger.debug(f"Generated dataset file: {file_path}")
+
+def prepare_dataset(folder: Path, number_of_rows: int, number_of_files: int, seed: int, vectorized: bool = False) -> dict:
+    """
+    Reuse the dataset in folder if it was generated with the same parameters, otherwise regenerate it.
+
+    Returns:
+        dict: The dataset parameters and its size in bytes.
+    """
+    parameters = {"rows": number_of_rows, "files": number_of_files, "seed": seed,
+                  "generator": "vectorized" if vectorized else "call"}
+    manifest_path = folder / DATASET_MANIFEST
+    if manifest_path.is_file():
+        dataset = json.loads(manifest_path.read_text())
+        if {key: dataset.get(key) for key in parameters} == parameters:
+            logger.info(f"Reusing dataset in {folder}")
+            return dataset
+    for csv_file in folder.glob('*.csv'):
+        csv_file.unlink()
+    logger.info(f"Generating {number_of_rows:,} rows in {number_of_files} files into {folder}...")
+    start = time.perf_counter()
+    write_dataset(folder, number_of_rows, number_of_files, seed, vectorized)
+    logger.info(f"Dataset generated in {time.perf_counter() - start:.1f}s")
+    dataset = {**parameters, "bytes": sum(csv_file.stat().st_size for csv_file in folder.glob('*.csv'))}
+    manifest_path.write_text(json.dumps(dataset))
+    return dataset
+
+def measure(run: Callable[[], int], repeat: int, size: int = 0) -> dict:
+    """
+    Run a benchmark several times and report its fastest run.
+
+    Args:
+        run (Callable[[], int]): Performs the work and returns the number of rows handled.
+        repeat (int): Number of runs.
+        size (int): Number of input bytes handled by a run, for the bytes/s figure.
+
+    Returns:
+        dict: Rows, seconds, rows/s and bytes/s of the fastest run, with the metrics it recorded.
+    """
+    best: dict | None = None
+    for _ in range(repeat):
+        metrics.REGISTRY.reset()
+        start = time.perf_counter()
+        rows = run()
+        seconds = time.perf_counter() - start
+        if best is None or seconds < best["seconds"]:
+            best = {"rows": rows, "seconds": seconds, "rows_per_second": rows / seconds,
+                    "bytes_per_second": size / seconds, "metrics": metrics.REGISTRY.snapshot()}
+    return best
+
+def bench_loader(folder: Path) -> int:
+    """
+    Iterate over CallLogLoader.load_csv_files().
+    """
+    return sum(1 for _ in loader.CallLogLoader(str(folder)).load_csv_files())
+
+def bench_to_json(logs: list) -> int:
+    """
+    Serialize CallLog instances one by one with CallLog.to_json().
+    """
+    for log in logs:
+        log.to_json()
+    return len(logs)
+
+def bench_sink(folder: Path, open_store: Callable[[], object], chunk_size: int) -> int:
+    """
+    Run process_logs end to end, from the CSV files to a freshly opened store.
+    """
+    with open_store() as db:
+        return main.process_logs(loader.CallLogLoader(str(folder)), db, sys.maxsize, chunk_size)
+
+def git_commit() -> str | None:
+    """
+    Returns:
+        str | None: The commit being measured, or None outside a git checkout.
+    """
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(__file__)).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results: dict, baseline_path: Path) -> None:
+    """
+    Log the throughput of each benchmark relative to a previous results file.
+    """
+    baseline = json.loads(baseline_path.read_text())
+    logger.info(f"Compared with {baseline_path} (commit {baseline.get('commit')}):")
+    for name, result in results["benchmarks"].items():
+        previous = baseline.get("benchmarks", {}).get(name)
+        if previous:
+            ratio = result["rows_per_second"] / previous["rows_per_second"]
+            logger.info(f"  {name:<20} {ratio:6.2f}x{'  REGRESSION' if ratio < 0.95 else ''}")
+
+
+if __name__ == "__main__":
+    # Logging is configured by the main module, as for the handler itself.
+    parser = argparse.ArgumentParser(description="Time the loader, CallLog.to_json and the file and Elasticsearch sinks on a seeded dataset.")
+    parser.add_argument("--rows", type=int, default=100_000, help="number of rows in the dataset")
+    parser.add_argument("--files", type=int, default=10, help="number of hourly files the rows are spread over")
+    parser.add_argument("--seed", type=int, default=42, help="seed of the dataset and of the error injection")
+    parser.add_argument("--vectorized", action="store_true", help="generate the dataset with the NumPy generator, for millions of rows")
+    parser.add_argument("--data-dir", type=Path, default=None, help="folder keeping the dataset between runs (default: a temporary folder)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark, the fastest one is reported")
+    parser.add_argument("--json-sample", type=int, default=200_000, help="number of CallLog instances serialized by the to_json benchmark")
+    parser.add_argument("--chunk-size", type=int, default=500, help="rows per pipeline chunk and per _bulk request")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="delay added to every request to the fake Elasticsearch")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="probability of the fake Elasticsearch rejecting each document")
+    parser.add_argument("--in-flight", type=int, default=0, help="concurrent _bulk requests, 0 for the synchronous DataStore")
+    parser.add_argument("--output", type=Path, default=Path("benchmark-results.json"), help="results file")
+    parser.add_argument("--baseline", type=Path, default=None, help="previous results file to compare with")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        folder = args.data_dir or Path(scratch) / "dataset"
+        dataset = prepare_dataset(folder, args.rows, args.files, args.seed, args.vectorized)
+        results = {
+            "commit": git_commit(),
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "dataset": dataset,
+            "parameters": {"repeat": args.repeat, "chunk_size": args.chunk_size, "latency_ms": args.latency_ms,
+                           "error_rate": args.error_rate, "in_flight": args.in_flight},
+            "benchmarks": {},
+        }
+        benchmarks = results["benchmarks"]
+
+        benchmarks["loader"] = measure(lambda: bench_loader(folder), args.repeat, dataset["bytes"])
+        logs = list(islice(loader.CallLogLoader(str(folder)).load_csv_files(), args.json_sample))
+        benchmarks["to_json"] = measure(lambda: bench_to_json(logs), args.repeat)
+        del logs
+
+        export_path = Path(scratch) / "export.log"
+        def open_file_store() -> dataStore.DataStore:
+            export_path.unlink(missing_ok=True)
+            return dataStore.DataStore(str(export_path))
+        benchmarks["file_sink"] = measure(lambda: bench_sink(folder, open_file_store, args.chunk_size),
+                                          args.repeat, dataset["bytes"])
+
+        sqlite_path = Path(scratch) / "call_logs.db"
+        def open_sqlite_store() -> sqliteDataStore.SqliteDataStore:
+            for path in (sqlite_path, sqlite_path.with_name(sqlite_path.name + "-wal"),
+                         sqlite_path.with_name(sqlite_path.name + "-shm")):
+                path.unlink(missing_ok=True)
+            return sqliteDataStore.SqliteDataStore(str(sqlite_path))
+        benchmarks["sqlite_sink"] = measure(lambda: bench_sink(folder, open_sqlite_store, args.chunk_size),
+                                            args.repeat, dataset["bytes"])
+
+        with fakeElasticsearch.FakeElasticsearch(latency=args.latency_ms / 1000, error_rate=args.error_rate,
+                                                 seed=args.seed) as server:
+            runs = iter(range(args.repeat))
+            def open_elasticsearch_store() -> dataStore.DataStore | asyncDataStore.AsyncDataStore:
+                # A new index per run, so 'create' actions never conflict with the previous run.
+                index_name = f"bench_{next(runs)}"
+                if args.in_flight:
+                    return asyncDataStore.AsyncDataStore(server.address, index_name, args.chunk_size,
+                                                         max_in_flight=args.in_flight)
+                return dataStore.DataStore(None, server.address, index_name, args.chunk_size)
+            benchmarks["elasticsearch_sink"] = measure(
+                lambda: bench_sink(folder, open_elasticsearch_store, args.chunk_size), args.repeat, dataset["bytes"])
+            benchmarks["elasticsearch_sink"]["server_totals"] = {
+                "documents": sum(server.documents.values()), "rejected": server.rejected,
+                "requests": server.requests, "max_concurrent": server.max_concurrent}
+
+    for name, result in benchmarks.items():
+        logger.info(f"{name:<20} {result['rows_per_second']:>12,.0f} rows/s  {result['bytes_per_second'] / 1024 / 1024:>8.1f} MiB/s"
+                    f"  ({result['rows']:,} rows in {result['seconds']:.3f}s)")
+    args.output.write_text(json.dumps(results, indent=2) + "\n")
+    logger.info(f"Results written to: {args.output}")
+    if args.baseline:
+        compare(results, args.baseline)
@@ -0,0 +1,104 @@
+from datetime import datetime, timedelta
+from pathlib import Path
+import tempfile
+import argparse
+import logging
+import random
+import time
+import csv
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src_logs_Generator')))
+import callLog
+import loader
+import call
+
+"""Set up module-level logger."""
+logger = logging.getLogger(__name__)
+
+def write_sample_file(file_path: Path, number_of_rows: int, seed: int) -> None:
+    """
+    Write a CSV file of random call logs spread over one hour.
+
+    Args:
+        file_path (Path): Destination file.
+        number_of_rows (int): Number of data rows.
+        seed (int): Seed of the random generator.
+    """
+    random.seed(seed)
+    starting_hour = datetime(2025, 1, 1, 10)
+    offsets = sorted(random.randint(0, 3599) for _ in range(number_of_rows))
+    with open(file_path, 'w', newline='') as file:
+        file.write("timestamp,caller,receiver,duration,status,uniqueCallReference\n")
+        for offset in offsets:
+            timestamp = (starting_hour + timedelta(seconds=offset)).strftime("%Y-%m-%dT%H:%M:%S")
+            file.write(f"{call.Call(timestamp)}\n")
+
+def decode_with_dictreader(file_path: Path) -> int:
+    """
+    Reference decoder: the csv.DictReader loop the loader used before RowDecoder.
+
+    Args:
+        file_path (Path): CSV file to decode.
+
+    Returns:
+        int: Number of rows decoded.
+    """
+    rows = 0
+    with open(file_path, mode='r', encoding='utf-8') as file:
+        for row in csv.DictReader(file):
+            callLog.CallLog(
+                timestamp=datetime.fromisoformat(row['timestamp']),
+                caller=row['caller'],
+                receiver=row['receiver'],
+                duration=int(row['duration']),
+                status=row['status'],
+                uniqueCallReference=row['uniqueCallReference']
+            )
+            rows += 1
+    return rows
+
+def decode_with_row_decoder(file_path: Path) -> int:
+    """
+    Decode the file through CsvFileReader and its RowDecoder.
+
+    Args:
+        file_path (Path): CSV file to decode.
+
+    Returns:
+        int: Number of rows decoded.
+    """
+    return sum(1 for _ in loader.CsvFileReader(file_path))
+
+def measure(decode, file_path: Path, repeat: int) -> float:
+    """
+    Run a decoder several times and keep the best throughput.
+
+    Returns:
+        float: Rows per second of the fastest run.
+    """
+    best = 0.0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = decode(file_path)
+        best = max(best, rows / (time.perf_counter() - start))
+    return best
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="[%(levelname)s] - %(name)s: %(message)s")
+    parser = argparse.ArgumentParser(description="Compare csv.DictReader decoding with the loader's RowDecoder.")
+    parser.add_argument("--rows", type=int, default=200_000, help="number of rows in the sample file")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per decoder, the best one is reported")
+    parser.add_argument("--seed", type=int, default=42, help="seed of the sample data")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        sample = Path(folder) / "2025-01-01T10.00_logs.csv"
+        write_sample_file(sample, args.rows, args.seed)
+        before = measure(decode_with_dictreader, sample, args.repeat)
+        after = measure(decode_with_row_decoder, sample, args.repeat)
+    logger.info(f"csv.DictReader: {before:,.0f} rows/s")
+    logger.info(f"RowDecoder:     {after:,.0f} rows/s ({after / before:.2f}x)")
@@ -0,0 +1,330 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+import threading
+import argparse
+import fnmatch
+import logging
+import random
+import json
+import time
+
+"""Set up module-level logger."""
+logger = logging.getLogger(__name__)
+
+class FakeElasticsearch:
+    """
+    Local stand-in for an Elasticsearch node, answering the few endpoints the handler uses.
+
+    Supports GET /, GET /_cluster/health, HEAD/PUT/GET /<index>, GET/PUT /<index>/_settings,
+    POST /<index>/_refresh, HEAD/PUT /_index_template/<name>, POST [/<index>]/_bulk,
+    POST /<index>/_mget, POST /<index>/_doc and PUT /<index>/_doc/<id>. Documents are counted, not
+    stored unless store_sources is set; only their _id is kept, so 'create' actions on an existing _id conflict. Every request can be delayed by a fixed
+    latency, each bulk item or indexed document rejected with a given probability, and chosen _bulk requests failed as a whole.
+    """
+
+    def __init__(self, port: int = 0, latency: float = 0.0, error_rate: float = 0.0, seed: int | None = None,
+                 store_sources: bool = False) -> None:
+        """
+        Initialize the server; call start() to begin serving.
+
+        Args:
+            port (int): Port to listen on, 0 picks a free one.
+            latency (float): Seconds every request is delayed before answering.
+            error_rate (float): Probability of rejecting each document, between 0 and 1.
+            seed (int | None): Seed of the generator deciding which documents are rejected.
+            store_sources (bool): Keep the source of the bulk documents that have an _id, so _mget can return them.
+
+        Attributes:
+            documents (dict[str, int]): Number of documents accepted per index.
+            rejected (int): Number of documents rejected.
+            conflicts (int): Number of 'create' actions rejected because the _id exists.
+            requests (dict[str, int]): Number of requests per endpoint.
+            max_concurrent (int): Highest number of requests being served at the same time.
+            settings (dict[str, dict]): refresh_interval and number_of_replicas of each index.
+            templates (dict[str, dict]): Index templates by name.
+            sources (dict[str, dict[str, dict]]): Source of each stored document, by index and _id.
+            failing_bulks (set[int]): Numbers, from 1, of the _bulk requests answered with an HTTP 500 error
+                instead of being applied.
+            bulks (int): Number of _bulk requests received.
+        """
+        self.latency: float = latency
+        self.error_rate: float = error_rate
+        self.documents: dict[str, int] = {}
+        self.rejected: int = 0
+        self.conflicts: int = 0
+        self.__ids: dict[str, set[str]] = {}
+        self.requests: dict[str, int] = {}
+        self.max_concurrent: int = 0
+        self.settings: dict[str, dict] = {}
+        self.templates: dict[str, dict] = {}
+        self.store_sources: bool = store_sources
+        self.sources: dict[str, dict[str, dict]] = {}
+        self.failing_bulks: set[int] = set()
+        self.bulks: int = 0
+        self.__concurrent: int = 0
+        self.__random = random.Random(seed)
+        self.__lock = threading.Lock()
+        self.__server = ThreadingHTTPServer(('127.0.0.1', port), self.__handler_class())
+        self.__server.daemon_threads = True
+        self.__thread: threading.Thread | None = None
+
+    @property
+    def address(self) -> str:
+        """
+        Returns:
+            str: Base URL of the server, e.g. 'http://127.0.0.1:9200'.
+        """
+        host, port = self.__server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeElasticsearch":
+        """
+        Serve requests from a background thread.
+
+        Returns:
+            FakeElasticsearch: The server itself, for chaining.
+        """
+        self.__thread = threading.Thread(target=self.__server.serve_forever, name="fake-elasticsearch", daemon=True)
+        self.__thread.start()
+        logger.info(f"Fake Elasticsearch listening on {self.address} (latency {self.latency * 1000:.0f} ms, error rate {self.error_rate:.1%})")
+        return self
+
+    def stop(self) -> None:
+        """
+        Stop serving and release the port.
+        """
+        self.__server.shutdown()
+        self.__server.server_close()
+        if self.__thread:
+            self.__thread.join()
+
+    def __enter__(self) -> "FakeElasticsearch":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.stop()
+
+    def handle(self, method: str, path: str, body: bytes, query: dict[str, str] | None = None) -> tuple[int, dict | None]:
+        """
+        Compute the answer to a request.
+
+        Args:
+            method (str): HTTP method.
+            path (str): Request path, without query string.
+            body (bytes): Request body.
+            query (dict[str, str] | None): Query string parameters.
+
+        Returns:
+            tuple[int, dict | None]: HTTP status and JSON body (None for HEAD requests).
+        """
+        parts = [part for part in path.split('/') if part]
+        named = [part for part in parts if part.startswith('_')]
+        endpoint = f"{method} /{named[-1] if named else ('<index>' if parts else '')}"
+        with self.__lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+            self.__concurrent += 1
+            self.max_concurrent = max(self.max_concurrent, self.__concurrent)
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+            if not parts:
+                return 200, {"name": "fake", "cluster_name": "fake", "version": {"number": "8.17.1"}, "tagline": "You Know, for Search"}
+            if parts == ['_cluster', 'health']:
+                return 200, {"cluster_name": "fake", "status": "green"}
+            if parts[-1] == '_bulk':
+                with self.__lock:
+                    self.bulks += 1
+                    failing = self.bulks in self.failing_bulks
+                if failing:
+                    return 500, {"error": {"type": "internal_server_error", "reason": "injected request failure"}, "status": 500}
+                return 200, self.__bulk(parts[0] if len(parts) > 1 else None, body)
+            if len(parts) in (2, 3) and parts[1] in ('_doc', '_create'):
+                operation = 'create' if parts[1] == '_create' or (query or {}).get('op_type') == 'create' else 'index'
+                result = self.__write(parts[0], operation, parts[2] if len(parts) == 3 else None)
+                return result['status'], (result if 'error' not in result else {"error": result['error'], "status": result['status']})
+            if len(parts) == 2 and parts[0] == '_index_template':
+                return self.__template(parts[1], method, body)
+            if len(parts) == 2 and parts[1] == '_mget':
+                return 200, self.__mget(parts[0], body)
+            if len(parts) == 2 and parts[1] == '_refresh':
+                if parts[0] not in self.documents:
+                    return 404, {"error": {"type": "index_not_found_exception", "reason": parts[0]}, "status": 404}
+                return 200, {"_shards": {"total": 1, "successful": 1, "failed": 0}}
+            if len(parts) == 2 and parts[1] == '_settings':
+                return self.__settings(parts[0], method, body)
+            if len(parts) == 1:
+                return self.__index(parts[0], method, body)
+            return 404, {"error": {"type": "not_found", "reason": f"no handler for {method} {path}"}, "status": 404}
+        finally:
+            with self.__lock:
+                self.__concurrent -= 1
+
+    def __index(self, index: str, method: str, body: bytes) -> tuple[int, dict | None]:
+        """
+        Answer HEAD (exists), PUT (create) and GET on an index.
+        """
+        with self.__lock:
+            exists = index in self.documents
+            if method == 'PUT' and not exists:
+                self.documents[index] = 0
+                settings = json.loads(body or b'{}').get('settings')
+                if settings is None:
+                    settings = next((template.get('template', {}).get('settings', {})
+                                     for template in self.templates.values()
+                                     if any(fnmatch.fnmatchcase(index, pattern) for pattern in template.get('index_patterns', []))), {})
+                settings = settings.get('index', settings)
+                self.settings[index] = {"refresh_interval": "1s", "number_of_replicas": "1"}
+                self.settings[index].update({key: str(value) for key, value in settings.items()})
+        if method == 'HEAD':
+            return (200 if exists else 404), None
+        if method == 'PUT':
+            if exists:
+                return 400, {"error": {"type": "resource_already_exists_exception", "reason": index}, "status": 400}
+            return 200, {"acknowledged": True, "index": index}
+        if not exists:
+            return 404, {"error": {"type": "index_not_found_exception", "reason": index}, "status": 404}
+        return 200, {index: {"settings": {"index": self.settings.get(index, {})}}}
+
+    def __template(self, name: str, method: str, body: bytes) -> tuple[int, dict | None]:
+        """
+        Answer HEAD (exists) and PUT on an index template.
+        """
+        with self.__lock:
+            if method == 'PUT':
+                self.templates[name] = json.loads(body or b'{}')
+                return 200, {"acknowledged": True}
+            exists = name in self.templates
+        if method == 'HEAD':
+            return (200 if exists else 404), None
+        if not exists:
+            return 404, {"error": {"type": "resource_not_found_exception", "reason": name}, "status": 404}
+        return 200, {"index_templates": [{"name": name, "index_template": self.templates[name]}]}
+
+    def __settings(self, index: str, method: str, body: bytes) -> tuple[int, dict]:
+        """
+        Answer GET and PUT on the settings of an index.
+        """
+        with self.__lock:
+            if index not in self.documents:
+                return 404, {"error": {"type": "index_not_found_exception", "reason": index}, "status": 404}
+            settings = self.settings.setdefault(index, {})
+            if method == 'PUT':
+                update = json.loads(body or b'{}')
+                update = update.get('index', update)
+                settings.update({key: (str(value) if value is not None else None) for key, value in update.items()})
+                return 200, {"acknowledged": True}
+            return 200, {index: {"settings": {"index": dict(settings)}}}
+
+    def __bulk(self, default_index: str | None, body: bytes) -> dict:
+        """
+        Answer a _bulk request, accepting or rejecting each action/document pair.
+        """
+        started = time.perf_counter()
+        lines = [line for line in body.split(b'\n') if line.strip()]
+        items: list[dict] = []
+        errors = False
+        for action_line, source_line in zip(lines[0::2], lines[1::2]):
+            operation, metadata = next(iter(json.loads(action_line).items()))
+            result = self.__write(metadata.get('_index', default_index), operation, metadata.get('_id'),
+                                  source_line if self.store_sources else None)
+            errors = errors or 'error' in result
+            items.append({operation: result})
+        return {"took": int((time.perf_counter() - started) * 1000), "errors": errors, "items": items}
+
+    def __mget(self, index: str, body: bytes) -> dict:
+        """
+        Answer a _mget request by ids, from the stored sources.
+        """
+        with self.__lock:
+            sources = self.sources.get(index, {})
+            return {"docs": [{"_index": index, "_id": document_id, "found": True, "_source": sources[document_id]}
+                             if document_id in sources else {"_index": index, "_id": document_id, "found": False}
+                             for document_id in json.loads(body)["ids"]]}
+
+    def __write(self, index: str, operation: str, document_id: str | None, source: bytes | None = None) -> dict:
+        """
+        Accept or reject one document, as a bulk item result.
+        """
+        if self.__reject():
+            return {"_index": index, "_id": document_id, "status": 400,
+                    "error": {"type": "mapper_parsing_exception", "reason": "injected error"}}
+        with self.__lock:
+            ids = self.__ids.setdefault(index, set())
+            exists = document_id is not None and document_id in ids
+            if exists and operation == 'create':
+                self.conflicts += 1
+                return {"_index": index, "_id": document_id, "status": 409,
+                        "error": {"type": "version_conflict_engine_exception",
+                                  "reason": f"[{document_id}]: version conflict, document already exists"}}
+            if document_id is not None:
+                ids.add(document_id)
+                if source is not None:
+                    self.sources.setdefault(index, {})[document_id] = json.loads(source)
+            if not exists:
+                self.documents[index] = self.documents.get(index, 0) + 1
+        return {"_index": index, "_id": document_id, "status": 200 if exists else 201,
+                "result": "updated" if exists else "created"}
+
+    def __reject(self) -> bool:
+        with self.__lock:
+            if self.error_rate and self.__random.random() < self.error_rate:
+                self.rejected += 1
+                return True
+            return False
+
+    def __handler_class(self) -> type:
+        """
+        Build the request handler class bound to this server.
+        """
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def __answer(self, method: str) -> None:
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                url = urlsplit(self.path)
+                query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                status, payload = fake.handle(method, url.path, body, query)
+                data = json.dumps(payload).encode() if payload is not None else b''
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('X-Elastic-Product', 'Elasticsearch')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                if method != 'HEAD':
+                    self.wfile.write(data)
+
+            def do_GET(self) -> None:
+                self.__answer('GET')
+
+            def do_HEAD(self) -> None:
+                self.__answer('HEAD')
+
+            def do_PUT(self) -> None:
+                self.__answer('PUT')
+
+            def do_POST(self) -> None:
+                self.__answer('POST')
+
+            def log_message(self, format: str, *args) -> None:
+                logger.debug(format % args)
+
+        return Handler
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="[%(levelname)s] - %(name)s: %(message)s")
+    parser = argparse.ArgumentParser(description="Run a fake Elasticsearch node answering _bulk and index requests.")
+    parser.add_argument("--port", type=int, default=9200, help="port to listen on")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="delay added to every request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="probability of rejecting each document")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the error injection")
+    args = parser.parse_args()
+    server = FakeElasticsearch(args.port, args.latency_ms / 1000, args.error_rate, args.seed).start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,76 @@
+from datetime import datetime
+from pathlib import Path
+import tracemalloc
+import tempfile
+import argparse
+import logging
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import decoderBench
+import callLog
+import loader
+
+"""Set up module-level logger."""
+logger = logging.getLogger(__name__)
+
+class DictCallLog:
+    """
+    Reference record with a per-instance __dict__, as CallLog was before it used __slots__.
+    """
+    def __init__(self, timestamp: datetime, caller: str, receiver: str, duration: int, status: str, uniqueCallReference: str):
+        self.timestamp = timestamp
+        self.caller = caller
+        self.receiver = receiver
+        self.duration = duration
+        self.status = status
+        self.uniqueCallReference = uniqueCallReference
+
+def bytes_per_record(build) -> float:
+    """
+    Measure the memory retained by a container of records.
+
+    Args:
+        build (Callable[[], Sized]): Function building and returning the container.
+
+    Returns:
+        float: Bytes allocated per record while the container is alive.
+    """
+    tracemalloc.start()
+    container = build()
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return allocated / len(container)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="[%(levelname)s] - %(name)s: %(message)s")
+    parser = argparse.ArgumentParser(description="Measure memory per record of CallLog, its __dict__ predecessor and CallLogBatch.")
+    parser.add_argument("--rows", type=int, default=200_000, help="number of rows in the sample file")
+    parser.add_argument("--seed", type=int, default=42, help="seed of the sample data")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        sample = Path(folder) / "2025-01-01T10.00_logs.csv"
+        decoderBench.write_sample_file(sample, args.rows, args.seed)
+        # The string fields are shared by all three containers, so only the record overhead differs.
+        logs = list(loader.CsvFileReader(sample))
+
+        dict_records = bytes_per_record(lambda: [
+            DictCallLog(log.timestamp, log.caller, log.receiver, log.duration, log.status, log.uniqueCallReference)
+            for log in logs])
+        slotted_records = bytes_per_record(lambda: [
+            callLog.CallLog(log.timestamp, log.caller, log.receiver, log.duration, log.status, log.uniqueCallReference)
+            for log in logs])
+
+        def build_batch() -> callLog.CallLogBatch:
+            batch = callLog.CallLogBatch()
+            for log in logs:
+                batch.append_log(log)
+            return batch
+        batch_records = bytes_per_record(build_batch)
+
+    logger.info(f"CallLog with __dict__: {dict_records:.1f} bytes/record")
+    logger.info(f"CallLog with __slots__: {slotted_records:.1f} bytes/record")
+    logger.info(f"CallLogBatch:           {batch_records:.1f} bytes/record")
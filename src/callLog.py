@@ -1,10 +1,16 @@
-from datetime import datetime
+from datetime import datetime, timedelta
+from typing import Iterator
+from array import array
 import json
 
+EPOCH = datetime(1970, 1, 1)
+
 class CallLog:
     """
     Represents a single call log entry with metadata such as timestamp, caller, receiver, duration, status, and a unique reference.
     """
+    __slots__ = ('timestamp', 'caller', 'receiver', 'duration', 'status', 'uniqueCallReference')
+
     def __init__(self, timestamp:datetime, caller:str, receiver:str, duration:int, status:str, uniqueCallReference:str):
         """
         Initialize a CallLog instance.
@@ -47,4 +53,132 @@ class CallLog:
         Returns:
             str: JSON representation of the call log.
         """
-        return json.dumps(self.__to_dict())
\ No newline at end of file
+        return json.dumps(self.__to_dict())
+
+
+def check_timestamp(timestamp: datetime) -> None:
+    """
+    Check that a timestamp can be stored in a CallLogBatch as it is.
+
+    Raises:
+        ValueError: If the timestamp has sub-second precision or a UTC offset.
+    """
+    if timestamp.microsecond or timestamp.tzinfo is not None:
+        raise ValueError(f"timestamp {timestamp.isoformat()} has sub-second precision or a UTC offset, "
+                         f"call log batches only hold whole seconds without offset")
+
+
+class CallLogBatch:
+    """
+    Columnar container of call logs: one array or list per field instead of one CallLog object per record.
+
+    Timestamps are stored as integer seconds since the epoch, naive timestamps being taken as UTC,
+    durations as integers and statuses as small integer codes into a per-batch table of interned
+    status strings. Timestamps with sub-second precision or a UTC offset cannot be stored without
+    rewriting them, so they are refused rather than truncated or converted.
+    """
+    __slots__ = ('timestamps', 'callers', 'receivers', 'durations', 'status_codes', 'statuses',
+                 'uniqueCallReferences', '__status_index')
+
+    def __init__(self) -> None:
+        """
+        Initialize an empty batch.
+
+        Attributes:
+            timestamps (array[int]): Call timestamps in seconds since the epoch.
+            callers (list[str]): Caller IDs.
+            receivers (list[str]): Receiver IDs.
+            durations (array[int]): Call durations in seconds.
+            status_codes (array[int]): Index of each call status in statuses.
+            statuses (list[str]): Distinct call statuses of the batch.
+            uniqueCallReferences (list[str]): Unique identifiers of the calls.
+        """
+        self.timestamps: array = array('q')
+        self.callers: list[str] = []
+        self.receivers: list[str] = []
+        self.durations: array = array('q')
+        self.status_codes: array = array('H')
+        self.statuses: list[str] = []
+        self.uniqueCallReferences: list[str] = []
+        self.__status_index: dict[str, int] = {}
+
+    def append(self, timestamp: datetime, caller: str, receiver: str, duration: int, status: str, uniqueCallReference: str) -> None:
+        """
+        Add a call log to the batch.
+
+        Args:
+            timestamp (datetime): Call timestamp.
+            caller (str): Caller ID.
+            receiver (str): Receiver ID.
+            duration (int): Call duration in seconds.
+            status (str): Call status.
+            uniqueCallReference (str): unique identifier for the call.
+
+        Raises:
+            ValueError: If the timestamp has sub-second precision or a UTC offset.
+        """
+        check_timestamp(timestamp)
+        code = self.__status_index.get(status)
+        if code is None:
+            code = self.__status_index[status] = len(self.statuses)
+            self.statuses.append(status)
+        self.timestamps.append(int((timestamp - EPOCH).total_seconds()))
+        self.callers.append(caller)
+        self.receivers.append(receiver)
+        self.durations.append(duration)
+        self.status_codes.append(code)
+        self.uniqueCallReferences.append(uniqueCallReference)
+
+    def append_log(self, log: CallLog) -> None:
+        """
+        Add a CallLog instance to the batch.
+
+        Args:
+            log (CallLog): The call log to add.
+        """
+        self.append(log.timestamp, log.caller, log.receiver, log.duration, log.status, log.uniqueCallReference)
+
+    def take(self, indices: list[int]) -> "CallLogBatch":
+        """
+        Build a new batch holding only some of the records, sharing the status table.
+
+        Args:
+            indices (list[int]): Positions of the records to keep, in the order they are wanted.
+
+        Returns:
+            CallLogBatch: The selected records.
+        """
+        selected = CallLogBatch()
+        selected.timestamps = array('q', [self.timestamps[i] for i in indices])
+        selected.callers = [self.callers[i] for i in indices]
+        selected.receivers = [self.receivers[i] for i in indices]
+        selected.durations = array('q', [self.durations[i] for i in indices])
+        selected.status_codes = array('H', [self.status_codes[i] for i in indices])
+        selected.statuses = list(self.statuses)
+        selected.uniqueCallReferences = [self.uniqueCallReferences[i] for i in indices]
+        selected.__status_index = dict(self.__status_index)
+        return selected
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def __iter__(self) -> Iterator[CallLog]:
+        """
+        Materialize the batch back into CallLog instances.
+
+        Yields:
+            CallLog: One instance per record, in insertion order.
+        """
+        statuses = self.statuses
+        for timestamp, caller, receiver, duration, code, reference in zip(
+                self.timestamps, self.callers, self.receivers, self.durations, self.status_codes, self.uniqueCallReferences):
+            yield CallLog(EPOCH + timedelta(seconds=timestamp), caller, receiver, duration, statuses[code], reference)
+
+    def to_json_list(self) -> list[str]:
+        """
+        Convert every record of the batch to a JSON string.
+
+        Returns:
+            list[str]: JSON representation of each call log, in insertion order.
+        """
+        return [log.to_json() for log in self]
@@ -0,0 +1,141 @@
+from pathlib import Path
+import compressedFiles
+import hashlib
+import logging
+import json
+import os
+
+# Set up module-level logger.
+logger = logging.getLogger(__name__)
+#logger.setLevel(logging.DEBUG)
+
+class CheckpointManifest:
+    """
+    Persistent record of how far each CSV file has been ingested.
+
+    For every file the manifest stores its path, size, mtime, a content fingerprint and the
+    byte offset/row count committed so far. Offsets advanced by the loader stay pending until
+    commit() is called, which must only happen once the sink has confirmed the rows.
+
+    Compressed files are taken as immutable archives: their offsets count decompressed bytes and
+    cannot be compared with the file size, so a completely read archive is marked complete and
+    any change of size or mtime starts it again from the beginning.
+    """
+    FINGERPRINT_BYTES: int = 64 * 1024
+
+    def __init__(self, manifest_path: str | None = None) -> None:
+        """
+        Initialize the manifest, loading the previous state from manifest_path if present.
+
+        Args:
+            manifest_path (str | None): JSON file holding the manifest. When None the manifest
+                only lives in memory, which is enough to tail files within a single run.
+        """
+        self.__manifest_path = Path(manifest_path) if manifest_path else None
+        self.__entries: dict[str, dict] = {}
+        self.__pending: dict[str, tuple[Path, int, int]] = {}
+        if self.__manifest_path and self.__manifest_path.is_file():
+            try:
+                with open(self.__manifest_path, 'r', encoding='utf-8') as file:
+                    self.__entries = json.load(file)['files']
+                logger.info(f"Loaded checkpoint manifest with {len(self.__entries)} files from: {self.__manifest_path}")
+            except (OSError, KeyError, json.JSONDecodeError) as e:
+                logger.warning(f"Ignoring unreadable checkpoint manifest {self.__manifest_path}: {e}", exc_info=True)
+
+    def resume_point(self, csv_file: Path) -> tuple[int, int] | None:
+        """
+        Tell where ingestion of a file has to start.
+
+        Args:
+            csv_file (Path): The CSV file about to be read.
+
+        Returns:
+            tuple[int, int] | None: The committed (byte offset, row count) to resume from,
+                (0, 0) for new or rewritten files, or None if the file has nothing new.
+                Positions advanced but not committed yet take precedence, so a file
+                read again in the same run does not hand the same rows over twice.
+        """
+        pending = self.__pending.get(str(csv_file))
+        if pending is not None:
+            _, offset, rows, complete = pending
+            if compressedFiles.is_compressed(csv_file):
+                return None if complete else (offset, rows)
+            return (offset, rows) if csv_file.stat().st_size > offset else None
+        entry = self.__entries.get(str(csv_file))
+        if entry is None:
+            return 0, 0
+        stat = csv_file.stat()
+        if compressedFiles.is_compressed(csv_file):
+            if stat.st_size != entry['size'] or stat.st_mtime != entry['mtime']:
+                logger.warning(f"Archive {csv_file} changed since the last checkpoint, ingesting it again from the start")
+                return 0, 0
+            return None if entry.get('complete') else (entry['offset'], entry['rows'])
+        if stat.st_size == entry['size'] == entry['offset'] and stat.st_mtime == entry['mtime']:
+            return None
+        if stat.st_size < entry['offset'] or self.__fingerprint(csv_file, entry['offset']) != entry['sha256']:
+            logger.warning(f"File {csv_file} was rewritten since the last checkpoint, ingesting it again from the start")
+            return 0, 0
+        if stat.st_size == entry['offset']:
+            return None
+        logger.debug(f"Resuming {csv_file} at byte {entry['offset']} (row {entry['rows']})")
+        return entry['offset'], entry['rows']
+
+    def advance(self, csv_file: Path, offset: int, rows: int, complete: bool = False) -> None:
+        """
+        Record that a file has been handed to the sink up to a byte offset.
+        The position is only persisted by the next commit().
+
+        Args:
+            csv_file (Path): The CSV file being read.
+            offset (int): Byte offset just past the last row handed over.
+            rows (int): Number of data rows read from the start of the file.
+            complete (bool): Whether the file was read to its end.
+        """
+        self.__pending[str(csv_file)] = (csv_file, offset, rows, complete)
+
+    def commit(self) -> None:
+        """
+        Persist the pending positions. Call it only after the sink has flushed the rows.
+
+        A file deleted or rotated away since it was read cannot be fingerprinted: its position is
+        dropped with a warning, and its previous entry, if any, is kept.
+        """
+        if not self.__pending:
+            return
+        for key, (csv_file, offset, rows, complete) in self.__pending.items():
+            try:
+                stat = csv_file.stat()
+                fingerprint = self.__fingerprint(csv_file, offset)
+            except OSError as e:
+                logger.warning(f"Not checkpointing {csv_file}, it is no longer readable: {e}")
+                continue
+            self.__entries[key] = {
+                "path": key,
+                "size": stat.st_size,
+                "mtime": stat.st_mtime,
+                "sha256": fingerprint,
+                "offset": offset,
+                "rows": rows,
+                "complete": complete
+            }
+        self.__pending.clear()
+        if self.__manifest_path:
+            temporary_path = self.__manifest_path.with_suffix('.tmp')
+            with open(temporary_path, 'w', encoding='utf-8') as file:
+                json.dump({"files": self.__entries}, file, indent=1)
+            os.replace(temporary_path, self.__manifest_path)
+            logger.debug(f"Checkpoint manifest saved to: {self.__manifest_path}")
+
+    def __fingerprint(self, csv_file: Path, offset: int) -> str:
+        """
+        Hash the head of the committed part of a file, so rewritten files can be told apart from appended ones.
+
+        Args:
+            csv_file (Path): The CSV file to hash.
+            offset (int): Committed byte offset; at most FINGERPRINT_BYTES before it are hashed.
+
+        Returns:
+            str: Hex SHA-256 digest.
+        """
+        with open(csv_file, 'rb') as file:
+            return hashlib.sha256(file.read(min(offset, self.FINGERPRINT_BYTES))).hexdigest()
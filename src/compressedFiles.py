@@ -0,0 +1,158 @@
+from typing import BinaryIO, Callable
+from pathlib import Path
+import threading
+import logging
+import queue
+import gzip
+import lzma
+import bz2
+import io
+
+try:
+    from compression import zstd
+except ImportError:
+    try:
+        import zstandard as zstd
+    except ImportError:
+        zstd = None
+
+# Set up module-level logger.
+logger = logging.getLogger(__name__)
+#logger.setLevel(logging.DEBUG)
+
+# Opener of each supported compression suffix; '.zst' needs the zstd module of Python 3.14 or zstandard.
+OPENERS: dict[str, Callable[..., BinaryIO]] = {'.gz': gzip.open, '.bz2': bz2.open, '.xz': lzma.open}
+if zstd is not None:
+    OPENERS['.zst'] = zstd.open
+# Names of the files the loader reads.
+CSV_SUFFIXES: tuple[str, ...] = ('.csv',) + tuple(f'.csv{suffix}' for suffix in OPENERS)
+# Errors raised on corrupt or truncated archives that are not OSError subclasses.
+DECOMPRESSION_ERRORS: tuple[type[BaseException], ...] = (EOFError, lzma.LZMAError) + (
+    (zstd.ZstdError,) if zstd is not None else ())
+
+def is_csv_file(file_path: Path) -> bool:
+    """
+    Returns:
+        bool: Whether the file is a CSV file the loader can read, plain or compressed.
+    """
+    return file_path.name.endswith(CSV_SUFFIXES)
+
+def is_compressed(file_path: Path) -> bool:
+    """
+    Returns:
+        bool: Whether the file is a compressed CSV file.
+    """
+    return file_path.suffix in OPENERS and file_path.name.endswith(CSV_SUFFIXES)
+
+def open_csv(file_path: Path, block_size: int = 1024 * 1024, read_ahead: int = 4) -> BinaryIO:
+    """
+    Open a CSV file for reading in binary mode, decompressing it on the fly if needed.
+
+    Compressed files are decompressed block by block in a background thread, up to read_ahead
+    blocks ahead of the reader, so decompression overlaps with parsing instead of alternating
+    with it; the decompressors release the GIL while they work. Nothing is written to disk.
+
+    Args:
+        file_path (Path): The CSV file.
+        block_size (int): Size in bytes of the decompressed blocks.
+        read_ahead (int): Number of decompressed blocks buffered ahead of the reader.
+
+    Returns:
+        BinaryIO: The decompressed content; compressed files only support reading forward.
+    """
+    if not is_compressed(file_path):
+        return open(file_path, mode='rb')
+    return io.BufferedReader(ReadAheadStream(OPENERS[file_path.suffix](file_path, 'rb'), block_size, read_ahead),
+                             buffer_size=64 * 1024)
+
+
+class ReadAheadStream(io.RawIOBase):
+    """
+    Raw stream reading another stream in blocks from a background thread, through a bounded queue.
+    """
+
+    def __init__(self, source: BinaryIO, block_size: int = 1024 * 1024, read_ahead: int = 4) -> None:
+        """
+        Start reading the source.
+
+        Args:
+            source (BinaryIO): The stream to read, closed together with this one.
+            block_size (int): Size in bytes of each read from the source.
+            read_ahead (int): Maximum number of blocks read but not consumed yet.
+        """
+        super().__init__()
+        self.__source = source
+        self.__block_size = block_size
+        self.__blocks: queue.Queue = queue.Queue(read_ahead)
+        self.__block = memoryview(b'')
+        self.__end: bool = False
+        self.__stop = threading.Event()
+        self.__thread = threading.Thread(target=self.__fill, name="read-ahead", daemon=True)
+        self.__thread.start()
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        """
+        Copy the next bytes of the source into buffer.
+
+        Returns:
+            int: Number of bytes copied, 0 at the end of the source.
+
+        Raises:
+            Exception: The error raised while reading the source.
+        """
+        if not self.__block:
+            if self.__end:
+                return 0
+            block = self.__blocks.get()
+            if isinstance(block, BaseException):
+                self.__end = True
+                raise block
+            if not block:
+                self.__end = True
+                return 0
+            self.__block = memoryview(block)
+        size = min(len(buffer), len(self.__block))
+        buffer[:size] = self.__block[:size]
+        self.__block = self.__block[size:]
+        return size
+
+    def close(self) -> None:
+        """
+        Stop the background thread and close the source.
+        """
+        if not self.closed:
+            self.__stop.set()
+            while self.__thread.is_alive():
+                try:
+                    self.__blocks.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            self.__source.close()
+        super().close()
+
+    def __fill(self) -> None:
+        """
+        Read the source into the queue until its end, an error, or close().
+        """
+        try:
+            while not self.__stop.is_set():
+                block = self.__source.read(self.__block_size)
+                self.__put(block)
+                if not block:
+                    return
+        except BaseException as e:
+            self.__put(e)
+
+    def __put(self, item) -> None:
+        """
+        Put an item on the queue, waiting while it is full unless the stream is closing.
+        """
+        while not self.__stop.is_set():
+            try:
+                self.__blocks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
@@ -1,6 +1,8 @@
 from configparser import ConfigParser
+from datetime import datetime
 from pathlib import Path
 from typing import Any, Dict, Optional
+import compressedFiles
 import logging
 import json
 
@@ -22,8 +24,62 @@ class Config:
             - export_path (Optional[str]): Export destination path (optional)
             - elasticsearch_address (Optional[str]): Elasticsearch server address (optional)
             - index_name (Optional[str]): Elasticsearch index name (optional)
+            - index_rotate (str): Write to time-based indices named after index_name and the call timestamp: 'none', 'day' or 'month'.
+            - index_template (Optional[str]): Existing index template the time-based indices are created from, instead of the mapping (optional)
+            - ingest_mode (bool): Whether the indices written to get refresh_interval -1 and 0 replicas, and the SQLite secondary indexes are dropped, for the duration of the run.
             - mapping (Optional[Dict]): Database mapping schema (optional)
             - destinations (list[str]): List of configured output destinations.
+            - bulk_max_docs (int): Number of buffered documents that triggers an Elasticsearch _bulk request.
+            - bulk_max_bytes (int): Buffered _bulk payload size in bytes that triggers a request.
+            - bulk_max_in_flight (int): Number of concurrent _bulk requests sent through the asyncio client, 0 to send them synchronously.
+            - export_buffer_size (int): Write buffer size in bytes of the export file.
+            - export_fsync (str): fsync policy of the export file: 'never', 'batch' or 'close'.
+            - export_rotate (str): Split the export into segments by call timestamp: 'none', 'hour' or 'day'.
+            - export_segment_bytes (int): Uncompressed size in bytes that ends an export segment, 0 for no limit.
+            - export_compression (str): Compression of the export segments: 'none', 'gzip' or 'zstd'.
+            - parquet_path (Optional[str]): Directory of the Parquet export, partitioned by call hour (optional)
+            - parquet_row_group_size (int): Number of rows per Parquet row group.
+            - parquet_compression (str): Codec of the Parquet files: 'none', 'snappy', 'gzip', 'brotli', 'lz4' or 'zstd'.
+            - parquet_max_open_files (int): Number of hourly Parquet partitions written at the same time.
+            - parquet_max_file_rows (int): Number of rows after which a Parquet file is completed; the file of the current hour otherwise stays open across checkpoints.
+            - rollup_path (Optional[str]): Directory of the hourly rollup files, per hour × status, caller and receiver (optional, needs manifest_path)
+            - rollup_index (Optional[str]): Elasticsearch summary index of the rollups (optional, needs manifest_path)
+            - rollup_group_digits (int): Number of leading digits grouping callers and receivers in the rollups, 3 by default; 0 keys them on the full number, for exact top-N.
+            - rollup_relative_accuracy (float): Relative accuracy of the duration percentiles of the rollups.
+            - sqlite_path (Optional[str]): Embedded SQLite database receiving the call logs, for installs without Elasticsearch (optional)
+            - sqlite_synchronous (str): SQLite synchronous level of the database: 'off', 'normal' or 'full'.
+            - sink_queue_size (int): Capacity, in batches, of the queue of each destination written concurrently, 0 to write the destinations one after the other.
+            - sink_failure_policy (str): With concurrent destinations, whether a failing one stops the run ('block') or is dropped while the others continue ('degrade').
+            - serializer_backend (str): NDJSON serializer backend: 'template' or 'orjson'.
+            - write_mode (str): Elasticsearch write mode: 'create' or 'upsert' keyed on uniqueCallReference, or 'append'.
+            - dedup_capacity (int): Number of references the dedup filter is sized for, 0 to disable it.
+            - dedup_error_rate (float): False positive rate of the dedup filter at capacity.
+            - dedup_filter_path (Optional[str]): File persisting the dedup filter between runs (optional)
+            - parse_workers (int): Number of workers parsing CSV files in parallel, 0 to parse in a single thread.
+            - parse_ordered (bool): Whether parallel parsing keeps the sorted file order in watch mode.
+            - parse_split_bytes (int): Size in bytes left to read from which a plain CSV file is memory-mapped and parsed as parallel byte ranges, 0 to never split files.
+            - parse_mode (str): Whether the parse workers of the pipeline are 'thread' or 'process' workers.
+            - serialize_workers (int): Number of workers of the serialize stage of the pipeline.
+            - serialize_mode (str): Whether the serialize workers are 'thread' or 'process' workers.
+            - pipeline_queue_size (int): Capacity, in batches, of each queue between two pipeline stages.
+            - filter_start (Optional[datetime]): Smallest call timestamp loaded, ISO 8601 taken as UTC without an offset; the files of earlier hours are not opened (optional)
+            - filter_end (Optional[datetime]): Call timestamp the loaded logs are before, ISO 8601 taken as UTC without an offset; the files of later hours are not opened (optional)
+            - filter_statuses (tuple[str, ...]): Comma-separated prefixes one of which the status of the loaded logs starts with, empty for any status.
+            - filter_callers (Optional[frozenset[str]]): Comma-separated callers the loaded logs have (optional)
+            - filter_receivers (Optional[frozenset[str]]): Comma-separated receivers the loaded logs have (optional)
+            - manifest_path (Optional[str]): Checkpoint manifest enabling incremental ingestion (optional)
+            - checkpoint_interval (int): Number of logs between two checkpoint commits.
+            - watch_flush_interval_ms (int): In watch mode, maximum time a log waits before being flushed.
+            - watch_poll_interval_ms (int): In watch mode, polling period used when inotify is not available.
+            - metrics_report_path (Optional[str]): JSON report of the run metrics, written at the end of the run (optional)
+            - metrics_textfile_path (Optional[str]): Prometheus textfile rewritten periodically during the run (optional)
+            - metrics_textfile_interval_ms (int): Period between two writes of the Prometheus textfile.
+            - profile_path (str): Directory of the profiles written by main.py --profile, one subdirectory per run.
+            - profile_cprofile (bool): Whether --profile also runs cProfile, which slows the run ~3.4x; off by default.
+            - profile_sample_interval_ms (int): Period of the wall-clock sampling profiler of --profile, 0 to disable it (~5% slower at 10).
+            - profile_memory_interval (int): Number of logs between two tracemalloc snapshots of --profile, 0 (the default) to disable tracemalloc, which slows the run ~9x.
+            - profile_memory_frames (int): Number of frames tracemalloc keeps per allocation site.
+            - profile_top (int): Number of hot functions and allocation sites reported by --profile.
             - delta_T_for_file(int): Time delta for file processing (non-default sections only).
 
         Raises:
@@ -51,7 +107,7 @@ class Config:
                 logger.critical(error_msg)
                 raise ValueError(error_msg)
         else:
-            self.folder_path = self.__validate_path(folder_path, ".csv")
+            self.folder_path = self.__validate_path(folder_path, compressedFiles.CSV_SUFFIXES)
         if self.section is not self.DEFAULT_SECTION:
                 self.delta_T_for_file = int(parser.get(self.section, 'delta_T_for_file', fallback="1"))
                 return
@@ -65,6 +121,81 @@ class Config:
             parser, 'elasticsearch_address')
         self.index_name = self.__get_config(
             parser, 'index_name')
+        self.index_rotate = self.__get_config(parser, 'index_rotate', 'none')
+        self.index_template = self.__get_config(parser, 'index_template')
+        self.ingest_mode = self.__get_bool(parser, 'ingest_mode', False)
+        self.bulk_max_docs = self.__get_int(parser, 'bulk_max_docs', 500)
+        self.bulk_max_bytes = self.__get_int(parser, 'bulk_max_bytes', 5 * 1024 * 1024)
+        self.bulk_max_in_flight = self.__get_int(parser, 'bulk_max_in_flight', 0, minimum=0)
+        self.export_buffer_size = self.__get_int(parser, 'export_buffer_size', 1024 * 1024)
+        self.export_fsync = self.__get_config(parser, 'export_fsync', 'never')
+        self.export_rotate = self.__get_config(parser, 'export_rotate', 'none')
+        self.export_segment_bytes = self.__get_int(parser, 'export_segment_bytes', 0, minimum=0)
+        self.export_compression = self.__get_config(parser, 'export_compression', 'none')
+        self.parquet_path = self.__get_config(parser, 'parquet_path')
+        if self.parquet_path:
+            self.parquet_path = self.__validate_path(
+                self.parquet_path, create_if_missing=True)
+        self.parquet_row_group_size = self.__get_int(parser, 'parquet_row_group_size', 128 * 1024)
+        self.parquet_compression = self.__get_config(parser, 'parquet_compression', 'zstd')
+        self.parquet_max_open_files = self.__get_int(parser, 'parquet_max_open_files', 16)
+        self.parquet_max_file_rows = self.__get_int(parser, 'parquet_max_file_rows', 1024 * 1024)
+        self.rollup_path = self.__get_config(parser, 'rollup_path')
+        if self.rollup_path:
+            self.rollup_path = self.__validate_path(
+                self.rollup_path, create_if_missing=True)
+        self.rollup_index = self.__get_config(parser, 'rollup_index')
+        self.rollup_group_digits = self.__get_int(parser, 'rollup_group_digits', 3, minimum=0)
+        self.rollup_relative_accuracy = self.__get_float(parser, 'rollup_relative_accuracy', 0.01)
+        self.sqlite_path = self.__get_config(parser, 'sqlite_path')
+        if self.sqlite_path:
+            self.sqlite_path = self.__validate_path(
+                self.sqlite_path, create_if_missing=True)
+        self.sqlite_synchronous = self.__get_config(parser, 'sqlite_synchronous', 'normal')
+        self.sink_queue_size = self.__get_int(parser, 'sink_queue_size', 0, minimum=0)
+        self.sink_failure_policy = self.__get_config(parser, 'sink_failure_policy', 'block')
+        self.serializer_backend = self.__get_config(parser, 'serializer_backend', 'template')
+        self.write_mode = self.__get_config(parser, 'write_mode', 'create')
+        self.dedup_capacity = self.__get_int(parser, 'dedup_capacity', 0, minimum=0)
+        self.dedup_error_rate = self.__get_float(parser, 'dedup_error_rate', 0.0001)
+        self.dedup_filter_path = self.__get_config(parser, 'dedup_filter_path')
+        if self.dedup_filter_path:
+            self.dedup_filter_path = self.__validate_path(
+                self.dedup_filter_path, create_if_missing=True)
+        self.parse_workers = self.__get_int(parser, 'parse_workers', 0, minimum=0)
+        self.parse_ordered = self.__get_bool(parser, 'parse_ordered', True)
+        self.parse_split_bytes = self.__get_int(parser, 'parse_split_bytes', 64 * 1024 * 1024, minimum=0)
+        self.parse_mode = self.__get_config(parser, 'parse_mode', 'process')
+        self.serialize_workers = self.__get_int(parser, 'serialize_workers', 1)
+        self.serialize_mode = self.__get_config(parser, 'serialize_mode', 'thread')
+        self.pipeline_queue_size = self.__get_int(parser, 'pipeline_queue_size', 8)
+        self.filter_start = self.__get_datetime(parser, 'filter_start')
+        self.filter_end = self.__get_datetime(parser, 'filter_end')
+        self.filter_statuses = tuple(sorted(self.__get_list(parser, 'filter_statuses') or ()))
+        self.filter_callers = self.__get_list(parser, 'filter_callers')
+        self.filter_receivers = self.__get_list(parser, 'filter_receivers')
+        self.manifest_path = self.__get_config(parser, 'manifest_path')
+        if self.manifest_path:
+            self.manifest_path = self.__validate_path(
+                self.manifest_path, create_if_missing=True)
+        self.checkpoint_interval = self.__get_int(parser, 'checkpoint_interval', 10000)
+        self.watch_flush_interval_ms = self.__get_int(parser, 'watch_flush_interval_ms', 1000)
+        self.watch_poll_interval_ms = self.__get_int(parser, 'watch_poll_interval_ms', 500)
+        self.metrics_report_path = self.__get_config(parser, 'metrics_report_path')
+        if self.metrics_report_path:
+            self.metrics_report_path = self.__validate_path(
+                self.metrics_report_path, create_if_missing=True)
+        self.metrics_textfile_path = self.__get_config(parser, 'metrics_textfile_path')
+        if self.metrics_textfile_path:
+            self.metrics_textfile_path = self.__validate_path(
+                self.metrics_textfile_path, create_if_missing=True)
+        self.metrics_textfile_interval_ms = self.__get_int(parser, 'metrics_textfile_interval_ms', 15000)
+        self.profile_path = self.__get_config(parser, 'profile_path', 'src/data/export/profile')
+        self.profile_cprofile = self.__get_bool(parser, 'profile_cprofile', False)
+        self.profile_sample_interval_ms = self.__get_int(parser, 'profile_sample_interval_ms', 10, minimum=0)
+        self.profile_memory_interval = self.__get_int(parser, 'profile_memory_interval', 0, minimum=0)
+        self.profile_memory_frames = self.__get_int(parser, 'profile_memory_frames', 1)
+        self.profile_top = self.__get_int(parser, 'profile_top', 25)
 
         self.__get_mapping(parser)
         self.__validate_configuration_consistency()
@@ -85,13 +216,127 @@ class Config:
         value = parser.get(self.section, key, fallback=fallback)
         return value.strip() if value and value.strip() else None
 
-    def __validate_path(self, folder_path: str, file_extension: str | None = None, create_if_missing: bool = False) -> str:
+    def __get_int(self, parser: ConfigParser, key: str, fallback: int, minimum: int = 1) -> int:
+        """
+        Retrieve an integer configuration value from the config file.
+
+        Args:
+            - parser (ConfigParser): The config parser instance.
+            - key (str): The key to retrieve.
+            - fallback (int): Value used when the key is missing or empty.
+            - minimum (int): Smallest accepted value. Defaults to 1.
+
+        Returns:
+            - int: The configured value, or the fallback.
+
+        Raises:
+            - ValueError: If the value is not an integer greater than or equal to minimum.
+        """
+        value = self.__get_config(parser, key)
+        if value is None:
+            return fallback
+        if not value.isdigit() or int(value) < minimum:
+            error_msg: str = f"Invalid configuration: [{self.section}] {key} must be an integer >= {minimum}, got '{value}'"
+            logger.critical(error_msg)
+            raise ValueError(error_msg)
+        return int(value)
+
+    def __get_float(self, parser: ConfigParser, key: str, fallback: float) -> float:
+        """
+        Retrieve a float configuration value from the config file.
+
+        Args:
+            - parser (ConfigParser): The config parser instance.
+            - key (str): The key to retrieve.
+            - fallback (float): Value used when the key is missing or empty.
+
+        Returns:
+            - float: The configured value, or the fallback.
+
+        Raises:
+            - ValueError: If the value is not a number.
+        """
+        value = self.__get_config(parser, key)
+        if value is None:
+            return fallback
+        try:
+            return float(value)
+        except ValueError:
+            error_msg: str = f"Invalid configuration: [{self.section}] {key} must be a number, got '{value}'"
+            logger.critical(error_msg)
+            raise ValueError(error_msg)
+
+    def __get_bool(self, parser: ConfigParser, key: str, fallback: bool) -> bool:
+        """
+        Retrieve a boolean configuration value from the config file.
+
+        Args:
+            - parser (ConfigParser): The config parser instance.
+            - key (str): The key to retrieve.
+            - fallback (bool): Value used when the key is missing or empty.
+
+        Returns:
+            - bool: The configured value, or the fallback.
+
+        Raises:
+            - ValueError: If the value is not a boolean (true/false, yes/no, on/off, 1/0).
+        """
+        if self.__get_config(parser, key) is None:
+            return fallback
+        try:
+            return parser.getboolean(self.section, key)
+        except ValueError:
+            error_msg: str = f"Invalid configuration: [{self.section}] {key} must be a boolean"
+            logger.critical(error_msg)
+            raise ValueError(error_msg)
+
+    def __get_datetime(self, parser: ConfigParser, key: str) -> Optional[datetime]:
+        """
+        Retrieve an optional ISO 8601 timestamp from the config file.
+
+        Args:
+            - parser (ConfigParser): The config parser instance.
+            - key (str): The key to retrieve.
+
+        Returns:
+            - Optional[datetime]: The configured timestamp, or None if empty/missing.
+
+        Raises:
+            - ValueError: If the value is not an ISO 8601 timestamp.
+        """
+        value = self.__get_config(parser, key)
+        if value is None:
+            return None
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            error_msg: str = f"Invalid configuration: [{self.section}] {key} must be an ISO 8601 timestamp, got '{value}'"
+            logger.critical(error_msg)
+            raise ValueError(error_msg)
+
+    def __get_list(self, parser: ConfigParser, key: str) -> Optional[frozenset[str]]:
+        """
+        Retrieve an optional comma-separated set of values from the config file.
+
+        Args:
+            - parser (ConfigParser): The config parser instance.
+            - key (str): The key to retrieve.
+
+        Returns:
+            - Optional[frozenset[str]]: The values stripped of whitespace, or None if empty/missing.
+        """
+        value = self.__get_config(parser, key)
+        if value is None:
+            return None
+        return frozenset(item.strip() for item in value.split(',') if item.strip()) or None
+
+    def __validate_path(self, folder_path: str, file_extension: str | tuple[str, ...] | None = None, create_if_missing: bool = False) -> str:
         """
         Validate a folder path and optionally check for files with a specific extension.
 
         Args:
             - folder_path (str): The path to validate.
-            - file_extension (Optional[str]): File extension to check for (e.g., '.csv').
+            - file_extension (Optional[str | tuple[str, ...]]): File extension, or extensions, to check for (e.g., '.csv' or ('.csv', '.csv.gz')).
             - create_if_missing (bool): Whether to create the directory if it doesn't exist.
 
         Returns:
@@ -111,7 +356,8 @@ class Config:
             logger.critical(error_msg)
             raise NotADirectoryError(error_msg)
 
-        if file_extension is not None and not any(path.glob(f"*{file_extension}"))and self.section is self.DEFAULT_SECTION:
+        if file_extension is not None and not any(
+                file.name.endswith(file_extension) for file in path.iterdir()) and self.section is self.DEFAULT_SECTION:
             error_msg: str = f"No files with extension '{file_extension}' found in {path}"
             logger.warning(error_msg)
             raise FileNotFoundError(error_msg)
@@ -150,8 +396,9 @@ class Config:
         Validation Rules:
             - If elasticsearch_address is provided, index_name should also be provided
             - If index_name is provided without elasticsearch_address, warning is logged
-            - At least one of elasticsearch_address or export_path must be configured
-            - Valid configurations: elasticsearch only, export_path only, or both
+            - If rollup_index is provided, elasticsearch_address should also be provided
+            - At least one of elasticsearch_address, export_path, parquet_path, rollup_path or sqlite_path must be configured
+            - Valid configurations: any combination of elasticsearch, export_path, parquet_path, rollup_path and sqlite_path
         
         returns:
             - None. Sets self.destinations attribute as side effect.
@@ -159,17 +406,26 @@ class Config:
         has_elasticsearch = self.elasticsearch_address is not None
         has_index_name = self.index_name is not None
         has_export_path = self.export_path is not None
+        has_parquet_path = self.parquet_path is not None
+        has_rollup_path = self.rollup_path is not None
+        has_sqlite_path = self.sqlite_path is not None
         if has_elasticsearch and not has_index_name:
             logger.error(
                 "Elasticsearch address provided but index_name is missing")
         if has_index_name and not has_elasticsearch:
             logger.warning(
                 "Index name provided but elasticsearch_address is missing")
-        if not has_elasticsearch and not has_export_path:
-            error_msg = "No output destination configured - need either elasticsearch_address or export_path"
+        if self.rollup_index and not has_elasticsearch:
+            logger.error(
+                "Rollup index provided but elasticsearch_address is missing")
+        if not has_elasticsearch and not has_export_path and not has_parquet_path and not has_rollup_path and not has_sqlite_path:
+            error_msg = "No output destination configured - need elasticsearch_address, export_path, parquet_path, rollup_path or sqlite_path"
             logger.critical(error_msg)
             raise ValueError(error_msg)
         self.destinations = []
         self.destinations.append(self.elasticsearch_address) if self.elasticsearch_address else None
         self.destinations.append(self.export_path) if self.export_path else None
+        self.destinations.append(self.parquet_path) if self.parquet_path else None
+        self.destinations.append(self.rollup_path) if self.rollup_path else None
+        self.destinations.append(self.sqlite_path) if self.sqlite_path else None
         logger.info(f"Configured output destinations: {self.destinations}")
\ No newline at end of file
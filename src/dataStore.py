@@ -1,6 +1,16 @@
-from elasticsearch import Elasticsearch
+from elasticsearch import ConflictError, Elasticsearch
+from typing import Callable
 import iDataStore as interface
+import segmentedExport
+import indexManager
+import serializer
+import functools
+import callLog
+import metrics
 import logging
+import time
+import json
+import os
 
 """Set up module-level logger."""
 logger = logging.getLogger(__name__)
@@ -11,29 +21,81 @@ class DataStore(interface.IDataStore):
     """
     Implementation of the IDataStore interface for storing logs in an Elasticsearch index or exporting them to the file system.
     """
+    # _bulk action line of each write mode; %s is replaced by the JSON-encoded uniqueCallReference.
+    WRITE_MODES: dict[str, bytes] = {
+        'create': b'{"create":{"_id":%s}}',
+        'upsert': b'{"index":{"_id":%s}}',
+        'append': b'{"index":{}}',
+    }
+    MAX_REPORTED_BULK_ERRORS: int = 10
+    FSYNC_POLICIES: tuple[str, ...] = ('never', 'batch', 'close')
 
-    def __init__(self, export_path: str | None = None, elasticsearch_address: str | None = None, index_name: str | None = None) -> None:
+    def __init__(self, export_path: str | None = None, elasticsearch_address: str | None = None, index_name: str | None = None,
+                 bulk_max_docs: int = 500, bulk_max_bytes: int = 5 * 1024 * 1024,
+                 export_buffer_size: int = 1024 * 1024, export_fsync: str = 'never',
+                 serializer_backend: str = 'template', write_mode: str = 'create', export_rotate: str = 'none',
+                 export_segment_bytes: int = 0, export_compression: str = 'none', index_rotate: str = 'none',
+                 index_mapping: dict | None = None, index_template: str | None = None, ingest_mode: bool = False) -> None:
         """
         Initialize the DataStore instance.
 
         Args:
-            export_path (str): Path for file system export.
-            elasticsearch_address (str): URL to the Elasticsearch instance.
             export_path (str): Path for file system export.
             elasticsearch_address (str): URL to the Elasticsearch instance.
             index_name (str): Name of the Elasticsearch index.
+            bulk_max_docs (int): Number of buffered documents that triggers a _bulk request.
+            bulk_max_bytes (int): Size in bytes of the buffered _bulk payload that triggers a request.
+            export_buffer_size (int): Size in bytes of the write buffer of the export file.
+            export_fsync (str): When the export file is fsynced: 'never', on every flush ('batch') or on close ('close').
+            serializer_backend (str): Backend of the NDJSON serializer used for batches: 'template' or 'orjson'.
+            write_mode (str): How documents are written to Elasticsearch: 'create' uses the
+                uniqueCallReference as _id and leaves existing documents untouched, 'upsert' uses it
+                as _id and overwrites them, 'append' lets Elasticsearch assign the _id.
+            export_rotate (str): Split the export into segments by call timestamp: 'none', 'hour' or 'day'.
+            export_segment_bytes (int): Uncompressed size in bytes that ends an export segment, 0 for no limit.
+            export_compression (str): Compression of the export segments: 'none', 'gzip' or 'zstd'.
+                The export is written to a single file when the three settings keep their defaults,
+                and to a SegmentedExport otherwise.
+            index_rotate (str): Write to time-based indices named after index_name and the call
+                timestamp: 'none', 'day' (index_name-YYYY.MM.DD) or 'month' (index_name-YYYY.MM).
+                The indices are created on demand.
+            index_mapping (dict | None): Mapping of the time-based indices created on demand.
+            index_template (str | None): Existing index template the time-based indices are created from instead.
+            ingest_mode (bool): Disable refreshes and replicas of the indices written to for the duration
+                of the run, restoring their settings on close.
 
         Raises:
             ConnectionError: If connection to Elasticsearch fails.
-            ValueError: If the index name is invalid or missing when required.
+            ValueError: If the index name is invalid or missing when required, or the fsync policy,
+                serializer backend, write mode, rotation or compression is unknown, or the index template does not exist.
         """
         logger.info("Initializing DataStore...")
         self.index_exists: bool = False
         self.es = None
         self.index_name = None
+        self.indices: indexManager.IndexManager | None = None
+        self.bulk_max_docs: int = bulk_max_docs
+        self.bulk_max_bytes: int = bulk_max_bytes
+        self.failed_documents: int = 0
+        self.duplicate_documents: int = 0
+        self.__bulk_buffer: list[bytes] = []
+        self.__bulk_buffer_docs: int = 0
+        self.__bulk_buffer_bytes: int = 0
         self.file_system_export = export_path
-        if self.file_system_export:
-            logger.info(f"File system export path set to: {self.file_system_export}")
+        self.__export_file = None
+        self.__segments: segmentedExport.SegmentedExport | None = None
+        if export_fsync not in self.FSYNC_POLICIES:
+            error_msg: str = f"Invalid fsync policy: {export_fsync}. Must be one of {self.FSYNC_POLICIES}."
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+        self.export_fsync: str = export_fsync
+        if write_mode not in self.WRITE_MODES:
+            error_msg: str = f"Invalid write mode: {write_mode}. Must be one of {tuple(self.WRITE_MODES)}."
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+        self.write_mode: str = write_mode
+        self.bulk_action: bytes = self.WRITE_MODES[write_mode]
+        self.serializer = serializer.NdjsonSerializer(serializer_backend)
         if not elasticsearch_address:
             self.es = None
         else:
@@ -48,14 +110,27 @@ class DataStore(interface.IDataStore):
                 logger.exception(error_msg)
                 raise ConnectionError(error_msg)
 
-            if index_name and self.__validate_index_name(index_name):
+            if index_name and validate_index_name(index_name):
                 self.index_name = index_name
-                response = self.es.indices.exists(index=self.index_name)
-                self.index_exists = response.meta.status == 200
+                self.indices = indexManager.IndexManager(
+                    self.es, indexManager.IndexRouter(index_name, index_rotate), index_mapping, index_template, ingest_mode)
+                if index_rotate != 'none':
+                    # Time-based indices are created on demand.
+                    self.index_exists = True
+                else:
+                    response = self.es.indices.exists(index=self.index_name)
+                    self.index_exists = response.meta.status == 200
             else:
                 error_msg: str =  f"Invalid or missing index name: {index_name}. Must be lowercase and not contain special characters."
                 logger.error(error_msg)
                 raise ValueError(error_msg)
+
+        if self.file_system_export and (export_rotate, export_segment_bytes, export_compression) != ('none', 0, 'none'):
+            self.__segments = segmentedExport.SegmentedExport(
+                self.file_system_export, export_rotate, export_segment_bytes, export_compression, export_buffer_size)
+        elif self.file_system_export:
+            self.__export_file = open(self.file_system_export, 'ab', buffering=export_buffer_size)
+            logger.info(f"File system export path set to: {self.file_system_export}")
    
     def create_mapping(self, mapping: dict) -> None:
         """
@@ -92,30 +167,286 @@ class DataStore(interface.IDataStore):
             elasticsearch.ElasticsearchException: If indexing fails.
         """
         if self.index_name and self.es:
-            self.es.index(index=self.index_name, body=json_log)
-        if self.file_system_export:
-            with open(self.file_system_export, 'a') as file:
-                file.write(json_log + '\n')
+            index_name = self.indices.router.index_of_json(json.loads(json_log)['timestamp'])
+            self.indices.prepare([index_name])
+            if self.write_mode == 'append':
+                self.es.index(index=index_name, body=json_log)
+            else:
+                try:
+                    self.es.index(index=index_name, body=json_log, id=reference_of(json_log),
+                                  op_type='create' if self.write_mode == 'create' else 'index')
+                except ConflictError:
+                    self.duplicate_documents += 1
+        if self.__export_file:
+            self.__export_file.write((json_log + '\n').encode('utf-8'))
+        elif self.__segments:
+            self.__segments.write_documents([json_log])
 
-    def __validate_index_name(self, index_name):
+    def insert_many(self, json_logs: list[str]) -> None:
         """
-        Validate the Elasticsearch the Elasticsearch index name.
-        Index names must be lowercase and must not contain forbidden characters.
+        Buffer a batch of JSON-formatted log entries for the Elasticsearch _bulk API and/or write them to file.
+
+        A _bulk request is sent as soon as the buffer reaches bulk_max_docs documents
+        or bulk_max_bytes bytes; call flush() to send what is left.
 
         Args:
-            index_name (str): The index name to validate.
+            json_logs (list[str]): JSON-formatted strings representing call log entries.
 
+        Raises:
+            elasticsearch.ElasticsearchException: If a _bulk request fails.
+        """
+        if self.index_name and self.es:
+            for json_log in json_logs:
+                action, index_name = bulk_action_line(self.bulk_action, json_log, self.indices.router)
+                self.indices.prepare([index_name or self.index_name])
+                self.__buffer_bulk(action + json_log.encode('utf-8') + b"\n", 1)
+        if self.__export_file:
+            self.__export_file.write(''.join(json_log + '\n' for json_log in json_logs).encode('utf-8'))
+        elif self.__segments:
+            self.__segments.write_documents(json_logs)
+
+    def insert_batch(self, batch: callLog.CallLogBatch) -> None:
+        """
+        Render a CallLogBatch once into the NDJSON export payload and the _bulk body, then buffer/write them.
+
+        The bulk thresholds are checked after the whole batch has been buffered.
+
+        Args:
+            batch (CallLogBatch): The call logs to insert.
+
+        Raises:
+            elasticsearch.ElasticsearchException: If a _bulk request fails.
+        """
+        with metrics.SERIALIZE_SECONDS.time():
+            payload = self.batch_renderer()(batch)
+        self.insert_rendered(payload, len(batch))
+
+    def batch_renderer(self) -> Callable[[callLog.CallLogBatch], tuple[bytes | list[segmentedExport.Part], bytes | None, list[str]]]:
+        """
         Returns:
-            bool: True if the index name is valid, False otherwise.
+            Callable[[CallLogBatch], tuple[bytes | list[Part], bytes | None, list[str]]]: render_batch bound
+                to the serializer, the _bulk action line when Elasticsearch is configured, the index
+                router and the period of the export segments.
         """
-        forbidden_chars = [' ', ',', '#', ':', '*', '?', '"', '<', '>', '|', '\\', '/']
-        if not index_name:
-            return False
-        if not index_name.islower():
-            logger.error(f"Invalid index name '{index_name}': must be all lowercase.")
+        bulk_action = self.bulk_action if self.index_name and self.es else None
+        router = self.indices.router if self.indices and self.indices.router.rotate != 'none' else None
+        return functools.partial(render_batch, self.serializer, bulk_action, router,
+                                 self.__segments.period if self.__segments else None)
+
+    def insert_rendered(self, payload: tuple[bytes | list[segmentedExport.Part], bytes | None, list[str]], documents: int) -> None:
+        """
+        Buffer/write a batch rendered by batch_renderer(), creating the indices it is routed to first.
+
+        Args:
+            payload (tuple[bytes | list[Part], bytes | None, list[str]]): The NDJSON export payload,
+                split by period when the export is segmented, the _bulk body and the indices it writes to.
+            documents (int): Number of call logs in the payload.
+
+        Raises:
+            elasticsearch.ElasticsearchException: If a _bulk request fails.
+        """
+        ndjson, bulk, index_names = payload
+        if bulk:
+            self.indices.prepare(index_names or [self.index_name])
+            self.__buffer_bulk(bulk, documents)
+        if self.__export_file:
+            self.__export_file.write(ndjson)
+        elif self.__segments:
+            self.__segments.write(ndjson)
+
+    def flush(self) -> None:
+        """
+        Send the documents still buffered for the Elasticsearch _bulk API and flush the export file.
+        The export file is also fsynced when the fsync policy is 'batch'.
+
+        Raises:
+            elasticsearch.ElasticsearchException: If the _bulk request fails.
+        """
+        if self.__bulk_buffer:
+            self.__flush_bulk()
+        if self.__export_file:
+            self.__export_file.flush()
+            if self.export_fsync == 'batch':
+                os.fsync(self.__export_file.fileno())
+        elif self.__segments:
+            self.__segments.flush(self.export_fsync == 'batch')
+
+    def close(self) -> None:
+        """
+        Flush the buffered documents, then release the export file and the Elasticsearch connection.
+        The export file is fsynced before closing unless the fsync policy is 'never'; the settings of
+        the indices in ingest mode are restored even when the last flush fails.
+        """
+        try:
+            self.flush()
+        finally:
+            if self.indices:
+                self.indices.restore()
+            if self.__export_file:
+                if self.export_fsync != 'never':
+                    os.fsync(self.__export_file.fileno())
+                self.__export_file.close()
+                self.__export_file = None
+            if self.__segments:
+                self.__segments.close(self.export_fsync != 'never')
+                self.__segments = None
+            if self.es:
+                self.es.close()
+            if self.duplicate_documents:
+                logger.info(f"{self.duplicate_documents} documents were already indexed and left unchanged")
+
+    def __buffer_bulk(self, payload: bytes, documents: int) -> None:
+        """
+        Append action/document lines to the _bulk buffer and send it once a threshold is reached.
+
+        Args:
+            payload (bytes): NDJSON action and document lines, newline terminated.
+            documents (int): Number of documents in the payload.
+        """
+        self.__bulk_buffer.append(payload)
+        self.__bulk_buffer_docs += documents
+        self.__bulk_buffer_bytes += len(payload)
+        if (self.__bulk_buffer_docs >= self.bulk_max_docs
+                or self.__bulk_buffer_bytes >= self.bulk_max_bytes):
+            self.__flush_bulk()
+
+    def __flush_bulk(self) -> None:
+        """
+        Send the buffered documents in a single _bulk request and report the items that failed.
+        """
+        documents = self.__bulk_buffer_docs
+        started = time.perf_counter()
+        response = self.es.bulk(operations=b"".join(self.__bulk_buffer), index=self.index_name)
+        metrics.BULK_SECONDS.observe(time.perf_counter() - started)
+        metrics.BULK_DOCUMENTS.inc(documents)
+        metrics.BULK_BYTES.inc(self.__bulk_buffer_bytes)
+        self.__bulk_buffer = []
+        self.__bulk_buffer_docs = 0
+        self.__bulk_buffer_bytes = 0
+        if response['errors']:
+            failed, duplicates = report_bulk_errors(response['items'], self.failed_documents)
+            self.failed_documents += failed
+            self.duplicate_documents += duplicates
+            metrics.BULK_FAILED.inc(failed)
+            metrics.BULK_DUPLICATES.inc(duplicates)
+        logger.debug(f"Bulk request of {documents} documents completed in {response['took']} ms")
+
+
+def report_bulk_errors(items: list[dict], failed_before: int = 0) -> tuple[int, int]:
+    """
+    Log the items of a _bulk response that were rejected by Elasticsearch.
+
+    Conflicts of 'create' actions are documents whose _id is already indexed: they are
+    counted as duplicates and not reported as errors.
+
+    Args:
+        items (list[dict]): The 'items' list of a _bulk response.
+        failed_before (int): Documents rejected by earlier requests, reported in the summary.
+
+    Returns:
+        tuple[int, int]: Number of documents rejected and number of duplicates in this request.
+    """
+    failed: list[dict] = []
+    duplicates = 0
+    for item in items:
+        for operation, result in item.items():
+            if 'error' not in result:
+                continue
+            if operation == 'create' and result.get('status') == 409:
+                duplicates += 1
+            else:
+                failed.append(result)
+    if duplicates:
+        logger.debug(f"Bulk request skipped {duplicates} documents already indexed")
+    if failed:
+        for result in failed[:DataStore.MAX_REPORTED_BULK_ERRORS]:
+            logger.error(f"Document rejected by Elasticsearch (status {result['status']}): {result['error']}")
+        if len(failed) > DataStore.MAX_REPORTED_BULK_ERRORS:
+            logger.error(f"... {len(failed) - DataStore.MAX_REPORTED_BULK_ERRORS} more documents rejected in the same bulk request")
+        logger.error(f"Bulk request rejected {len(failed)} of {len(items)} documents ({failed_before + len(failed)} in total)")
+    return len(failed), duplicates
+
+def reference_of(json_log: str) -> str:
+    """
+    Extract the uniqueCallReference of a JSON-formatted call log, used as its document _id.
+
+    Args:
+        json_log (str): A JSON-formatted string representing a call log entry.
+
+    Returns:
+        str: The value of its UniqueCallReference field.
+    """
+    return json.loads(json_log)['UniqueCallReference']
+
+def bulk_action_line(bulk_action: bytes, json_log: str,
+                     router: indexManager.IndexRouter | None = None) -> tuple[bytes, str | None]:
+    """
+    Build the _bulk action line of a JSON-formatted call log.
+
+    Args:
+        bulk_action (bytes): Action template of the write mode, see DataStore.WRITE_MODES.
+        json_log (str): A JSON-formatted string representing a call log entry.
+        router (IndexRouter | None): Router of the time-based indices, if any.
+
+    Returns:
+        tuple[bytes, str | None]: The action line, newline terminated, and the time-based index it targets.
+    """
+    routed = router is not None and router.rotate != 'none'
+    if not routed and b'%s' not in bulk_action:
+        return bulk_action + b"\n", None
+    log = json.loads(json_log)
+    index_name = None
+    if routed:
+        index_name = router.index_of_json(log['timestamp'])
+        bulk_action = serializer.bulk_action_with_index(bulk_action, index_name)
+    if b'%s' in bulk_action:
+        bulk_action = bulk_action % json.dumps(log['UniqueCallReference']).encode('utf-8')
+    return bulk_action + b"\n", index_name
+
+def render_batch(ndjson_serializer: serializer.NdjsonSerializer, bulk_action: bytes | None,
+                 router: indexManager.IndexRouter | None, period: int | None,
+                 batch: callLog.CallLogBatch) -> tuple[bytes | list[segmentedExport.Part], bytes | None, list[str]]:
+    """
+    Render a batch into the NDJSON export payload and the _bulk body; the batch renderer of
+    DataStore and AsyncDataStore, run in the serialize stage of the pipeline.
+
+    Args:
+        ndjson_serializer (NdjsonSerializer): Serializer of the store.
+        bulk_action (bytes | None): Action line of the _bulk body, None when no body is needed.
+        router (IndexRouter | None): Router of the time-based indices, None to write to the store's index.
+        period (int | None): Period of the export segments, see segmentedExport.split_parts(); None
+            when the export is a single file.
+        batch (CallLogBatch): The call logs to render.
+
+    Returns:
+        tuple[bytes | list[Part], bytes | None, list[str]]: The NDJSON export payload, the _bulk body
+            or None, and the time-based indices the body writes to.
+    """
+    routes = router.route(batch) if router is not None and bulk_action is not None else None
+    ndjson, bulk = ndjson_serializer.render(batch, bulk_action, routes)
+    if period is not None:
+        ndjson = segmentedExport.split_parts(ndjson, batch, period)
+    return ndjson, bulk, routes[0] if routes else []
+
+def validate_index_name(index_name) -> bool:
+    """
+    Validate the Elasticsearch index name.
+    Index names must be lowercase and must not contain forbidden characters.
+
+    Args:
+        index_name (str): The index name to validate.
+
+    Returns:
+        bool: True if the index name is valid, False otherwise.
+    """
+    forbidden_chars = [' ', ',', '#', ':', '*', '?', '"', '<', '>', '|', '\\', '/']
+    if not index_name:
+        return False
+    if not index_name.islower():
+        logger.error(f"Invalid index name '{index_name}': must be all lowercase.")
+        return False
+    for char in forbidden_chars:
+        if char in index_name:
+            logger.error(f"Invalid index name '{index_name}': contains forbidden character '{char}'.")
             return False
-        for char in forbidden_chars:
-            if char in index_name:
-                logger.error(f"Invalid index name '{index_name}': contains forbidden character '{char}'.")
-                return False
-        return True
\ No newline at end of file
+    return True
@@ -0,0 +1,341 @@
+from typing import Any, Callable
+import iDataStore as interface
+import threading
+import functools
+import callLog
+import metrics
+import logging
+import queue
+import time
+
+# Set up module-level logger.
+logger = logging.getLogger(__name__)
+#logger.setLevel(logging.DEBUG)
+
+def render_all(renderers: list[Callable[[callLog.CallLogBatch], Any] | None], batch: callLog.CallLogBatch) -> list[Any]:
+    """
+    Render a batch with the renderer of every store of a group; the batch renderer of DataStoreGroup.
+
+    Returns:
+        list[Any]: The payload of each store, or the batch itself for the stores without a renderer.
+    """
+    return [batch if render is None else render(batch) for render in renderers]
+
+
+class DataStoreGroup(interface.IDataStore):
+    """
+    Implementation of the IDataStore interface writing every call log to several stores, one after the other.
+
+    Batches are still rendered once per store, in the serialize stage of the pipeline when the
+    stores provide a renderer. Elasticsearch index management is forwarded to the stores that have an index.
+    """
+
+    def __init__(self, stores: list[interface.IDataStore]) -> None:
+        """
+        Initialize the group.
+
+        Args:
+            stores (list[IDataStore]): The stores, in the order they receive each batch; closed in the same order.
+        """
+        self.stores: list[interface.IDataStore] = stores
+
+    @property
+    def index_exists(self) -> bool:
+        """
+        Returns:
+            bool: Whether the index of every store that has one exists.
+        """
+        return all(store.index_exists for store in self.__indexed())
+
+    def create_mapping(self, mapping: dict) -> None:
+        """
+        Create the missing index of every store that has one.
+
+        Args:
+            mapping (dict): A dictionary defining the index mapping schema.
+        """
+        for store in self.__indexed():
+            if not store.index_exists:
+                store.create_mapping(mapping)
+
+    def insert(self, json_log) -> None:
+        for store in self.stores:
+            store.insert(json_log)
+
+    def insert_many(self, json_logs: list[str]) -> None:
+        for store in self.stores:
+            store.insert_many(json_logs)
+
+    def insert_batch(self, batch: callLog.CallLogBatch) -> None:
+        for store in self.stores:
+            store.insert_batch(batch)
+
+    def batch_renderer(self) -> Callable[[callLog.CallLogBatch], list[Any]]:
+        """
+        Returns:
+            Callable[[CallLogBatch], list[Any]]: render_all bound to the renderers of the stores.
+        """
+        return functools.partial(render_all, [store.batch_renderer() for store in self.stores])
+
+    def insert_rendered(self, payload: list[Any], documents: int) -> None:
+        """
+        Hand each store its part of a batch rendered by batch_renderer().
+
+        Args:
+            payload (list[Any]): The payload of each store, or the batch for the stores without a renderer.
+            documents (int): Number of call logs in the payload.
+        """
+        for store, part in zip(self.stores, payload):
+            if isinstance(part, callLog.CallLogBatch):
+                store.insert_batch(part)
+            else:
+                store.insert_rendered(part, documents)
+
+    def flush(self) -> None:
+        for store in self.stores:
+            store.flush()
+
+    def close(self) -> None:
+        """
+        Close every store, even when closing one of them fails; the first error is raised afterwards.
+        """
+        failure: Exception | None = None
+        for store in self.stores:
+            try:
+                store.close()
+            except Exception as e:
+                logger.error(f"Failed to close {type(store).__name__}: {e}")
+                failure = failure or e
+        if failure is not None:
+            raise failure
+
+    def __indexed(self) -> list[interface.IDataStore]:
+        """
+        Returns:
+            list[IDataStore]: The stores writing to an Elasticsearch index.
+        """
+        return [store for store in self.stores if getattr(store, 'index_name', None)]
+
+
+class SinkWorker:
+    """
+    One destination of a FanOutDataStore: a store written by its own thread from its own bounded queue.
+
+    Once the store has failed, the worker keeps draining its queue, dropping the work, so the
+    producer never blocks on a dead sink.
+    """
+
+    def __init__(self, name: str, store: interface.IDataStore, queue_size: int) -> None:
+        """
+        Initialize the worker and start its thread.
+
+        Args:
+            name (str): Name of the sink, used in the metric names and progress reports, e.g. 'elasticsearch'.
+            store (IDataStore): The store written to.
+            queue_size (int): Capacity of the queue, in batches.
+
+        Attributes:
+            failure (BaseException | None): The error that stopped the store, if any.
+            queued_documents (int): Number of call logs queued and not yet written or dropped.
+        """
+        self.name: str = name
+        self.store: interface.IDataStore = store
+        self.queue: queue.Queue = queue.Queue(queue_size)
+        self.failure: BaseException | None = None
+        self.queued_documents: int = 0
+        self.documents = metrics.REGISTRY.counter(
+            f'sink_{name}_documents_total', f'Call logs written to the {name} sink.')
+        self.dropped = metrics.REGISTRY.counter(
+            f'sink_{name}_documents_dropped_total', f'Call logs dropped after the {name} sink failed.')
+        self.lag = metrics.REGISTRY.histogram(
+            f'sink_{name}_lag_seconds', f'Time between a batch being queued for the {name} sink and being written.')
+        self.__lock = threading.Lock()
+        self.__thread = threading.Thread(target=self.__run, name=f"{name}-sink", daemon=True)
+        self.__thread.start()
+
+    def submit(self, operation: Callable[[], None], documents: int = 0) -> None:
+        """
+        Queue work for the store, waiting while the queue is full.
+
+        Args:
+            operation (Callable[[], None]): Call on the store, run in the worker thread.
+            documents (int): Number of call logs the operation writes.
+        """
+        with self.__lock:
+            self.queued_documents += documents
+        self.queue.put((operation, documents, time.perf_counter()))
+
+    def join(self) -> None:
+        """
+        Wait until all the queued work has been done or dropped.
+        """
+        self.queue.join()
+
+    def stop(self) -> None:
+        """
+        Wait for the queued work and stop the thread.
+        """
+        self.queue.put(None)
+        self.__thread.join()
+
+    def describe(self, elapsed: float) -> str:
+        """
+        Returns:
+            str: Queue depth, lag and throughput of the sink, for progress reports.
+        """
+        state = " FAILED," if self.failure is not None else ""
+        return (f"{self.name}:{state} queue {self.queue.qsize()}/{self.queue.maxsize}, "
+                f"{self.queued_documents} logs behind, p99 lag {self.lag.quantile(0.99):.3f}s, "
+                f"{self.documents.value / elapsed if elapsed > 0 else 0:,.0f} rows/s")
+
+    def __run(self) -> None:
+        """
+        Do the queued work until stop() is called.
+        """
+        while (item := self.queue.get()) is not None:
+            operation, documents, queued = item
+            if self.failure is None:
+                try:
+                    operation()
+                    self.documents.inc(documents)
+                    if documents:
+                        self.lag.observe(time.perf_counter() - queued)
+                except BaseException as e:
+                    self.failure = e
+                    logger.error(f"The {self.name} sink failed: {e}", exc_info=True)
+            if self.failure is not None:
+                self.dropped.inc(documents)
+            with self.__lock:
+                self.queued_documents -= documents
+            self.queue.task_done()
+        self.queue.task_done()
+
+
+class FanOutDataStore(DataStoreGroup):
+    """
+    DataStoreGroup writing to its stores concurrently: each store has a SinkWorker, with its own
+    bounded queue and thread, so a slow store only holds back the others once its queue is full.
+
+    flush() flushes every store at the same time and returns once all of them are done, so a
+    checkpoint still covers every store. When a store fails, the 'block' policy raises its error
+    from the next insert or flush, stopping the run before the next checkpoint; the 'degrade'
+    policy logs it, drops the rest of the run for that store and keeps writing to the others,
+    which only fail the run once every store has failed. The logs dropped in degrade mode are
+    not replayed by later runs, since the checkpoints move on.
+    """
+    FAILURE_POLICIES: tuple[str, ...] = ('block', 'degrade')
+
+    def __init__(self, stores: list[interface.IDataStore], names: list[str], queue_size: int = 8,
+                 failure_policy: str = 'block') -> None:
+        """
+        Initialize the group and start a worker per store.
+
+        Args:
+            stores (list[IDataStore]): The stores; closed in this order.
+            names (list[str]): Name of each store, used in the metric names and progress reports.
+            queue_size (int): Capacity of the queue of each store, in batches.
+            failure_policy (str): What a failing store does to the others: 'block' or 'degrade'.
+
+        Raises:
+            ValueError: If the failure policy is unknown, or there is not one name per store.
+        """
+        if failure_policy not in self.FAILURE_POLICIES:
+            error_msg: str = f"Invalid sink failure policy: {failure_policy}. Must be one of {self.FAILURE_POLICIES}."
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+        if len(names) != len(stores):
+            error_msg: str = f"Expected one name per store, got {len(names)} names for {len(stores)} stores."
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+        super().__init__(stores)
+        self.failure_policy: str = failure_policy
+        self.workers: list[SinkWorker] = [SinkWorker(name, store, queue_size) for name, store in zip(names, stores)]
+        self.__started: float = time.perf_counter()
+        self.__reported: set[str] = set()
+        self.__raised: bool = False
+        logger.info(f"Writing concurrently to: {', '.join(names)} ({failure_policy} on failure)")
+
+    def insert(self, json_log) -> None:
+        for worker in self.__live():
+            worker.submit(functools.partial(worker.store.insert, json_log), 1)
+
+    def insert_many(self, json_logs: list[str]) -> None:
+        for worker in self.__live():
+            worker.submit(functools.partial(worker.store.insert_many, json_logs), len(json_logs))
+
+    def insert_batch(self, batch: callLog.CallLogBatch) -> None:
+        for worker in self.__live():
+            worker.submit(functools.partial(worker.store.insert_batch, batch), len(batch))
+
+    def insert_rendered(self, payload: list[Any], documents: int) -> None:
+        """
+        Queue each store its part of a batch rendered by batch_renderer().
+
+        Args:
+            payload (list[Any]): The payload of each store, or the batch for the stores without a renderer.
+            documents (int): Number of call logs in the payload.
+        """
+        for worker, part in zip(self.__live(), payload):
+            if isinstance(part, callLog.CallLogBatch):
+                worker.submit(functools.partial(worker.store.insert_batch, part), documents)
+            else:
+                worker.submit(functools.partial(worker.store.insert_rendered, part, documents), documents)
+
+    def flush(self) -> None:
+        """
+        Flush every store concurrently and wait until all of them are done.
+
+        Raises:
+            Exception: The error of a failed store, under the 'block' policy or once every store has failed.
+        """
+        for worker in self.__live():
+            worker.submit(worker.store.flush)
+        for worker in self.workers:
+            worker.join()
+        self.__live()
+
+    def report(self) -> str:
+        """
+        Returns:
+            str: Queue depth, lag and throughput of every store since the group started.
+        """
+        elapsed = time.perf_counter() - self.__started
+        return " | ".join(worker.describe(elapsed) for worker in self.workers)
+
+    def close(self) -> None:
+        """
+        Flush and close every store, even when one of them fails; the first error is raised afterwards,
+        unless the failure policy already raised it during the run.
+        """
+        try:
+            for worker in self.workers:
+                if worker.failure is None:
+                    worker.submit(worker.store.flush)
+            for worker in self.workers:
+                worker.stop()
+            logger.info(f"Sinks: {self.report()}")
+        finally:
+            super().close()
+        if not self.__raised:
+            self.__live()
+
+    def __live(self) -> list[SinkWorker]:
+        """
+        Apply the failure policy to the failed stores.
+
+        Returns:
+            list[SinkWorker]: The workers, in store order; failed ones keep draining their queue.
+
+        Raises:
+            Exception: The error of a failed store, under the 'block' policy or once every store has failed.
+        """
+        for worker in self.workers:
+            if worker.failure is not None and worker.name not in self.__reported:
+                self.__reported.add(worker.name)
+                if self.failure_policy == 'degrade':
+                    logger.warning(f"Continuing without the {worker.name} sink, its logs are dropped.")
+        failures = [worker.failure for worker in self.workers if worker.failure is not None]
+        if failures and (self.failure_policy == 'block' or len(failures) == len(self.workers)):
+            self.__raised = True
+            raise failures[0]
+        return self.workers
@@ -0,0 +1,298 @@
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+import callLog
+import logging
+import time
+import csv
+import sys
+
+# Set up module-level logger.
+logger = logging.getLogger(__name__)
+#logger.setLevel(logging.DEBUG)
+
+class RejectChannel:
+    """
+    Counts the rows that cannot be parsed and logs them, at most max_logged per interval seconds.
+    The rows dropped by a RowFilter are counted here too, apart from the rejected ones.
+    """
+
+    def __init__(self, max_logged: int = 10, interval: float = 60.0) -> None:
+        """
+        Initialize the reject channel.
+
+        Args:
+            max_logged (int): Maximum number of rejected rows logged per interval.
+            interval (float): Length in seconds of the rate-limiting window.
+
+        Attributes:
+            rejected (int): Total number of rows rejected.
+            filtered (int): Total number of rows dropped by the row filter.
+        """
+        self.rejected: int = 0
+        self.filtered: int = 0
+        self.__max_logged = max_logged
+        self.__interval = interval
+        self.__window_start: float = time.monotonic()
+        self.__logged_in_window: int = 0
+        self.__suppressed: int = 0
+
+    def reject(self, csv_file: Path, row_number: int, line: bytes, reason: Exception | str) -> None:
+        """
+        Count a malformed row and log it unless the rate limit is reached.
+
+        Args:
+            csv_file (Path): File the row comes from.
+            row_number (int): Number of the data row in the file, starting from 1.
+            line (bytes): The raw line.
+            reason (Exception | str): Why the row was rejected.
+        """
+        self.rejected += 1
+        now = time.monotonic()
+        if now - self.__window_start >= self.__interval:
+            if self.__suppressed:
+                logger.warning(f"{self.__suppressed} more malformed rows were not logged in the last {self.__interval:.0f}s")
+            self.__window_start = now
+            self.__logged_in_window = 0
+            self.__suppressed = 0
+        if self.__logged_in_window < self.__max_logged:
+            self.__logged_in_window += 1
+            logger.error(f"Skipping malformed row {row_number} of {csv_file}: {reason}. Row: {line[:200]!r}")
+        else:
+            self.__suppressed += 1
+
+
+class RowFilter:
+    """
+    Time window and row predicates pushed down into the loader, to skip the input a run does not need.
+
+    A row passes when its timestamp is in [start, end), its status starts with one of the status
+    prefixes and its caller and receiver are in the caller and receiver sets; unset conditions always
+    pass. The files are named after the hour they hold (see FILE_HOUR_FORMAT), so the files whose hour
+    falls outside the window are not even opened, and the rows of the files whose hour lies within it
+    are not compared with the window. Bounds with an offset are converted to naive UTC, and naive
+    ones are taken as UTC like the row timestamps.
+    """
+    # strftime format of the hour encoded at the start of the file names, e.g. 2025-01-01T08.00_logs.csv.
+    FILE_HOUR_FORMAT: str = '%Y-%m-%dT%H.00'
+    HOUR: timedelta = timedelta(hours=1)
+
+    def __init__(self, start: datetime | None = None, end: datetime | None = None, statuses: tuple[str, ...] = (),
+                 callers: frozenset[str] | None = None, receivers: frozenset[str] | None = None) -> None:
+        """
+        Initialize the filter.
+
+        Args:
+            start (datetime | None): Smallest call timestamp, None for no bound.
+            end (datetime | None): Call timestamp the rows are before, None for no bound.
+            statuses (tuple[str, ...]): Prefixes one of which the status must start with, empty for any status.
+            callers (frozenset[str] | None): Callers the rows must have, None for any caller.
+            receivers (frozenset[str] | None): Receivers the rows must have, None for any receiver.
+
+        Raises:
+            ValueError: If the window is empty.
+        """
+        start, end = naive_utc(start), naive_utc(end)
+        if start is not None and end is not None and start >= end:
+            error_msg: str = f"Invalid time window: start {start.isoformat()} must be before end {end.isoformat()}"
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+        self.start: datetime | None = start
+        self.end: datetime | None = end
+        self.statuses: tuple[str, ...] = tuple(statuses)
+        self.callers: frozenset[str] | None = frozenset(callers) if callers is not None else None
+        self.receivers: frozenset[str] | None = frozenset(receivers) if receivers is not None else None
+
+    @property
+    def active(self) -> bool:
+        """
+        Returns:
+            bool: Whether any condition is set.
+        """
+        return (self.start is not None or self.end is not None or bool(self.statuses)
+                or self.callers is not None or self.receivers is not None)
+
+    def __str__(self) -> str:
+        conditions = []
+        if self.start is not None or self.end is not None:
+            conditions.append(f"window [{self.start.isoformat() if self.start else '-'}, "
+                              f"{self.end.isoformat() if self.end else '-'})")
+        if self.statuses:
+            conditions.append(f"status prefixes {list(self.statuses)}")
+        if self.callers is not None:
+            conditions.append(f"{len(self.callers)} callers")
+        if self.receivers is not None:
+            conditions.append(f"{len(self.receivers)} receivers")
+        return ", ".join(conditions) or "no conditions"
+
+    @classmethod
+    def file_hour(cls, csv_file: Path) -> datetime | None:
+        """
+        Returns:
+            datetime | None: The hour encoded in the file name before its first '_', None when there is none.
+        """
+        try:
+            return datetime.strptime(csv_file.name.split('_', 1)[0], cls.FILE_HOUR_FORMAT)
+        except ValueError:
+            return None
+
+    def skips_file(self, csv_file: Path) -> bool:
+        """
+        Returns:
+            bool: Whether the hour of the file falls outside the window, so none of its rows can pass.
+        """
+        if self.start is None and self.end is None:
+            return False
+        hour = self.file_hour(csv_file)
+        if hour is None:
+            return False
+        return (self.end is not None and hour >= self.end) or (self.start is not None and hour + self.HOUR <= self.start)
+
+    def for_file(self, csv_file: Path) -> "RowFilter | None":
+        """
+        Returns:
+            RowFilter | None: The filter the rows of the file go through: without the window when the
+                hour of the file lies within it, None when no condition is left.
+        """
+        if self.start is not None or self.end is not None:
+            hour = self.file_hour(csv_file)
+            if (hour is not None and (self.start is None or self.start <= hour)
+                    and (self.end is None or hour + self.HOUR <= self.end)):
+                row_filter = RowFilter(None, None, self.statuses, self.callers, self.receivers)
+                return row_filter if row_filter.active else None
+        return self if self.active else None
+
+    def matches(self, timestamp: datetime, caller: str, receiver: str, status: str) -> bool:
+        """
+        Returns:
+            bool: Whether a row with these fields passes every condition.
+        """
+        if timestamp.tzinfo is not None:
+            timestamp = naive_utc(timestamp)
+        return ((self.start is None or timestamp >= self.start) and (self.end is None or timestamp < self.end)
+                and (not self.statuses or status.startswith(self.statuses))
+                and (self.callers is None or caller in self.callers)
+                and (self.receivers is None or receiver in self.receivers))
+
+
+def naive_utc(value: datetime | None) -> datetime | None:
+    """
+    Returns:
+        datetime | None: The timestamp converted to UTC without its offset; naive timestamps are taken as UTC.
+    """
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class RowDecoder:
+    """
+    Decodes the raw lines of one CSV file into CallLog objects or CallLogBatch columns.
+
+    Columns are mapped by position once from the header, so rows are split with str.split
+    instead of going through csv.DictReader; only rows containing quotes, possibly spanning several
+    lines (see loader.read_records), take the csv module path.
+    With a RowFilter, the rows it drops are neither converted nor handed over. Rows whose timestamp
+    has sub-second precision or a UTC offset are rejected, since CallLogBatch would have to rewrite it.
+    """
+    COLUMNS: tuple[str, ...] = ('timestamp', 'caller', 'receiver', 'duration', 'status', 'uniqueCallReference')
+
+    def __init__(self, header: list[str], csv_file: Path, rejects: RejectChannel,
+                 row_filter: RowFilter | None = None) -> None:
+        """
+        Initialize the decoder from the header of the file.
+
+        Args:
+            header (list[str]): Column names read from the first line of the file.
+            csv_file (Path): File being decoded, used when reporting rejected rows.
+            rejects (RejectChannel): Channel receiving the malformed rows, and counting the filtered ones.
+            row_filter (RowFilter | None): Conditions the rows must pass, None to keep every row.
+
+        Raises:
+            ValueError: If a required column is missing from the header.
+        """
+        header = [name.strip() for name in header]
+        missing = [name for name in self.COLUMNS if name not in header]
+        if missing:
+            raise ValueError(f"missing columns {missing} in header {header}")
+        self.__width = len(header)
+        (self.__timestamp, self.__caller, self.__receiver,
+         self.__duration, self.__status, self.__reference) = (header.index(name) for name in self.COLUMNS)
+        self.__csv_file = csv_file
+        self.__rejects = rejects
+        self.__row_filter = row_filter.for_file(csv_file) if row_filter is not None else None
+        self.__statuses: dict[str, str] = {}
+        self.__last_timestamp: tuple[str, datetime | None] = ('', None)
+
+    def decode(self, line: bytes, row_number: int) -> callLog.CallLog | None:
+        """
+        Decode a raw line.
+
+        Args:
+            line (bytes): The raw line, including its line terminator.
+            row_number (int): Number of the data row in the file, used when the row is rejected.
+
+        Returns:
+            CallLog | None: The decoded call log, or None for blank, malformed and filtered lines.
+        """
+        fields = self.__decode_fields(line, row_number)
+        return callLog.CallLog(*fields) if fields is not None else None
+
+    def decode_into(self, line: bytes, row_number: int, batch: callLog.CallLogBatch) -> None:
+        """
+        Decode a raw line and append it to a batch, without building a CallLog instance.
+
+        Args:
+            line (bytes): The raw line, including its line terminator.
+            row_number (int): Number of the data row in the file, used when the row is rejected.
+            batch (CallLogBatch): Batch receiving the decoded row; blank, malformed and filtered lines are not appended.
+        """
+        fields = self.__decode_fields(line, row_number)
+        if fields is not None:
+            batch.append(*fields)
+
+    def __decode_fields(self, line: bytes, row_number: int) -> tuple[datetime, str, str, int, str, str] | None:
+        """
+        Split and convert a raw line into the CallLog fields, in constructor order.
+
+        Returns:
+            tuple | None: The fields, or None for blank, malformed and filtered lines.
+        """
+        try:
+            text = line.decode('utf-8')
+            if '"' in text:
+                fields = next(csv.reader([text]), [])
+            else:
+                fields = text.rstrip('\r\n').split(',')
+            if len(fields) != self.__width:
+                if len(fields) <= 1 and not text.strip():
+                    return None
+                raise ValueError(f"expected {self.__width} fields, found {len(fields)}")
+
+            # Rows are sorted by time, so consecutive rows often share the same second.
+            raw_timestamp = fields[self.__timestamp]
+            last_raw_timestamp, timestamp = self.__last_timestamp
+            if raw_timestamp != last_raw_timestamp:
+                timestamp = datetime.fromisoformat(raw_timestamp)
+                callLog.check_timestamp(timestamp)
+                self.__last_timestamp = (raw_timestamp, timestamp)
+
+            status = fields[self.__status]
+            if self.__row_filter is not None and not self.__row_filter.matches(
+                    timestamp, fields[self.__caller], fields[self.__receiver], status):
+                self.__rejects.filtered += 1
+                return None
+            interned_status = self.__statuses.get(status)
+            if interned_status is None:
+                interned_status = self.__statuses[status] = sys.intern(status)
+
+            return (
+                timestamp,
+                fields[self.__caller],
+                fields[self.__receiver],
+                int(fields[self.__duration]),
+                interned_status,
+                fields[self.__reference]
+            )
+        except (ValueError, UnicodeDecodeError) as e:
+            self.__rejects.reject(self.__csv_file, row_number, line, e)
+            return None
@@ -0,0 +1,192 @@
+from hashlib import blake2b
+from pathlib import Path
+from array import array
+import callLog
+import logging
+import struct
+import math
+import os
+
+# Set up module-level logger.
+logger = logging.getLogger(__name__)
+#logger.setLevel(logging.DEBUG)
+
+class DedupFilter:
+    """
+    Bloom filter of the uniqueCallReference values already ingested, used to drop duplicate call logs
+    before they are serialized and sent.
+
+    Memory is fixed by the capacity and the false positive rate: a reference never seen before is
+    wrongly taken for a duplicate with probability error_rate, as long as fewer than capacity
+    references have been added. The filter can be saved to a file and reloaded by the next run.
+
+    It is a blocked Bloom filter: all the bits of a reference fall in one 64-bit word, so an
+    addition is one hash, one mask and one word update instead of a loop over scattered bits.
+    This needs more memory than a classic Bloom filter for the same error rate: about 2x at 1e-4.
+    """
+    MAGIC: bytes = b'CLBF'
+    HEADER: struct.Struct = struct.Struct('<4sBQQBdQ')
+    VERSION: int = 1
+    MAX_HASHES: int = 16
+    # Single-bit masks of a 64-bit word.
+    _BITS: tuple[int, ...] = tuple(1 << bit for bit in range(64))
+    # Maps a hash byte to a bit position within the word.
+    _BIT_POSITIONS: bytes = bytes(range(64)) * 4
+
+    def __init__(self, capacity: int = 1_000_000, error_rate: float = 0.0001, filter_path: str | None = None) -> None:
+        """
+        Initialize the filter, loading it from filter_path if it was saved with the same capacity and error rate.
+
+        Args:
+            capacity (int): Number of references the filter is sized for.
+            error_rate (float): False positive rate at capacity, between 0 and 1.
+            filter_path (str | None): File the filter is loaded from and saved to; None keeps it in memory.
+
+        Attributes:
+            count (int): Number of distinct references added.
+            skipped (int): Number of duplicate call logs dropped by filter_batch().
+
+        Raises:
+            ValueError: If capacity is lower than 1 or error_rate is not between 0 and 1.
+        """
+        if capacity < 1 or not 0 < error_rate < 1:
+            error_msg: str = f"Invalid dedup filter: capacity {capacity} must be >= 1 and error rate {error_rate} between 0 and 1."
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+        self.capacity: int = capacity
+        self.error_rate: float = error_rate
+        self.count: int = 0
+        self.skipped: int = 0
+        self.__filter_path = Path(filter_path) if filter_path else None
+        self.__blocks, self.__hashes = self.__dimensions(capacity, error_rate)
+        self.__words = array('Q', bytes(8 * self.__blocks))
+        self.__saturation_logged: bool = False
+        if self.__filter_path and self.__filter_path.is_file():
+            self.__load()
+        logger.info(f"Dedup filter sized for {capacity} references at {error_rate:g} false positives: "
+                    f"{self.__blocks * 8 / 1024 / 1024:.1f} MiB, {self.__hashes} hashes, {self.count} references loaded")
+
+    def add(self, reference: str) -> bool:
+        """
+        Add a reference to the filter.
+
+        Args:
+            reference (str): The uniqueCallReference of a call log.
+
+        Returns:
+            bool: True if the reference was not in the filter, False if it was (or is a false positive).
+        """
+        digest = blake2b(reference.encode('utf-8'), digest_size=8 + self.__hashes).digest()
+        block = int.from_bytes(digest[:8], 'little') % self.__blocks
+        bits = self._BITS
+        mask = 0
+        for position in digest[8:].translate(self._BIT_POSITIONS):
+            mask |= bits[position]
+        word = self.__words[block]
+        new = word & mask != mask
+        if new:
+            self.__words[block] = word | mask
+            self.count += 1
+            if self.count > self.capacity and not self.__saturation_logged:
+                self.__saturation_logged = True
+                logger.warning(f"Dedup filter holds more than its capacity of {self.capacity} references, "
+                               f"its false positive rate is now above {self.error_rate:g}")
+        return new
+
+    def filter_batch(self, batch: callLog.CallLogBatch) -> callLog.CallLogBatch:
+        """
+        Drop the call logs whose reference was already added, adding the others.
+
+        Args:
+            batch (CallLogBatch): The call logs to filter.
+
+        Returns:
+            CallLogBatch: The batch itself when it has no duplicates, otherwise a batch without them.
+        """
+        add = self.add
+        kept = [index for index, reference in enumerate(batch.uniqueCallReferences) if add(reference)]
+        if len(kept) == len(batch):
+            return batch
+        self.skipped += len(batch) - len(kept)
+        return batch.take(kept)
+
+    def save(self) -> None:
+        """
+        Write the filter to filter_path, replacing the previous file atomically.
+        Call it only once the sink has confirmed every call log added, e.g. after DataStore.flush().
+        """
+        if not self.__filter_path:
+            return
+        temporary_path = self.__filter_path.with_name(self.__filter_path.name + '.tmp')
+        with open(temporary_path, 'wb') as file:
+            file.write(self.HEADER.pack(self.MAGIC, self.VERSION, self.capacity, self.__blocks,
+                                        self.__hashes, self.error_rate, self.count))
+            file.write(self.__words.tobytes())
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary_path, self.__filter_path)
+        logger.debug(f"Saved dedup filter with {self.count} references to: {self.__filter_path}")
+
+    def __load(self) -> None:
+        """
+        Load the bits saved by a previous run, unless the file is unreadable or was sized differently.
+        """
+        try:
+            with open(self.__filter_path, 'rb') as file:
+                magic, version, capacity, blocks, hashes, error_rate, count = self.HEADER.unpack(file.read(self.HEADER.size))
+                if magic != self.MAGIC or version != self.VERSION:
+                    raise ValueError("not a dedup filter file")
+                if (capacity, blocks, hashes, error_rate) != (self.capacity, self.__blocks, self.__hashes, self.error_rate):
+                    logger.warning(f"Ignoring dedup filter {self.__filter_path} sized for {capacity} references at "
+                                   f"{error_rate:g}, the configuration asks for {self.capacity} at {self.error_rate:g}")
+                    return
+                words = file.read()
+                if len(words) != 8 * self.__blocks:
+                    raise ValueError("truncated dedup filter file")
+            self.__words = array('Q', words)
+            self.count = count
+        except (OSError, ValueError, struct.error) as e:
+            logger.warning(f"Ignoring unreadable dedup filter {self.__filter_path}: {e}", exc_info=True)
+
+    @classmethod
+    def __dimensions(cls, capacity: int, error_rate: float) -> tuple[int, int]:
+        """
+        Find the smallest number of 64-bit blocks, and the number of bits per reference, meeting
+        the error rate at capacity.
+
+        With capacity references spread over the blocks, the load of a block follows a Poisson
+        distribution; the false positive rate is the probability that every bit of a new
+        reference is already set in its block, averaged over that distribution.
+
+        Returns:
+            tuple[int, int]: Number of blocks and number of hashes.
+        """
+        def false_positive_rate(blocks: int, hashes: int) -> float:
+            load = capacity / blocks
+            rate, probability, references = 0.0, math.exp(-load), 0
+            while references < load + 12 * math.sqrt(load) + 30:
+                rate += probability * (1 - (63 / 64) ** (hashes * references)) ** hashes
+                references += 1
+                probability *= load / references
+            return rate
+
+        # A blocked filter cannot beat the size of a classic Bloom filter, which bounds the search.
+        classic_blocks = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2 / 64)
+        best: tuple[int, int] | None = None
+        for hashes in range(1, cls.MAX_HASHES + 1):
+            low, high = classic_blocks, classic_blocks * 16
+            if false_positive_rate(high, hashes) > error_rate:
+                continue
+            while low < high:
+                middle = (low + high) // 2
+                if false_positive_rate(middle, hashes) <= error_rate:
+                    high = middle
+                else:
+                    low = middle + 1
+            if best is None or low < best[0]:
+                best = (low, hashes)
+        if best is None:
+            error_msg: str = f"Dedup filter error rate {error_rate:g} is too low for a blocked Bloom filter."
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+        return best
@@ -0,0 +1,510 @@
+from datetime import datetime, timezone
+from typing import Iterator
+from pathlib import Path
+from array import array
+import callLog
+import hashlib
+import logging
+import bisect
+import heapq
+import json
+import mmap
+import os
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Set up module-level logger.
+logger = logging.getLogger(__name__)
+#logger.setLevel(logging.DEBUG)
+
+# Indexed fields: name of the field in the index, key of the field in the exported documents.
+FIELDS: dict[str, str] = {
+    'timestamp': 'timestamp',
+    'caller': 'caller',
+    'receiver': 'receiver',
+    'reference': 'UniqueCallReference',
+}
+
+def seconds_of(timestamp: str) -> int:
+    """
+    Convert an ISO 8601 timestamp to seconds since the epoch, UTC; naive timestamps are taken as UTC.
+    """
+    value = datetime.fromisoformat(timestamp)
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return int((value - callLog.EPOCH).total_seconds())
+
+def hash_key(value: str) -> int:
+    """
+    Returns:
+        int: Stable signed 64-bit hash of a field value, the key of its posting list.
+    """
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'little', signed=True)
+
+
+class ExportIndex:
+    """
+    Sidecar index over the NDJSON export file, answering time-range and equality lookups on
+    timestamp, caller, receiver and uniqueCallReference without scanning the export.
+
+    Rows are numbered in file order. The index directory, next to the export (export.log.index/),
+    holds the byte offset and timestamp of every row, in row order, and runs of sorted (key, row)
+    pairs per field: timestamps for the time index, 64-bit hashes of the values for the posting
+    lists of the other fields. Hash collisions are removed by checking the documents read.
+
+    The export is append-only, so update() only parses the rows written since the last update and
+    adds them as a new run; runs of similar size are merged as they pile up, keeping their number
+    logarithmic in the number of updates. Every file is memory-mapped, so opening the index costs
+    the same for ten thousand or ten million rows. A rewritten or truncated export, detected by a
+    fingerprint of its first bytes, is indexed again from scratch.
+    """
+    FINGERPRINT_BYTES: int = 64 * 1024
+    # Rows parsed and sorted at once, which bounds the memory of an update.
+    RUN_ROWS: int = 4 * 1024 * 1024
+    READ_BYTES: int = 16 * 1024 * 1024
+    VERSION: int = 1
+
+    def __init__(self, export_path: str, index_path: str | None = None) -> None:
+        """
+        Open the index of an export file; call update() to catch up with the export.
+
+        Args:
+            export_path (str): The NDJSON export file.
+            index_path (str | None): Directory of the index, by default the export path followed by '.index'.
+
+        Raises:
+            FileNotFoundError: If the export file does not exist.
+        """
+        self.export_path = Path(export_path)
+        if not self.export_path.is_file():
+            error_msg: str = f"Export file not found: {self.export_path}"
+            logger.error(error_msg)
+            raise FileNotFoundError(error_msg)
+        self.index_path = Path(index_path) if index_path else self.export_path.with_name(self.export_path.name + '.index')
+        self.index_path.mkdir(parents=True, exist_ok=True)
+        self.__manifest: dict = self.__load_manifest()
+        self.__runs: list[_Run] = []
+        self.__offsets: _Column | None = None
+        self.__timestamps: _Column | None = None
+        self.__export: mmap.mmap | None = None
+        self.__open()
+
+    @property
+    def rows(self) -> int:
+        """
+        int: Number of rows indexed.
+        """
+        return self.__manifest['rows']
+
+    def update(self) -> int:
+        """
+        Index the rows appended to the export since the last update; a trailing line still being
+        written is left for the next update.
+
+        Returns:
+            int: Number of rows added to the index.
+        """
+        with open(self.index_path / 'lock', 'wb') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            # Another process may have updated the index while this one waited for the lock.
+            self.__manifest = self.__load_manifest()
+            size = self.export_path.stat().st_size
+            indexed = self.__manifest['bytes']
+            if size < indexed or (indexed and self.__fingerprint(indexed) != self.__manifest['fingerprint']):
+                logger.warning(f"Export {self.export_path} was rewritten since it was indexed, indexing it again")
+                self.__close()
+                self.__clear()
+                self.__manifest = self.__empty_manifest()
+                indexed = 0
+            added = self.__append(indexed, size)
+            self.__close()
+            self.__open()
+            return added
+
+    def query(self, start: int | None = None, end: int | None = None, caller: str | None = None,
+              receiver: str | None = None, reference: str | None = None) -> Iterator[bytes]:
+        """
+        Find the exported documents matching every given condition, by increasing timestamp.
+
+        Args:
+            start (int | None): Smallest call timestamp, in seconds since the epoch, None for no bound.
+            end (int | None): Call timestamp the documents are before, in seconds since the epoch, None for no bound.
+            caller (str | None): Caller the documents must have.
+            receiver (str | None): Receiver the documents must have.
+            reference (str | None): uniqueCallReference the documents must have.
+
+        Yields:
+            bytes: The matching NDJSON documents, without line terminator.
+        """
+        if self.__export is None:
+            return
+        equalities = {field: value for field, value in
+                      (('caller', caller), ('receiver', receiver), ('reference', reference)) if value is not None}
+        low = start if start is not None else -2 ** 63
+        high = end if end is not None else 2 ** 63 - 1
+        if equalities:
+            candidates: set[int] | None = None
+            # Rarest value first, so the intersections stay small.
+            for field, value in sorted(equalities.items(), key=lambda item: self.__count(*item)):
+                rows = set(self.__postings(field, hash_key(value)))
+                candidates = rows if candidates is None else candidates & rows
+                if not candidates:
+                    return
+            timestamps = self.__timestamps.values
+            rows = sorted((timestamps[row], row) for row in candidates if low <= timestamps[row] < high)
+        else:
+            rows = heapq.merge(*(run.range('timestamp', low, high) for run in self.__runs))
+        for _, row in rows:
+            document = self.__document(row)
+            if equalities:
+                values = json.loads(document)
+                if any(values[FIELDS[field]] != value for field, value in equalities.items()):
+                    continue
+            yield document
+
+    def close(self) -> None:
+        """
+        Release the memory-mapped files.
+        """
+        self.__close()
+
+    def __enter__(self) -> "ExportIndex":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def __count(self, field: str, value: str) -> int:
+        """
+        Returns:
+            int: Length of the posting list of a value.
+        """
+        key = hash_key(value)
+        return sum(len(run.range(field, key, key + 1)) for run in self.__runs)
+
+    def __postings(self, field: str, key: int) -> Iterator[int]:
+        """
+        Yields:
+            int: The rows whose field hashes to key, in the runs of the index.
+        """
+        for run in self.__runs:
+            for _, row in run.range(field, key, key + 1):
+                yield row
+
+    def __document(self, row: int) -> bytes:
+        """
+        Returns:
+            bytes: The NDJSON document of a row, without line terminator.
+        """
+        offsets = self.__offsets.values
+        begin = offsets[row]
+        finish = offsets[row + 1] if row + 1 < len(offsets) else self.__manifest['bytes']
+        return self.__export[begin:finish].rstrip(b"\r\n")
+
+    def __append(self, indexed: int, size: int) -> int:
+        """
+        Parse the complete lines of the export between two byte offsets and add them to the index,
+        as one run per RUN_ROWS rows; the manifest is saved after every run, so an interrupted
+        update of a large export resumes where it stopped.
+
+        Returns:
+            int: Number of rows added.
+        """
+        added = 0
+        offsets = array('q')
+        keys: dict[str, array] = {field: array('q') for field in FIELDS}
+        # Seconds of each call hour, and hash of each caller and receiver, which repeat across rows.
+        hours: dict[str, int] = {}
+        numbers: dict[str, int] = {}
+        position = indexed
+        for offset, line in self.__lines(indexed, size):
+            position = offset + len(line)
+            if not line.strip():
+                continue
+            try:
+                document = json.loads(line.decode('utf-8'))
+                timestamp: str = document['timestamp']
+                if len(timestamp) == 19:
+                    hour = hours.get(timestamp[:13])
+                    if hour is None:
+                        hour = hours[timestamp[:13]] = seconds_of(timestamp[:13] + ':00:00')
+                    seconds = hour + int(timestamp[14:16]) * 60 + int(timestamp[17:19])
+                else:
+                    seconds = seconds_of(timestamp)
+                caller, receiver = document['caller'], document['receiver']
+                caller_key = numbers.get(caller)
+                if caller_key is None:
+                    caller_key = numbers[caller] = hash_key(caller)
+                receiver_key = numbers.get(receiver)
+                if receiver_key is None:
+                    receiver_key = numbers[receiver] = hash_key(receiver)
+                reference_key = hash_key(document['UniqueCallReference'])
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                logger.warning(f"Skipping unreadable export line at byte {offset}: {e}")
+                continue
+            offsets.append(offset)
+            keys['timestamp'].append(seconds)
+            keys['caller'].append(caller_key)
+            keys['receiver'].append(receiver_key)
+            keys['reference'].append(reference_key)
+            if len(offsets) >= self.RUN_ROWS:
+                added += self.__add_run(offsets, keys, position)
+                offsets = array('q')
+                keys = {field: array('q') for field in FIELDS}
+                if len(numbers) > self.RUN_ROWS:
+                    numbers.clear()
+        if position > self.__manifest['bytes']:
+            added += self.__add_run(offsets, keys, position)
+        if added:
+            logger.info(f"Indexed {added} rows of {self.export_path} ({self.rows} in total, {len(self.__manifest['runs'])} runs)")
+        return added
+
+    def __lines(self, indexed: int, size: int) -> Iterator[tuple[int, bytes]]:
+        """
+        Read the complete lines of the export between two byte offsets, READ_BYTES at a time.
+
+        Yields:
+            tuple[int, bytes]: The byte offset of each line and the line, with its terminator.
+        """
+        with open(self.export_path, 'rb') as export:
+            export.seek(indexed)
+            position, remaining, pending = indexed, size - indexed, b""
+            while remaining > 0:
+                block = export.read(min(self.READ_BYTES, remaining))
+                if not block:
+                    break
+                remaining -= len(block)
+                block = pending + block
+                end = block.rfind(b"\n") + 1
+                block, pending = block[:end], block[end:]
+                for line in block.splitlines(keepends=True):
+                    yield position, line
+                    position += len(line)
+
+    def __add_run(self, offsets: array, keys: dict[str, array], position: int) -> int:
+        """
+        Add parsed rows to the index, up to byte position of the export, and save the manifest.
+
+        Returns:
+            int: Number of rows added.
+        """
+        first_row = self.rows
+        rows = len(offsets)
+        self.__write_column('offsets', offsets, first_row)
+        self.__write_column('timestamps', keys['timestamp'], first_row)
+        if rows:
+            self.__manifest['runs'].append(self.__write_run(keys, first_row))
+        self.__manifest['rows'] = first_row + rows
+        self.__manifest['bytes'] = position
+        self.__manifest['fingerprint'] = self.__fingerprint(position)
+        self.__compact()
+        self.__save_manifest()
+        return rows
+
+    def __write_run(self, keys: dict[str, array], first_row: int) -> dict:
+        """
+        Sort the keys of new rows into the files of a run.
+
+        Returns:
+            dict: The manifest entry of the run.
+        """
+        name = f"run-{self.__manifest['next_run']:06d}"
+        self.__manifest['next_run'] += 1
+        for field, values in keys.items():
+            order = sorted(range(len(values)), key=values.__getitem__)
+            _write_array(self.index_path / f"{name}.{field}.keys", array('q', map(values.__getitem__, order)))
+            _write_array(self.index_path / f"{name}.{field}.rows", array('q', (first_row + i for i in order)))
+        return {'name': name, 'rows': len(keys['timestamp'])}
+
+    def __compact(self) -> None:
+        """
+        Merge the newest run into the previous one while they are of similar size.
+        """
+        runs = self.__manifest['runs']
+        while len(runs) > 1 and runs[-2]['rows'] <= 4 * runs[-1]['rows']:
+            newer, older = runs.pop(), runs.pop()
+            name = f"run-{self.__manifest['next_run']:06d}"
+            self.__manifest['next_run'] += 1
+            for field in FIELDS:
+                keys = _read_array(self.index_path / f"{older['name']}.{field}.keys")
+                keys.extend(_read_array(self.index_path / f"{newer['name']}.{field}.keys"))
+                rows = _read_array(self.index_path / f"{older['name']}.{field}.rows")
+                rows.extend(_read_array(self.index_path / f"{newer['name']}.{field}.rows"))
+                # Timsort merges the two sorted halves in linear time, and keeps equal keys in row order.
+                order = sorted(range(len(keys)), key=keys.__getitem__)
+                _write_array(self.index_path / f"{name}.{field}.keys", array('q', map(keys.__getitem__, order)))
+                _write_array(self.index_path / f"{name}.{field}.rows", array('q', map(rows.__getitem__, order)))
+            runs.append({'name': name, 'rows': older['rows'] + newer['rows']})
+            logger.debug(f"Merged {older['name']} and {newer['name']} into {name}")
+
+    def __write_column(self, name: str, values: array, first_row: int) -> None:
+        """
+        Append the values of new rows to a row-order column, dropping what an interrupted update left after first_row.
+        """
+        with open(self.index_path / f"{name}.bin", 'ab') as column:
+            column.truncate(first_row * values.itemsize)
+            values.tofile(column)
+
+    def __open(self) -> None:
+        """
+        Memory-map the export and the files of the index listed in the manifest.
+        """
+        if not self.rows:
+            return
+        if self.export_path.stat().st_size < self.__manifest['bytes']:
+            logger.warning(f"Export {self.export_path} is smaller than its index, update() indexes it again")
+            return
+        self.__offsets = _Column(self.index_path / 'offsets.bin', self.rows)
+        self.__timestamps = _Column(self.index_path / 'timestamps.bin', self.rows)
+        self.__runs = [_Run(self.index_path, run['name']) for run in self.__manifest['runs']]
+        with open(self.export_path, 'rb') as export:
+            self.__export = mmap.mmap(export.fileno(), self.__manifest['bytes'], access=mmap.ACCESS_READ)
+
+    def __close(self) -> None:
+        """
+        Release the memory-mapped files and delete the run files no longer in the manifest.
+        """
+        for run in self.__runs:
+            run.close()
+        for column in (self.__offsets, self.__timestamps):
+            if column is not None:
+                column.close()
+        if self.__export is not None:
+            self.__export.close()
+        self.__runs, self.__offsets, self.__timestamps, self.__export = [], None, None, None
+        live = {run['name'] for run in self.__manifest['runs']}
+        for path in self.index_path.glob('run-*'):
+            if path.name.split('.')[0] not in live:
+                path.unlink(missing_ok=True)
+
+    def __clear(self) -> None:
+        """
+        Delete every file of the index but the lock.
+        """
+        for path in self.index_path.iterdir():
+            if path.name != 'lock':
+                path.unlink(missing_ok=True)
+
+    def __fingerprint(self, size: int) -> str:
+        """
+        Returns:
+            str: SHA-256 of the first bytes of the export, up to size.
+        """
+        with open(self.export_path, 'rb') as export:
+            return hashlib.sha256(export.read(min(size, self.FINGERPRINT_BYTES))).hexdigest()
+
+    def __empty_manifest(self) -> dict:
+        return {'version': self.VERSION, 'rows': 0, 'bytes': 0, 'fingerprint': None, 'next_run': 0, 'runs': []}
+
+    def __load_manifest(self) -> dict:
+        """
+        Returns:
+            dict: The manifest of the index, empty when missing, unreadable or of another version.
+        """
+        manifest_path = self.index_path / 'manifest.json'
+        if manifest_path.is_file():
+            try:
+                manifest = json.loads(manifest_path.read_text(encoding='utf-8'))
+                if manifest.get('version') == self.VERSION:
+                    return manifest
+                logger.warning(f"Ignoring export index of version {manifest.get('version')}: {self.index_path}")
+            except (OSError, json.JSONDecodeError) as e:
+                logger.warning(f"Ignoring unreadable export index manifest {manifest_path}: {e}")
+        return self.__empty_manifest()
+
+    def __save_manifest(self) -> None:
+        """
+        Replace the manifest atomically; the files it lists are written before, so readers never see a partial update.
+        """
+        manifest_path = self.index_path / 'manifest.json'
+        temporary_path = manifest_path.with_name(manifest_path.name + '.tmp')
+        temporary_path.write_text(json.dumps(self.__manifest, indent=2) + "\n", encoding='utf-8')
+        os.replace(temporary_path, manifest_path)
+
+
+def _read_array(path: Path) -> array:
+    """
+    Read a file of signed 64-bit integers.
+    """
+    values = array('q')
+    values.frombytes(path.read_bytes())
+    return values
+
+def _write_array(path: Path, values: array) -> None:
+    """
+    Write an array of integers to a file atomically.
+    """
+    temporary_path = path.with_name(path.name + '.tmp')
+    with open(temporary_path, 'wb') as file:
+        values.tofile(file)
+    os.replace(temporary_path, path)
+
+
+class _Column:
+    """
+    Memory-mapped file of signed 64-bit integers, read as a sequence.
+    """
+    __slots__ = ('file', 'map', 'values')
+
+    def __init__(self, path: Path, length: int) -> None:
+        self.file = open(path, 'rb')
+        self.map: mmap.mmap | None = None
+        self.values = memoryview(b'').cast('q')
+        if length:
+            self.map = mmap.mmap(self.file.fileno(), length * 8, access=mmap.ACCESS_READ)
+            self.values = memoryview(self.map).cast('q')
+
+    def close(self) -> None:
+        self.values.release()
+        if self.map is not None:
+            self.map.close()
+        self.file.close()
+
+
+class _Run:
+    """
+    One run of the index: for every field, the keys of its rows in increasing order and the rows in the same order.
+    """
+    __slots__ = ('keys', 'rows')
+
+    def __init__(self, index_path: Path, name: str) -> None:
+        self.keys: dict[str, _Column] = {}
+        self.rows: dict[str, _Column] = {}
+        for field in FIELDS:
+            length = (index_path / f"{name}.{field}.keys").stat().st_size // 8
+            self.keys[field] = _Column(index_path / f"{name}.{field}.keys", length)
+            self.rows[field] = _Column(index_path / f"{name}.{field}.rows", length)
+
+    def range(self, field: str, low: int = -2 ** 63, high: int = 2 ** 63) -> "_Range":
+        """
+        Returns:
+            _Range: The (key, row) pairs of a field with low <= key < high, by increasing key.
+        """
+        keys = self.keys[field].values
+        return _Range(keys, self.rows[field].values, bisect.bisect_left(keys, low), bisect.bisect_left(keys, high))
+
+    def close(self) -> None:
+        for column in (*self.keys.values(), *self.rows.values()):
+            column.close()
+
+
+class _Range:
+    """
+    Slice of a run, iterated as (key, row) pairs.
+    """
+    __slots__ = ('keys', 'rows', 'begin', 'end')
+
+    def __init__(self, keys, rows, begin: int, end: int) -> None:
+        self.keys, self.rows, self.begin, self.end = keys, rows, begin, end
+
+    def __len__(self) -> int:
+        return self.end - self.begin
+
+    def __iter__(self) -> Iterator[tuple[int, int]]:
+        # Indexing instead of slicing, since a slice would keep the memory map from being closed.
+        positions = range(self.begin, self.end)
+        return zip(map(self.keys.__getitem__, positions), map(self.rows.__getitem__, positions))
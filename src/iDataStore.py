@@ -1,4 +1,6 @@
 from abc import ABC, abstractmethod
+from typing import Any, Callable
+import callLog
 
 
 class IDataStore(ABC):
@@ -15,3 +17,74 @@ class IDataStore(ABC):
             jsonList (list[str]): A list of JSON-formatted strings representing call logs.
         """
         pass
+
+    @abstractmethod
+    def insert_many(self, json_logs: list[str]) -> None:
+        """
+        Insert a batch of JSON strings into the data store.
+
+        Implementations may buffer the documents and send them in bulk; buffered
+        documents are only guaranteed to be persisted after flush() returns.
+
+        Args:
+            json_logs (list[str]): A list of JSON-formatted strings representing call logs.
+        """
+        pass
+
+    def insert_batch(self, batch: callLog.CallLogBatch) -> None:
+        """
+        Insert a columnar batch of call logs into the data store.
+
+        The default implementation converts the batch to JSON strings and calls insert_many();
+        stores able to consume the columns directly should override it.
+
+        Args:
+            batch (CallLogBatch): The call logs to insert.
+        """
+        self.insert_many(batch.to_json_list())
+
+    def batch_renderer(self) -> Callable[[callLog.CallLogBatch], Any] | None:
+        """
+        Expose the serialization step of insert_batch(), so a pipeline can run it in its own workers.
+
+        The returned function must be picklable and must not touch the store, since it may run
+        in another thread or process; its result is handed back through insert_rendered().
+
+        Returns:
+            Callable[[CallLogBatch], Any] | None: The renderer, or None (the default) when the
+                store only accepts whole batches through insert_batch().
+        """
+        return None
+
+    def insert_rendered(self, payload: Any, documents: int) -> None:
+        """
+        Insert a batch already serialized by the function returned by batch_renderer().
+
+        Args:
+            payload (Any): The rendered batch.
+            documents (int): Number of call logs in the payload.
+
+        Raises:
+            NotImplementedError: If the store does not provide a batch renderer.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not accept rendered batches")
+
+    def flush(self) -> None:
+        """
+        Persist any buffered documents.
+        Stores that do not buffer can rely on this default no-op.
+        """
+        pass
+
+    def close(self) -> None:
+        """
+        Flush the store and release its resources.
+        Stores that hold no resources can rely on this default, which only flushes.
+        """
+        self.flush()
+
+    def __enter__(self) -> "IDataStore":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
@@ -0,0 +1,207 @@
+from datetime import datetime, timedelta, timezone
+from elasticsearch import BadRequestError, Elasticsearch
+from typing import Iterable
+import callLog
+import logging
+
+# Set up module-level logger.
+logger = logging.getLogger(__name__)
+#logger.setLevel(logging.DEBUG)
+
+class IndexRouter:
+    """
+    Names the time-based index of each call log from its timestamp, e.g. call_logs-2025.01.01.
+
+    The router is picklable, so the batch renderers running in the pipeline workers can use it.
+    """
+    __slots__ = ('index_name', 'rotate', '__format', '__names')
+    # strftime suffix of the index names of each rotation.
+    ROTATIONS: dict[str, str] = {'none': '', 'day': '%Y.%m.%d', 'month': '%Y.%m'}
+
+    def __init__(self, index_name: str, rotate: str = 'none') -> None:
+        """
+        Initialize the router.
+
+        Args:
+            index_name (str): Name of the index, or prefix of the time-based indices.
+            rotate (str): 'none' writes every call log to index_name, 'day' and 'month' to
+                index_name-YYYY.MM.DD and index_name-YYYY.MM, after the UTC call timestamp.
+
+        Raises:
+            ValueError: If the rotation is unknown.
+        """
+        if rotate not in self.ROTATIONS:
+            error_msg: str = f"Invalid index rotation: {rotate}. Must be one of {tuple(self.ROTATIONS)}."
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+        self.index_name: str = index_name
+        self.rotate: str = rotate
+        self.__format: str = self.ROTATIONS[rotate]
+        # Index name of each hour since the epoch already seen.
+        self.__names: dict[int, str] = {}
+
+    def __getstate__(self) -> tuple[str, str]:
+        return self.index_name, self.rotate
+
+    def __setstate__(self, state: tuple[str, str]) -> None:
+        self.__init__(*state)
+
+    def index_of(self, timestamp: int) -> str:
+        """
+        Args:
+            timestamp (int): Call timestamp in seconds since the epoch.
+
+        Returns:
+            str: The index the call log goes to.
+        """
+        hour = timestamp // 3600
+        name = self.__names.get(hour)
+        if name is None:
+            name = self.index_name
+            if self.__format:
+                name = f"{name}-{callLog.EPOCH + timedelta(hours=hour):{self.__format}}"
+            self.__names[hour] = name
+        return name
+
+    def index_of_json(self, timestamp: str) -> str:
+        """
+        Args:
+            timestamp (str): ISO 8601 call timestamp of a JSON document; naive timestamps are taken as UTC.
+
+        Returns:
+            str: The index the call log goes to.
+        """
+        if not self.__format:
+            return self.index_name
+        moment = datetime.fromisoformat(timestamp)
+        if moment.tzinfo is not None:
+            moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+        return self.index_of(int((moment - callLog.EPOCH).total_seconds()))
+
+    def route(self, batch: callLog.CallLogBatch) -> tuple[list[str], list[int] | None] | None:
+        """
+        Find the index of every call log of a batch.
+
+        Returns:
+            tuple[list[str], list[int] | None] | None: The index names used by the batch and, when there is
+                more than one, the position in that list of each call log's index; None without rotation.
+        """
+        if not self.__format or not batch:
+            return None
+        timestamps = batch.timestamps
+        first, last = self.index_of(min(timestamps)), self.index_of(max(timestamps))
+        if first == last:
+            return [first], None
+        names: list[str] = []
+        codes: dict[str, int] = {}
+        routes: list[int] = []
+        for timestamp in timestamps:
+            name = self.index_of(timestamp)
+            code = codes.get(name)
+            if code is None:
+                code = codes[name] = len(names)
+                names.append(name)
+            routes.append(code)
+        return names, routes
+
+
+class IndexManager:
+    """
+    Creates the indices a store writes to on demand and, in ingest mode, tunes them for bulk loading.
+
+    Indices are created from the index mapping, or empty when an index template matching their
+    name provides the mapping. In ingest mode every index written to gets refresh_interval -1 and
+    0 replicas for the duration of the run; restore() puts the original settings back and refreshes
+    the indices, and must be called whether the run completed or failed. The original settings are
+    logged when they are changed, so they can be restored by hand if the process is killed.
+    """
+    INGEST_SETTINGS: dict[str, str | int] = {"refresh_interval": "-1", "number_of_replicas": 0}
+
+    def __init__(self, es: Elasticsearch, router: IndexRouter, mapping: dict | None = None,
+                 template: str | None = None, ingest_mode: bool = False) -> None:
+        """
+        Initialize the manager.
+
+        Args:
+            es (Elasticsearch): Synchronous client used for the index requests.
+            router (IndexRouter): Router naming the indices.
+            mapping (dict | None): Mapping of the indices created on demand.
+            template (str | None): Name of an index template providing mapping and settings of the
+                indices instead; it must exist and match their names.
+            ingest_mode (bool): Whether to tune the indices for bulk loading during the run.
+
+        Raises:
+            ValueError: If the template does not exist.
+        """
+        self.es = es
+        self.router: IndexRouter = router
+        self.mapping: dict | None = mapping
+        self.template: str | None = template
+        self.ingest_mode: bool = ingest_mode
+        self.__prepared: set[str] = set()
+        self.__original_settings: dict[str, dict] = {}
+        if template and self.es.indices.exists_index_template(name=template).meta.status != 200:
+            error_msg: str = f"Index template '{template}' does not exist."
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+
+    def prepare(self, index_names: Iterable[str]) -> None:
+        """
+        Create the indices that do not exist yet and put them in ingest mode, once per index and run.
+
+        Args:
+            index_names (Iterable[str]): The indices about to be written to.
+
+        Raises:
+            ValueError: If an index cannot be created.
+        """
+        for index_name in index_names:
+            if index_name in self.__prepared:
+                continue
+            self.__prepared.add(index_name)
+            if self.router.rotate != 'none' and self.es.indices.exists(index=index_name).meta.status != 200:
+                self.__create(index_name)
+            if self.ingest_mode:
+                self.__tune(index_name)
+
+    def restore(self) -> None:
+        """
+        Put back the settings changed by the ingest mode and refresh the indices, so the rows written are searchable.
+        Failures are logged with the settings to restore by hand, so every index gets its attempt.
+        """
+        original_settings, self.__original_settings = self.__original_settings, {}
+        for index_name, settings in original_settings.items():
+            try:
+                self.es.indices.put_settings(index=index_name, settings={"index": settings})
+                self.es.indices.refresh(index=index_name)
+                logger.info(f"Restored settings of index '{index_name}': {settings}")
+            except Exception as e:
+                logger.error(f"Failed to restore settings {settings} of index '{index_name}', restore them by hand: {e}")
+
+    def __create(self, index_name: str) -> None:
+        """
+        Create an index from the mapping, or empty so the matching index template applies.
+        """
+        try:
+            if self.template:
+                self.es.indices.create(index=index_name)
+            else:
+                self.es.indices.create(index=index_name, body=self.mapping or {})
+            logger.info(f"Index '{index_name}' created from {f'template {self.template}' if self.template else 'the mapping'}.")
+        except BadRequestError as e:
+            # Another writer created it in the meantime.
+            if e.error != 'resource_already_exists_exception':
+                error_msg = f"Failed to create index '{index_name}': {e}"
+                logger.exception(error_msg)
+                raise ValueError(error_msg)
+
+    def __tune(self, index_name: str) -> None:
+        """
+        Record the refresh interval and replicas of an index, then disable refreshes and replicas.
+        """
+        response = self.es.indices.get_settings(index=index_name)
+        current = response[index_name]["settings"]["index"]
+        settings = {key: current.get(key) for key in self.INGEST_SETTINGS}
+        self.es.indices.put_settings(index=index_name, settings={"index": self.INGEST_SETTINGS})
+        self.__original_settings[index_name] = settings
+        logger.info(f"Index '{index_name}' in ingest mode until the end of the run, original settings: {settings}")
@@ -1,8 +1,18 @@
-from typing import Generator
-from datetime import datetime
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import BinaryIO, Generator, Iterable, Iterator
+from collections import deque
 from pathlib import Path
+import compressedFiles
+import checkpoint
 import callLog
+import decoder
+import metrics
+import itertools
 import logging
+import mmap
+import time
+import csv
+import os
 
 # Set up module-level logger.
 logger = logging.getLogger(__name__)
@@ -11,17 +21,50 @@ logger = logging.getLogger(__name__)
 class CallLogLoader:
     """
     Loads call logs from CSV files in a specified folder and converts them into CallLog objects.
+
+    Besides plain '.csv' files, the folder may hold '.csv.gz', '.csv.bz2', '.csv.xz' and, when a
+    zstd module is installed, '.csv.zst' archives, which are decompressed on the fly.
+
+    Plain files with at least split_bytes left to read are memory-mapped and split into
+    newline-aligned byte ranges, parsed by different workers and recombined in order, so a single
+    huge file is spread over all the workers instead of keeping one of them busy.
+
+    With a RowFilter, the files whose name-encoded hour falls outside its time window are not
+    opened, and the rows it drops are not converted into call logs.
     """
+    # Lines per byte range when the process pool of the loader splits a large file.
+    RANGE_LINES: int = 100_000
 
-    def __init__(self, folder_path: str):
+    def __init__(self, folder_path: str, workers: int = 0, ordered: bool = True,
+                 manifest: checkpoint.CheckpointManifest | None = None, tail: bool = False,
+                 split_bytes: int = 0, row_filter: decoder.RowFilter | None = None):
         """
         Initialize the CallLogLoader with the path to the folder containing call log files.
 
         Args:
             folder_path (str): Path to the folder containing call log files.
+            workers (int): Number of worker processes parsing files in parallel. 0 parses sequentially.
+            ordered (bool): In parallel mode, whether rows are yielded in sorted file order
+                or as soon as each file is parsed.
+            manifest (CheckpointManifest | None): Checkpoint manifest used to skip files already
+                ingested and to resume files that were appended to.
+            tail (bool): Whether the files may still be growing; a last line without its
+                newline is then left for the next call instead of being parsed.
+            split_bytes (int): Size in bytes left to read from which a plain file is split into byte
+                ranges, in parallel mode and in load_raw_chunks(); 0 never splits files.
+            row_filter (RowFilter | None): Time window and predicates the rows must pass, None to load every row.
+                The rows it drops are counted in rejects.filtered.
         """
         logger.info(f"Initializing CallLogLoader from folder: {folder_path}")
         self.__folder_path = Path(folder_path)
+        self.__workers = workers
+        self.__ordered = ordered
+        self.__manifest = manifest
+        self.__tail = tail
+        self.__split_bytes = split_bytes
+        self.row_filter = row_filter
+        self.rejects = decoder.RejectChannel()
+        self.__files_outside: set[Path] = set()
 
     def load_csv_files(self)-> Generator[callLog.CallLog, None, None]:
        
@@ -32,32 +75,642 @@ class CallLogLoader:
             CallLog: An instance of CallLog for each valid row in the CSV files.
 
         Notes:
-            - Files are processed in sorted order.
-            - If a row cannot be parsed, an error message is logged and the row is skipped.
+            - Files are processed in sorted order, unless parallel parsing is unordered.
+            - With a row filter, files outside its time window are skipped and the rows it drops are counted in `rejects.filtered`.
+            - With a checkpoint manifest, unchanged files are skipped and appended files resume from the last commit.
+            - If a row cannot be parsed, it is skipped and counted in `rejects`; only a rate-limited
+              number of malformed rows is logged.
             - If a file cannot be read, an error is logged and the file is skipped.
         """
-        import csv
-        csv_files = sorted(self.__folder_path.glob('*.csv'))
+        yield from self.__load(None)
+
+    def load_csv_batches(self, batch_size: int = 1000) -> Generator[callLog.CallLogBatch, None, None]:
+        """
+        Loads and parses all CSV files in the specified folder into columnar CallLogBatch objects.
+
+        Args:
+            batch_size (int): Maximum number of call logs per batch; a batch never spans two files.
+
+        Yields:
+            CallLogBatch: Batches holding the valid rows of the CSV files, with the same
+                ordering, checkpoint and error handling as load_csv_files().
+        """
+        yield from self.__load(batch_size)
+
+    def __load(self, batch_size: int | None) -> Generator[callLog.CallLog | callLog.CallLogBatch, None, None]:
+        """
+        Read the pending files, sequentially or in the process pool, advancing the checkpoint as items are yielded.
+
+        Args:
+            batch_size (int | None): Rows per CallLogBatch, or None to yield CallLog instances.
+
+        Yields:
+            CallLog | CallLogBatch: The parsed rows.
+        """
+        csv_files = self.__pending_files()
+        positions = {csv_file: (offset, rows) for csv_file, offset, rows in csv_files}
+
+        def advance(csv_file: Path, offset: int, rows: int, complete: bool = False) -> None:
+            start_offset, start_rows = positions[csv_file]
+            metrics.BYTES_READ.inc(offset - start_offset)
+            metrics.ROWS_READ.inc(rows - start_rows)
+            positions[csv_file] = (offset, rows)
+            if self.__manifest:
+                self.__manifest.advance(csv_file, offset, rows, complete)
+
+        if self.__workers > 0:
+            for csv_file, items, offset, rows, complete in self.__load_parallel(csv_files, batch_size):
+                # The checkpoint must advance before the last item is handed over, the
+                # consumer may commit as soon as it holds it.
+                yield from items[:-1]
+                advance(csv_file, offset, rows, complete)
+                yield from items[-1:]
+        else:
+            for csv_file, offset, rows in csv_files:
+                reader = CsvFileReader(csv_file, offset, rows, self.__tail, self.rejects, self.row_filter)
+                for item in (reader if batch_size is None else reader.batches(batch_size)):
+                    advance(csv_file, reader.offset, reader.rows)
+                    yield item
+                advance(csv_file, reader.offset, reader.rows, reader.complete)
+
+    def load_raw_chunks(self, chunk_size: int = 1000) -> Iterator[tuple[Path, list[str], "list[bytes] | ByteRange", int, int, int, bool]]:
+        """
+        Read the pending files into chunks of raw lines, leaving decoding to the caller.
+
+        Unlike the load_* methods, the checkpoint is not advanced: the caller reports the
+        positions it has handed to the sink through advance(). The pending files are listed
+        when this method is called, so the chunks can then be read from another thread.
+
+        Files split into byte ranges (see split_bytes) yield a ByteRange of about chunk_size lines
+        instead of the lines themselves: the lines are only read by whoever decodes the chunk.
+        The files outside the window of the row filter are skipped, its rows are left to the decoder.
+
+        Args:
+            chunk_size (int): Maximum number of lines per chunk; a chunk never spans two files.
+
+        Returns:
+            Iterator[tuple[Path, list[str], list[bytes] | ByteRange, int, int, int, bool]]: For each chunk
+                the file, its header, the raw lines or their byte range, the number of the first row,
+                the byte offset and row count reached after the chunk, and whether the file was read to its end.
+        """
+        csv_files = self.__pending_files()
+
+        def chunks() -> Generator[tuple[Path, list[str], list[bytes] | ByteRange, int, int, int, bool], None, None]:
+            for csv_file, offset, rows in csv_files:
+                reader = CsvFileReader(csv_file, offset, rows, self.__tail, self.rejects, self.row_filter)
+                split = self.__splits(csv_file, offset)
+                for lines, first_row in (reader.ranges(chunk_size) if split else reader.raw_chunks(chunk_size)):
+                    yield csv_file, reader.header, lines, first_row, reader.offset, reader.rows, reader.complete
+        return chunks()
+
+    def advance(self, csv_file: Path, offset: int, rows: int, complete: bool = False) -> None:
+        """
+        Record the position reached in a file read through load_raw_chunks(), once its rows
+        have been handed to the sink; it is persisted by the next commit().
+
+        Args:
+            csv_file (Path): The CSV file.
+            offset (int): Byte offset just past the last row handed over.
+            rows (int): Number of data rows handed over from the start of the file.
+            complete (bool): Whether the file was read to its end.
+        """
+        if self.__manifest:
+            self.__manifest.advance(csv_file, offset, rows, complete)
+
+    def commit(self) -> None:
+        """
+        Persist the checkpoint of every row yielded so far.
+        Call it only once the sink has confirmed those rows, e.g. after DataStore.flush().
+        """
+        if self.__manifest:
+            self.__manifest.commit()
+
+    def __splits(self, csv_file: Path, offset: int) -> bool:
+        """
+        Returns:
+            bool: Whether the file is read as byte ranges: a plain file with at least split_bytes left to read.
+        """
+        try:
+            return (self.__split_bytes > 0 and not compressedFiles.is_compressed(csv_file)
+                    and csv_file.stat().st_size - offset >= self.__split_bytes)
+        except OSError:
+            return False
+
+    def __pending_files(self) -> list[tuple[Path, int, int]]:
+        """
+        List the CSV files in sorted order together with the byte offset and row count to start from,
+        leaving out the files outside the time window of the row filter without opening them.
+
+        Returns:
+            list[tuple[Path, int, int]]: (file, offset, rows) for each file that has rows left to read.
+        """
+        csv_files = sorted(path for path in self.__folder_path.iterdir() if compressedFiles.is_csv_file(path))
+        if compressedFiles.zstd is None and any(self.__folder_path.glob('*.csv.zst')):
+            logger.warning(f"Skipping the .csv.zst files in {self.__folder_path}: no zstd module is installed")
+        if self.row_filter is not None:
+            outside = {csv_file for csv_file in csv_files if self.row_filter.skips_file(csv_file)}
+            if outside:
+                csv_files = [csv_file for csv_file in csv_files if csv_file not in outside]
+                # In tail mode the folder is listed again at every poll, only new files are counted.
+                new_outside = outside - self.__files_outside
+                if new_outside:
+                    self.__files_outside |= new_outside
+                    metrics.FILES_FILTERED.inc(len(new_outside))
+                    logger.info(f"Skipping {len(new_outside)} files whose name-encoded hour is outside the time window")
+        if not self.__manifest:
+            return [(csv_file, 0, 0) for csv_file in csv_files]
 
+        pending: list[tuple[Path, int, int]] = []
         for csv_file in csv_files:
             try:
-                with open(csv_file, mode='r', encoding='utf-8') as file:
-                    logger.debug(f"Processing file: {csv_file}")
-                    reader = csv.DictReader(file)
-                    for row in reader:
-                        try: 
-                            yield callLog.CallLog(
-                                timestamp=datetime.fromisoformat(row['timestamp']),
-                                caller=row['caller'],
-                                receiver=row['receiver'],
-                                duration=int(row['duration']),
-                                status=row['status'],
-                                uniqueCallReference=row['uniqueCallReference']
-                            )
-                        except Exception as e:
-                            error_msg:str = f"Error parsing log entry: {row}. Error: {e}"
-                            logger.exception(error_msg)
+                resume_point = self.__manifest.resume_point(csv_file)
             except OSError as e:
-                error_msg:str = f"Error reading file {csv_file}: {e}"
-                logger.exception(error_msg)
+                logger.exception(f"Error reading file {csv_file}: {e}")
                 continue
+            if resume_point is None:
+                logger.debug(f"Skipping unchanged file: {csv_file}")
+            else:
+                pending.append((csv_file, *resume_point))
+        skipped = len(csv_files) - len(pending)
+        if skipped and not self.__tail:
+            logger.info(f"Skipping {skipped} files already ingested according to the checkpoint manifest")
+        return pending
+
+    def __load_parallel(self, csv_files: list[tuple[Path, int, int]], batch_size: int | None) -> Generator[tuple, None, None]:
+        """
+        Parse the CSV files in a process pool, keeping at most two tasks per worker in flight.
+
+        A task is a whole file, or a byte range of a file split by split_bytes. Ranges are handed
+        back in file order even in unordered mode, since the checkpoint of a file only moves forward.
+
+        Args:
+            csv_files (list[tuple[Path, int, int]]): Sorted (file, offset, rows) entries to parse.
+            batch_size (int | None): Rows per CallLogBatch, or None to parse into CallLog instances.
+
+        Yields:
+            tuple[Path, list, int, int, bool]: Each file or range with its parsed items, the byte offset
+                and row count reached, and whether the file was read to its end.
+        """
+        logger.info(f"Parsing {len(csv_files)} files with {self.__workers} worker processes "
+                    f"({'ordered' if self.__ordered else 'unordered'})")
+        remaining = self.__tasks(csv_files, batch_size)
+        executor = ProcessPoolExecutor(max_workers=self.__workers)
+        in_flight: list[Future] = []
+        # Futures of each file, in file order.
+        by_file: dict[Path, deque[Future]] = {}
+
+        def submit_next() -> None:
+            task = next(remaining, None)
+            if task is not None:
+                future = executor.submit(*task)
+                in_flight.append(future)
+                by_file.setdefault(task[1], deque()).append(future)
+
+        try:
+            for _ in range(self.__workers * 2):
+                submit_next()
+            while in_flight:
+                if self.__ordered:
+                    done = [in_flight[0]]
+                else:
+                    # Only the first pending task of each file can be handed over.
+                    heads = [futures[0] for futures in by_file.values()]
+                    wait(heads, return_when=FIRST_COMPLETED)
+                    done = [future for future in heads if future.done()]
+                for future in done:
+                    csv_file, items, offset, rows, complete, rejected, filtered = future.result()
+                    by_file[csv_file].popleft()
+                    if not by_file[csv_file]:
+                        del by_file[csv_file]
+                    in_flight.remove(future)
+                    submit_next()
+                    self.rejects.rejected += rejected
+                    self.rejects.filtered += filtered
+                    yield csv_file, items, offset, rows, complete
+        finally:
+            executor.shutdown(cancel_futures=True)
+
+    def __tasks(self, csv_files: list[tuple[Path, int, int]], batch_size: int | None) -> Generator[tuple, None, None]:
+        """
+        Generate the tasks of the process pool, splitting the large plain files into byte ranges as they are reached.
+
+        Yields:
+            tuple: The function and arguments of each task.
+        """
+        for csv_file, offset, rows in csv_files:
+            if not self.__splits(csv_file, offset):
+                yield parse_csv_file, csv_file, offset, rows, self.__tail, batch_size, self.row_filter
+                continue
+            reader = CsvFileReader(csv_file, offset, rows, self.__tail, self.rejects)
+            for byte_range, first_row in reader.ranges(self.RANGE_LINES):
+                yield (parse_byte_range, csv_file, reader.header, byte_range, first_row, reader.rows,
+                       reader.complete, batch_size, self.row_filter)
+
+
+class CsvFileReader:
+    """
+    Parses a single CSV file into CallLog objects, tracking the byte offset reached.
+    Offsets of compressed files count decompressed bytes.
+    """
+
+    def __init__(self, csv_file: Path, offset: int = 0, rows: int = 0, tail: bool = False,
+                 rejects: decoder.RejectChannel | None = None, row_filter: decoder.RowFilter | None = None) -> None:
+        """
+        Initialize the reader.
+
+        Args:
+            csv_file (Path): Path of the CSV file.
+            offset (int): Byte offset to start reading from; the header is always read from the start of the file.
+            rows (int): Number of data rows already read before offset.
+            tail (bool): Whether to stop at a last line that is not terminated by a newline yet.
+            rejects (RejectChannel | None): Channel receiving the malformed rows; a new one is created if None.
+            row_filter (RowFilter | None): Conditions the rows must pass, None to keep every row.
+
+        Attributes:
+            offset (int): Byte offset just past the last row read.
+            rows (int): Number of data rows read from the start of the file.
+            header (list[str] | None): Column names, once the header has been read.
+            complete (bool): Whether the file was read to its end.
+        """
+        self.csv_file: Path = csv_file
+        self.header: list[str] | None = None
+        self.complete: bool = False
+        self.offset: int = offset
+        self.rows: int = rows
+        self.__tail: bool = tail
+        self.rejects: decoder.RejectChannel = rejects if rejects is not None else decoder.RejectChannel()
+        self.__row_filter: decoder.RowFilter | None = row_filter
+
+    def __iter__(self) -> Generator[callLog.CallLog, None, None]:
+        """
+        Yields:
+            CallLog: An instance of CallLog for each valid row in the file.
+        """
+        return self.__read(None)
+
+    def batches(self, batch_size: int) -> Generator[callLog.CallLogBatch, None, None]:
+        """
+        Parse the file into columnar batches.
+
+        Args:
+            batch_size (int): Maximum number of call logs per batch.
+
+        Yields:
+            CallLogBatch: Batches of valid rows; offset and rows are up to date when each batch is yielded.
+        """
+        return self.__read(batch_size)
+
+    def raw_chunks(self, chunk_size: int) -> Generator[tuple[list[bytes], int], None, None]:
+        """
+        Read the file into chunks of raw rows without decoding them; the header is validated first.
+        A row whose quoted fields contain newlines spans several lines, see read_records().
+
+        Args:
+            chunk_size (int): Maximum number of rows per chunk.
+
+        Yields:
+            tuple[list[bytes], int]: The rows, terminators included, and the number of the first row;
+                offset, rows and complete are up to date when each chunk is yielded. When a compressed
+                file ends right after a full chunk, an empty chunk reports that it is complete.
+        """
+        try:
+            opened = time.perf_counter()
+            with compressedFiles.open_csv(self.csv_file) as file:
+                if self.__open(file, opened) is None:
+                    return
+                lines: list[bytes] = []
+                first_row = self.rows + 1
+                for line in read_records(file):
+                    if self.__tail and (not line.endswith(b'\n') or line.count(b'"') % 2):
+                        break
+                    self.offset += len(line)
+                    self.rows += 1
+                    lines.append(line)
+                    if len(lines) >= chunk_size:
+                        yield lines, first_row
+                        lines = []
+                        first_row = self.rows + 1
+                else:
+                    self.complete = True
+                if lines or (self.complete and compressedFiles.is_compressed(self.csv_file)):
+                    yield lines, first_row
+        except (OSError, UnicodeDecodeError, *compressedFiles.DECOMPRESSION_ERRORS) as e:
+            error_msg:str = f"Error reading file {self.csv_file}: {e}"
+            logger.exception(error_msg)
+
+    def ranges(self, range_lines: int) -> Generator[tuple["ByteRange", int], None, None]:
+        """
+        Memory-map the file and split what is left to read into row-aligned byte ranges, without reading the lines.
+
+        The header is read and validated first. Range sizes are estimated from the average length of the
+        first rows, and only the newlines of each range are counted, so the rows of the checkpoint stay exact.
+        A range whose quotes are unbalanced ends inside a quoted field, so it is extended line by line
+        until they balance; only the ranges containing quotes are split into rows to count them.
+        Only plain files can be split, compressed ones are read through raw_chunks().
+
+        Args:
+            range_lines (int): Approximate number of lines per range.
+
+        Yields:
+            tuple[ByteRange, int]: The range and the number of its first row; offset, rows and complete
+                are up to date when each range is yielded.
+        """
+        try:
+            opened = time.perf_counter()
+            with open(self.csv_file, 'rb') as file:
+                if os.fstat(file.fileno()).st_size == 0:
+                    return
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    if self.__open(mapped, opened) is None:
+                        return
+                    size = len(mapped)
+                    # In tail mode a last line without its newline is left for the next call.
+                    end = mapped.rfind(b'\n') + 1 if self.__tail else size
+                    sample = mapped[self.offset:self.offset + 64 * 1024]
+                    range_bytes = max(range_lines * len(sample) // max(sample.count(b'\n'), 1), 1)
+                    while self.offset < end:
+                        start = self.offset
+                        newline = mapped.find(b'\n', min(start + range_bytes, end) - 1, end)
+                        stop = newline + 1 if newline != -1 else end
+                        data = mapped[start:stop]
+                        if b'"' in data:
+                            quotes = data.count(b'"')
+                            while quotes % 2 and stop < end:
+                                newline = mapped.find(b'\n', stop, end)
+                                next_stop = newline + 1 if newline != -1 else end
+                                quotes += mapped[stop:next_stop].count(b'"')
+                                stop = next_stop
+                            records = split_records(mapped[start:stop])
+                            if quotes % 2 and self.__tail:
+                                # The last row is still being written, it is left for the next call.
+                                end = stop = stop - len(records.pop())
+                                if stop == start:
+                                    break
+                            line_count = len(records)
+                        else:
+                            line_count = data.count(b'\n') + (mapped[stop - 1] != 10)
+                        first_row = self.rows + 1
+                        self.offset = stop
+                        self.rows += line_count
+                        self.complete = stop == size
+                        yield ByteRange(start, stop, line_count), first_row
+                    self.complete = end == size
+        except (OSError, ValueError) as e:
+            error_msg:str = f"Error reading file {self.csv_file}: {e}"
+            logger.exception(error_msg)
+
+    def __open(self, file, opened: float) -> decoder.RowDecoder | None:
+        """
+        Read the header, build the row decoder and move the file to the offset to resume from.
+
+        Args:
+            file (BinaryIO | mmap.mmap): The file, opened by compressedFiles.open_csv() or memory-mapped, at its start.
+            opened (float): time.perf_counter() before the file was opened, for the file open metric.
+
+        Returns:
+            RowDecoder | None: The decoder, or None if the file has no usable header.
+        """
+        logger.debug(f"Processing file: {self.csv_file}")
+        header_line = file.readline()
+        if self.__tail and not header_line.endswith(b'\n'):
+            return None
+        header = next(csv.reader([header_line.decode('utf-8')]), None)
+        if header is None:
+            return None
+        try:
+            row_decoder = decoder.RowDecoder(header, self.csv_file, self.rejects, self.__row_filter)
+        except ValueError as e:
+            logger.error(f"Skipping file {self.csv_file}: {e}")
+            return None
+        self.header = header
+        if self.offset <= len(header_line):
+            self.offset = len(header_line)
+        elif compressedFiles.is_compressed(self.csv_file):
+            # Compressed files cannot seek, the rows before the offset are decompressed and dropped.
+            remaining = self.offset - len(header_line)
+            while remaining > 0:
+                skipped = len(file.read(min(remaining, 1024 * 1024)))
+                if not skipped:
+                    break
+                remaining -= skipped
+        else:
+            file.seek(self.offset)
+        metrics.FILE_OPEN_SECONDS.observe(time.perf_counter() - opened)
+        metrics.FILES_OPENED.inc()
+        return row_decoder
+
+    def __read(self, batch_size: int | None) -> Generator[callLog.CallLog | callLog.CallLogBatch, None, None]:
+        """
+        Read the file line by line, yielding CallLog instances or, when batch_size is set, CallLogBatch objects.
+        """
+        try:
+            opened = time.perf_counter()
+            with compressedFiles.open_csv(self.csv_file) as file:
+                row_decoder = self.__open(file, opened)
+                if row_decoder is None:
+                    return
+
+                rejected_before = self.rejects.rejected
+                if batch_size is None:
+                    decode = row_decoder.decode
+                    for line in read_records(file):
+                        if self.__tail and (not line.endswith(b'\n') or line.count(b'"') % 2):
+                            break
+                        self.offset += len(line)
+                        self.rows += 1
+                        log = decode(line, self.rows)
+                        if log is not None:
+                            yield log
+                    else:
+                        self.complete = True
+                else:
+                    decode_into = row_decoder.decode_into
+                    observe = metrics.DECODE_SECONDS.observe
+                    batch = callLog.CallLogBatch()
+                    started = time.perf_counter()
+                    for line in read_records(file):
+                        if self.__tail and (not line.endswith(b'\n') or line.count(b'"') % 2):
+                            break
+                        self.offset += len(line)
+                        self.rows += 1
+                        decode_into(line, self.rows, batch)
+                        if len(batch) >= batch_size:
+                            observe(time.perf_counter() - started)
+                            yield batch
+                            batch = callLog.CallLogBatch()
+                            started = time.perf_counter()
+                    else:
+                        self.complete = True
+                    if batch:
+                        observe(time.perf_counter() - started)
+                        yield batch
+                rejected = self.rejects.rejected - rejected_before
+                if rejected:
+                    logger.warning(f"Skipped {rejected} malformed rows in {self.csv_file}")
+        except (OSError, UnicodeDecodeError, *compressedFiles.DECOMPRESSION_ERRORS) as e:
+            error_msg:str = f"Error reading file {self.csv_file}: {e}"
+            logger.exception(error_msg)
+
+
+class ByteRange:
+    """
+    Row-aligned span of a plain CSV file, read by the worker that decodes it rather than by the reader.
+    """
+    __slots__ = ('start', 'stop', 'line_count')
+
+    def __init__(self, start: int, stop: int, line_count: int) -> None:
+        """
+        Args:
+            start (int): Byte offset of the first row.
+            stop (int): Byte offset just past the last row.
+            line_count (int): Number of rows in the range.
+        """
+        self.start: int = start
+        self.stop: int = stop
+        self.line_count: int = line_count
+
+    def __len__(self) -> int:
+        return self.line_count
+
+    def read_lines(self, csv_file: Path) -> list[bytes]:
+        """
+        Memory-map the file and split the range into rows.
+
+        Returns:
+            list[bytes]: The rows of the range, see split_records().
+        """
+        with open(csv_file, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return split_records(mapped[self.start:self.stop])
+
+
+def csv_records(lines: Iterable[bytes]) -> Generator[bytes, None, None]:
+    """
+    Join the lines of the rows whose quoted fields contain newlines.
+
+    A row is complete once it holds an even number of quotes, escaped quotes ("") counting twice,
+    so only the lines containing quotes are counted.
+
+    Args:
+        lines (Iterable[bytes]): Lines starting at a row boundary, terminators included.
+
+    Yields:
+        bytes: The rows, terminators included; if the lines end inside a quoted field, the last row
+            is yielded with its quote still open, and is rejected by the decoder.
+    """
+    parts: list[bytes] = []
+    for line in lines:
+        if parts:
+            parts.append(line)
+            if line.count(b'"') % 2:
+                yield b''.join(parts)
+                parts = []
+        elif b'"' in line and line.count(b'"') % 2:
+            parts.append(line)
+        else:
+            yield line
+    if parts:
+        yield b''.join(parts)
+
+def read_records(file: BinaryIO, block_bytes: int = 64 * 1024) -> Iterator[bytes]:
+    """
+    Read the rows of a CSV file from its current position, a row boundary.
+
+    Lines are read in blocks of about block_bytes, and only the blocks containing quotes go through
+    csv_records(); a row still open at the end of a block is completed with the lines of the next one.
+
+    Args:
+        file (BinaryIO): The file, opened by compressedFiles.open_csv().
+        block_bytes (int): Approximate number of bytes read at a time.
+
+    Returns:
+        Iterator[bytes]: The rows, terminators included, as yielded by csv_records().
+    """
+    def blocks() -> Generator[list[bytes], None, None]:
+        open_row: list[bytes] = []
+        while lines := file.readlines(block_bytes):
+            if not open_row and b'"' not in b''.join(lines):
+                yield lines
+                continue
+            rows = list(csv_records(open_row + lines))
+            open_row = [rows.pop()] if rows[-1].count(b'"') % 2 else []
+            yield rows
+        yield open_row
+    return itertools.chain.from_iterable(blocks())
+
+def split_records(data: bytes) -> list[bytes]:
+    """
+    Split a row-aligned span of a CSV file into rows.
+
+    Returns:
+        list[bytes]: The rows without their newline, or, if the span contains quotes, the rows
+            of csv_records() with their newlines.
+    """
+    lines = data.split(b'\n')
+    if not lines[-1]:
+        lines.pop()
+    if b'"' not in data:
+        return lines
+    return list(csv_records(line + b'\n' for line in lines))
+
+
+def parse_byte_range(csv_file: Path, header: list[str], byte_range: ByteRange, first_row: int, rows: int,
+                     complete: bool = False, batch_size: int | None = None,
+                     row_filter: decoder.RowFilter | None = None) -> tuple[Path, list, int, int, bool, int, int]:
+    """
+    Parse one byte range of a split CSV file; used as the unit of work of the parallel loader for large files.
+
+    Args:
+        csv_file (Path): Path of the CSV file.
+        header (list[str]): Column names, read from the first line of the file.
+        byte_range (ByteRange): The range to parse.
+        first_row (int): Number of the first row of the range.
+        rows (int): Number of data rows from the start of the file to the end of the range.
+        complete (bool): Whether the range ends the file.
+        batch_size (int | None): Rows per CallLogBatch, or None to parse into CallLog instances.
+        row_filter (RowFilter | None): Conditions the rows must pass, None to keep every row.
+
+    Returns:
+        tuple[Path, list, int, int, bool, int, int]: Like parse_csv_file(), for the range.
+    """
+    rejects = decoder.RejectChannel()
+    row_decoder = decoder.RowDecoder(header, csv_file, rejects, row_filter)
+    lines = byte_range.read_lines(csv_file)
+    items: list = []
+    if batch_size is None:
+        decode = row_decoder.decode
+        items = [log for log in (decode(line, row) for row, line in enumerate(lines, first_row)) if log is not None]
+    else:
+        decode_into = row_decoder.decode_into
+        for start in range(0, len(lines), batch_size):
+            batch = callLog.CallLogBatch()
+            for row, line in enumerate(lines[start:start + batch_size], first_row + start):
+                decode_into(line, row, batch)
+            if batch:
+                items.append(batch)
+    if rejects.rejected:
+        logger.warning(f"Skipped {rejects.rejected} malformed rows in rows {first_row}-{rows} of {csv_file}")
+    return csv_file, items, byte_range.stop, rows, complete, rejects.rejected, rejects.filtered
+
+def parse_csv_file(csv_file: Path, offset: int = 0, rows: int = 0, tail: bool = False,
+                   batch_size: int | None = None,
+                   row_filter: decoder.RowFilter | None = None) -> tuple[Path, list, int, int, bool, int, int]:
+    """
+    Parse a whole CSV file at once; used as the unit of work of the parallel loader.
+
+    Args:
+        csv_file (Path): Path of the CSV file.
+        offset (int): Byte offset to start reading from.
+        rows (int): Number of data rows already read before offset.
+        tail (bool): Whether to stop at a last line that is not terminated by a newline yet.
+        batch_size (int | None): Rows per CallLogBatch, or None to parse into CallLog instances.
+        row_filter (RowFilter | None): Conditions the rows must pass, None to keep every row.
+
+    Returns:
+        tuple[Path, list, int, int, bool, int, int]: The file, its valid rows (CallLog instances or CallLogBatch
+            objects), the byte offset and row count reached, whether the file was read to its end,
+            and the numbers of rows rejected and filtered out.
+    """
+    reader = CsvFileReader(csv_file, offset, rows, tail, row_filter=row_filter)
+    items = list(reader if batch_size is None else reader.batches(batch_size))
+    return (csv_file, items, reader.offset, reader.rows, reader.complete,
+            reader.rejects.rejected, reader.rejects.filtered)
@@ -1,8 +1,27 @@
+from datetime import datetime
 from pathlib import Path
+import contextlib
+import threading
+import argparse
 import logging
+import signal
+import time
 import sys
 
+import parquetDataStore
+import rollupDataStore
+import sqliteDataStore
+import profiler
+import dataStoreGroup
+import asyncDataStore
+import checkpoint
+import iDataStore
 import dataStore
+import decoder
+import dedup
+import pipeline
+import metrics
+import watcher
 import loader
 import config
 
@@ -30,19 +49,26 @@ logger = logging.getLogger(__name__)
 #logger.setLevel(logging.DEBUG)
 
 
-def main(length_between_logging: int = 500) -> None:
+def main(length_between_logging: int = 500, watch: bool = False, profile: bool = False,
+         row_filter: decoder.RowFilter | None = None) -> None:
     """
     Executes the log collection and export pipeline.
 
     Steps:
     1. Load configuration from the config file.
     2. Load call logs from the specified folder.
-    3. Process each log and store it using the DataStore module
+    3. Process the logs in batches and store them using the DataStore module
     4. Log progress every `length_between_logging` entries
 
     Args:
         length_between_logging (int): Number of logs to process before logging progress.
             Default is 500.
+        watch (bool): Keep running and tail the folder for new logs until SIGINT/SIGTERM,
+            instead of processing the folder once.
+        profile (bool): Run under the RunProfiler, writing its artifacts under profile_path.
+        row_filter (RowFilter | None): Time window and row predicates replacing the filter_* settings.
+            Filtered runs do not persist the checkpoint manifest, so later runs still load the rows left out;
+            for the same reason they cannot write the rollups.
 
     Raises:
         SystemExit: If configuration loading or pipeline execution fails.
@@ -53,22 +79,72 @@ def main(length_between_logging: int = 500) -> None:
 
         logger.info("initalizing log processing pipeline...")
 
-        files = loader.CallLogLoader(configs.folder_path)
-        db = dataStore.DataStore(
-            configs.export_path, configs.elasticsearch_address, configs.index_name)
+        if row_filter is None:
+            row_filter = decoder.RowFilter(configs.filter_start, configs.filter_end, configs.filter_statuses,
+                                           configs.filter_callers, configs.filter_receivers)
+        manifest_path = configs.manifest_path
+        if row_filter.active:
+            logger.info(f"Loading only the logs matching: {row_filter}")
+            if manifest_path:
+                logger.warning("The checkpoint manifest is not used by filtered runs, the logs filtered out stay pending.")
+                manifest_path = None
+        if (configs.rollup_path or configs.rollup_index) and not manifest_path:
+            # Rollups add up across runs, so the runs that may load rows again must not write them.
+            reason = "filtered runs do not use the checkpoint manifest" if row_filter.active else "manifest_path is not set"
+            raise ValueError(f"Rollups need the checkpoint manifest to aggregate every log only once, but {reason}.")
+        manifest = None
+        if manifest_path or watch:
+            manifest = checkpoint.CheckpointManifest(manifest_path)
+        files = loader.CallLogLoader(
+            configs.folder_path, configs.parse_workers, configs.parse_ordered, manifest, tail=watch,
+            split_bytes=configs.parse_split_bytes, row_filter=row_filter if row_filter.active else None)
+        dedup_filter = None
+        if configs.dedup_capacity:
+            dedup_filter = dedup.DedupFilter(
+                configs.dedup_capacity, configs.dedup_error_rate, configs.dedup_filter_path)
+        profiling = contextlib.nullcontext()
+        if profile:
+            profiling = profiler.RunProfiler(
+                configs.profile_path, configs.profile_cprofile, configs.profile_sample_interval_ms / 1000,
+                configs.profile_memory_interval, configs.profile_memory_frames, configs.profile_top)
+        with profiling, metrics.REGISTRY.exporting(configs.metrics_report_path, configs.metrics_textfile_path,
+                                                   configs.metrics_textfile_interval_ms / 1000), open_data_store(configs) as db:
+            metrics.ROWS_REJECTED.set_function(lambda: files.rejects.rejected)
+            metrics.ROWS_FILTERED.set_function(lambda: files.rejects.filtered)
+            if dedup_filter:
+                metrics.ROWS_DUPLICATE.set_function(lambda: dedup_filter.skipped)
 
-        if configs.elasticsearch_address and not db.index_exists:
-            if configs.mapping is not None:
-                db.create_mapping(configs.mapping)
-                logger.info(f"Index '{configs.index_name}' doesn't exists, using config mapping.")
-            else:
-                logger.warning("Mapping configuration is missing in the config file, index created empty.")
+            if configs.elasticsearch_address and not db.index_exists:
+                if configs.mapping is not None:
+                    db.create_mapping(configs.mapping)
+                    logger.info(f"Index '{configs.index_name}' doesn't exists, using config mapping.")
+                else:
+                    logger.warning("Mapping configuration is missing in the config file, index created empty.")
 
-        logger.info("Starting log processing...")
+            logger.info("Starting log processing...")
 
-        total_processed: int = process_logs(files, db, length_between_logging)
+            if watch:
+                folder_watcher = watcher.FolderWatcher(
+                    configs.folder_path, configs.watch_poll_interval_ms / 1000)
+                try:
+                    total_processed: int = watch_logs(
+                        files, db, folder_watcher, length_between_logging, configs.bulk_max_docs,
+                        configs.watch_flush_interval_ms / 1000, dedup_filter)
+                finally:
+                    folder_watcher.close()
+            else:
+                total_processed: int = process_logs(
+                    files, db, length_between_logging, configs.bulk_max_docs, configs.checkpoint_interval,
+                    configs.parse_workers, configs.parse_mode, configs.serialize_workers, configs.serialize_mode,
+                    configs.pipeline_queue_size, dedup_filter)
 
         success_message: str = f"Successfully processed {total_processed} logs"
+        if files.rejects.rejected:
+            success_message += f" ({files.rejects.rejected} malformed rows skipped)"
+        if files.rejects.filtered:
+            success_message += f" ({files.rejects.filtered} rows filtered out)"
+        if dedup_filter and dedup_filter.skipped:
+            success_message += f" ({dedup_filter.skipped} duplicate logs skipped)"
         logger.info(success_message)
 
     except Exception as e:
@@ -77,14 +153,119 @@ def main(length_between_logging: int = 500) -> None:
         sys.exit(1)
 
 
-def process_logs(files: loader.CallLogLoader, db: dataStore.DataStore, batch_size: int) -> int:
+def open_data_store(configs: config.Config) -> iDataStore.IDataStore:
+    """
+    Create the DataStore described by the configuration.
+
+    The synchronous DataStore writes to Elasticsearch and to the export file; the AsyncDataStore
+    replaces it when bulk_max_in_flight is set and Elasticsearch is its only destination. The
+    Parquet export, the rollups and the SQLite database are stores of their own: when other
+    destinations are configured too, a DataStoreGroup writes every batch to each of them, one
+    after the other. With sink_queue_size set, a FanOutDataStore writes to them concurrently
+    instead, and Elasticsearch and the export file get a store each.
+
+    Args:
+        configs (Config): The loaded configuration.
+
+    Returns:
+        IDataStore: The store receiving the call logs.
+    """
+    concurrent: bool = configs.sink_queue_size > 0
+    # Without concurrent sinks, one DataStore writes to both Elasticsearch and the export file.
+    shared: bool = bool(configs.elasticsearch_address and configs.export_path and not concurrent)
+    stores: list[iDataStore.IDataStore] = []
+    names: list[str] = []
+    try:
+        if configs.elasticsearch_address and configs.bulk_max_in_flight and not shared:
+            stores.append(asyncDataStore.AsyncDataStore(
+                configs.elasticsearch_address, configs.index_name, configs.bulk_max_docs,
+                configs.bulk_max_bytes, configs.bulk_max_in_flight, configs.serializer_backend,
+                configs.write_mode, configs.index_rotate, configs.mapping, configs.index_template, configs.ingest_mode))
+            names.append('elasticsearch')
+        elif configs.elasticsearch_address and not shared:
+            stores.append(open_file_or_index(configs, elasticsearch_address=configs.elasticsearch_address))
+            names.append('elasticsearch')
+        if configs.export_path:
+            if shared and configs.bulk_max_in_flight:
+                logger.warning("bulk_max_in_flight is ignored when export_path is also set, sending _bulk requests synchronously.")
+            stores.append(open_file_or_index(
+                configs, configs.export_path, configs.elasticsearch_address if shared else None))
+            names.append('elasticsearch' if shared else 'export')
+        if configs.parquet_path:
+            stores.append(parquetDataStore.ParquetDataStore(
+                configs.parquet_path, configs.mapping, configs.parquet_row_group_size,
+                configs.parquet_compression, configs.parquet_max_open_files, configs.parquet_max_file_rows))
+            names.append('parquet')
+        if configs.rollup_path or configs.rollup_index:
+            stores.append(rollupDataStore.RollupDataStore(
+                configs.rollup_path, configs.elasticsearch_address, configs.rollup_index,
+                configs.rollup_group_digits, configs.rollup_relative_accuracy))
+            names.append('rollup')
+        if configs.sqlite_path:
+            write_mode = configs.write_mode
+            if write_mode not in sqliteDataStore.SqliteDataStore.WRITE_MODES:
+                logger.warning(f"write_mode '{write_mode}' is not supported by SQLite, skipping stored references instead.")
+                write_mode = 'create'
+            stores.append(sqliteDataStore.SqliteDataStore(
+                configs.sqlite_path, write_mode=write_mode, synchronous=configs.sqlite_synchronous,
+                ingest_mode=configs.ingest_mode))
+            names.append('sqlite')
+        if len(stores) == 1:
+            return stores[0]
+        if concurrent:
+            return dataStoreGroup.FanOutDataStore(stores, names, configs.sink_queue_size, configs.sink_failure_policy)
+        return dataStoreGroup.DataStoreGroup(stores)
+    except Exception:
+        for store in stores:
+            store.close()
+        raise
+
+
+def open_file_or_index(configs: config.Config, export_path: str | None = None,
+                       elasticsearch_address: str | None = None) -> dataStore.DataStore:
     """
-    Process and insert logs into the database.
+    Create a synchronous DataStore writing to the export file, to Elasticsearch, or to both.
+
+    Args:
+        configs (Config): The loaded configuration.
+        export_path (str | None): The export file, None to skip the export.
+        elasticsearch_address (str | None): The Elasticsearch address, None to skip Elasticsearch.
+
+    Returns:
+        DataStore: The store.
+    """
+    return dataStore.DataStore(
+        export_path, elasticsearch_address, configs.index_name,
+        configs.bulk_max_docs, configs.bulk_max_bytes,
+        configs.export_buffer_size, configs.export_fsync, configs.serializer_backend, configs.write_mode,
+        configs.export_rotate, configs.export_segment_bytes, configs.export_compression,
+        configs.index_rotate, configs.mapping, configs.index_template, configs.ingest_mode)
+
+
+def process_logs(files: loader.CallLogLoader, db: dataStore.DataStore, batch_size: int, insert_size: int = 500,
+                 checkpoint_interval: int = 10000, parse_workers: int = 0, parse_mode: str = 'process',
+                 serialize_workers: int = 1, serialize_mode: str = 'thread', queue_size: int = 8,
+                 dedup_filter: dedup.DedupFilter | None = None) -> int:
+    """
+    Process and insert logs into the database through the staged pipeline.
+
+    Files are read, parsed and serialized by the stages of a Pipeline connected by bounded
+    queues, while this function acts as the sink. Every `checkpoint_interval` logs the
+    DataStore is flushed and, once it has confirmed the rows, the loader checkpoint is committed.
+    The dedup filter runs ahead of the sink, so it is only saved once the run has completed.
 
     Args:
         files (CallLogLoader): Instance for reading CSV files.
         db (DataStore): Instance for database operations.
         batch_size (int): Number of logs to process before logging progress.
+        insert_size (int): Number of lines per chunk flowing through the pipeline.
+        checkpoint_interval (int): Number of logs between two checkpoints.
+        parse_workers (int): Number of workers of the parse stage, 0 to parse in the stage thread.
+        parse_mode (str): 'thread' or 'process' parse workers.
+        serialize_workers (int): Number of workers of the serialize stage.
+        serialize_mode (str): 'thread' or 'process' serialize workers.
+        queue_size (int): Capacity, in chunks, of each queue between two stages.
+        dedup_filter (DedupFilter | None): Filter dropping the logs whose reference was already seen.
 
     Returns:
         Total number of logs processed
@@ -94,23 +275,147 @@ def process_logs(files: loader.CallLogLoader, db: dataStore.DataStore, batch_siz
     """
     logs_processed = 0
     batch_count = 0
+    last_checkpoint = 0
+
+    try:
+        with pipeline.Pipeline(files, insert_size, db.batch_renderer(), max(parse_workers, 1),
+                               parse_mode if parse_workers else 'thread', serialize_workers,
+                               serialize_mode, queue_size, dedup_filter) as stages:
+            for chunk in stages:
+                if chunk.payload is not None:
+                    db.insert_rendered(chunk.payload, chunk.documents)
+                elif chunk.batch:
+                    db.insert_batch(chunk.batch)
+                files.advance(chunk.csv_file, chunk.offset, chunk.rows, chunk.complete)
+                metrics.DOCUMENTS_WRITTEN.inc(chunk.documents)
+                logs_processed += chunk.documents
+                if logs_processed - last_checkpoint >= checkpoint_interval:
+                    with metrics.SINK_FLUSH_SECONDS.time():
+                        db.flush()
+                    files.commit()
+                    last_checkpoint = logs_processed
+
+                if logs_processed // batch_size > batch_count:
+                    batch_count = logs_processed // batch_size
+                    report = stages.report()
+                    if isinstance(db, dataStoreGroup.FanOutDataStore):
+                        report += f" || {db.report()}"
+                    logger.info(f"Processed {logs_processed} logs (batch {batch_count} completed) - {report}")
+        with metrics.SINK_FLUSH_SECONDS.time():
+            db.flush()
+        files.commit()
+        if dedup_filter:
+            dedup_filter.save()
+
+    except Exception as e:
+        logger.critical(
+            f"Error processing logs at entry {logs_processed + 1}: {e}", exc_info=True)
+        raise
+
+    return logs_processed
+
+
+def watch_logs(files: loader.CallLogLoader, db: dataStore.DataStore, folder_watcher: watcher.FolderWatcher,
+               batch_size: int, insert_size: int = 500, flush_interval: float = 1.0,
+               dedup_filter: dedup.DedupFilter | None = None) -> int:
+    """
+    Tail the folder and insert new logs as they are written, until SIGINT or SIGTERM is received.
+
+    New rows are flushed to the DataStore, and the loader checkpoint committed, as soon as the
+    files have been drained and at least every `flush_interval` seconds while rows keep coming.
+    On shutdown the rows in flight are flushed before returning.
+
+    Args:
+        files (CallLogLoader): Instance for reading CSV files, created with tail=True.
+        db (DataStore): Instance for database operations.
+        folder_watcher (FolderWatcher): Watcher signalling changes in the folder.
+        batch_size (int): Number of logs to process before logging progress.
+        insert_size (int): Number of logs per CallLogBatch handed to the DataStore.
+        flush_interval (float): Maximum number of seconds a log waits before being flushed.
+        dedup_filter (DedupFilter | None): Filter dropping the logs whose reference was already seen;
+            it is saved together with every checkpoint.
+
+    Returns:
+        Total number of logs processed
+
+    Raises:
+        Exception: If an error occurs during log processing.
+    """
+    logs_processed = 0
+    unflushed = 0
+    last_flush = time.monotonic()
+    stop = threading.Event()
+
+    def request_stop(signum, frame) -> None:
+        logger.info(f"Received signal {signal.Signals(signum).name}, stopping after the logs in flight...")
+        stop.set()
+
+    def flush() -> None:
+        nonlocal unflushed, last_flush
+        with metrics.SINK_FLUSH_SECONDS.time():
+            db.flush()
+        files.commit()
+        if dedup_filter:
+            dedup_filter.save()
+        unflushed = 0
+        last_flush = time.monotonic()
 
+    previous_handlers = {signum: signal.signal(signum, request_stop) for signum in (signal.SIGINT, signal.SIGTERM)}
     try:
-        for row in files.load_csv_files():
-            db.insert(row.to_json())
-            logs_processed += 1
+        while not stop.is_set():
+            for batch in files.load_csv_batches(insert_size):
+                if dedup_filter:
+                    batch = dedup_filter.filter_batch(batch)
+                db.insert_batch(batch)
+                metrics.DOCUMENTS_WRITTEN.inc(len(batch))
+                if (logs_processed + len(batch)) // batch_size > logs_processed // batch_size:
+                    logger.info(f"Processed {logs_processed + len(batch)} logs")
+                logs_processed += len(batch)
+                unflushed += len(batch)
 
-            if logs_processed % batch_size == 0:
-                batch_count += 1
-                logger.info(
-                    f"Processed {logs_processed} logs (batch {batch_count} completed)")
+                if time.monotonic() - last_flush >= flush_interval:
+                    flush()
+                if stop.is_set():
+                    break
+            if unflushed:
+                flush()
+            folder_watcher.wait(flush_interval)
+        flush()
 
     except Exception as e:
         logger.critical(
             f"Error processing logs at entry {logs_processed + 1}: {e}", exc_info=True)
         raise
+    finally:
+        for signum, handler in previous_handlers.items():
+            signal.signal(signum, handler)
 
     return logs_processed
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Load call logs from CSV files into the configured datastores.")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep running and ingest new rows as they are written, until SIGINT/SIGTERM")
+    parser.add_argument("--profile", action="store_true",
+                        help="profile the run with a wall-clock sampler (~5%% slower); cProfile (~3.4x) and tracemalloc (~9x) "
+                             "are opt-ins through profile_cprofile and profile_memory_interval")
+    filters = parser.add_argument_group(
+        "filters", "load only the matching logs, e.g. to backfill one day; they replace the filter_* settings")
+    filters.add_argument("--start", type=datetime.fromisoformat, default=None,
+                         help="smallest call timestamp, ISO 8601 taken as UTC without an offset, e.g. 2025-01-01T00:00:00Z; earlier hourly files are not opened")
+    filters.add_argument("--end", type=datetime.fromisoformat, default=None,
+                         help="call timestamp the logs are before (excluded), ISO 8601 taken as UTC without an offset; later hourly files are not opened")
+    filters.add_argument("--status", action="append", default=None,
+                         help="status prefix, e.g. failed; repeat it to accept several")
+    filters.add_argument("--caller", action="append", default=None, help="caller number; repeat it to accept several")
+    filters.add_argument("--receiver", action="append", default=None, help="receiver number; repeat it to accept several")
+    args = parser.parse_args()
+    row_filter = None
+    if any(value is not None for value in (args.start, args.end, args.status, args.caller, args.receiver)):
+        try:
+            row_filter = decoder.RowFilter(
+                args.start, args.end, tuple(args.status or ()),
+                frozenset(args.caller) if args.caller else None, frozenset(args.receiver) if args.receiver else None)
+        except ValueError as e:
+            parser.error(str(e))
+    main(watch=args.watch, profile=args.profile, row_filter=row_filter)
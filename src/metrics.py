@@ -0,0 +1,361 @@
+from contextlib import contextmanager
+from typing import Callable, Iterator
+from pathlib import Path
+import threading
+import bisect
+import logging
+import time
+import json
+import os
+
+# Set up module-level logger.
+logger = logging.getLogger(__name__)
+#logger.setLevel(logging.DEBUG)
+
+class Counter:
+    """
+    Monotonic count of events, e.g. rows read or _bulk requests sent.
+    """
+
+    def __init__(self, name: str, description: str) -> None:
+        """
+        Args:
+            name (str): Metric name, without the registry prefix.
+            description (str): One-line description, exported as the Prometheus HELP text.
+        """
+        self.name: str = name
+        self.description: str = description
+        self.__value: int = 0
+        self.__function: Callable[[], int] | None = None
+        self.__lock = threading.Lock()
+
+    @property
+    def value(self) -> int:
+        """
+        int: The count, read from the function when one is set.
+        """
+        return self.__function() if self.__function else self.__value
+
+    def inc(self, amount: int = 1) -> None:
+        """
+        Add amount to the counter.
+        """
+        with self.__lock:
+            self.__value += amount
+
+    def set_function(self, function: Callable[[], int] | None) -> None:
+        """
+        Read the count from a function instead, for counts another object already keeps,
+        e.g. RejectChannel.rejected.
+
+        Args:
+            function (Callable[[], int] | None): Returns the current count; None goes back to inc().
+        """
+        self.__function = function
+
+    def reset(self) -> None:
+        """
+        Zero the count and drop the function.
+        """
+        with self.__lock:
+            self.__value = 0
+            self.__function = None
+
+
+class Histogram:
+    """
+    Distribution of durations in seconds, kept as counts per exponential bucket together with
+    their count, sum, min and max, so memory does not grow with the number of observations.
+    """
+    # Upper bounds of the buckets: 50 microseconds doubling up to about 26 seconds.
+    BUCKETS: tuple[float, ...] = tuple(0.00005 * 2 ** exponent for exponent in range(20))
+
+    def __init__(self, name: str, description: str) -> None:
+        """
+        Args:
+            name (str): Metric name, without the registry prefix.
+            description (str): One-line description, exported as the Prometheus HELP text.
+        """
+        self.name: str = name
+        self.description: str = description
+        self.__lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Drop every observation.
+        """
+        with self.__lock:
+            self.count: int = 0
+            self.sum: float = 0.0
+            self.min: float = float('inf')
+            self.max: float = 0.0
+            self.buckets: list[int] = [0] * (len(self.BUCKETS) + 1)
+
+    def observe(self, value: float) -> None:
+        """
+        Record one duration.
+
+        Args:
+            value (float): The duration in seconds.
+        """
+        index = bisect.bisect_left(self.BUCKETS, value)
+        with self.__lock:
+            self.buckets[index] += 1
+            self.count += 1
+            self.sum += value
+            if value < self.min:
+                self.min = value
+            if value > self.max:
+                self.max = value
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        """
+        Observe the duration of the with block.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def quantile(self, quantile: float) -> float:
+        """
+        Estimate a quantile by linear interpolation within its bucket.
+
+        Args:
+            quantile (float): Between 0 and 1, e.g. 0.99.
+
+        Returns:
+            float: The estimated duration, 0.0 when nothing was observed.
+        """
+        if not self.count:
+            return 0.0
+        rank = quantile * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.buckets):
+            if bucket_count and seen + bucket_count >= rank:
+                lower = self.BUCKETS[index - 1] if index > 0 else 0.0
+                upper = self.BUCKETS[index] if index < len(self.BUCKETS) else self.max
+                estimate = lower + (upper - lower) * (rank - seen) / bucket_count
+                return min(max(estimate, self.min), self.max)
+            seen += bucket_count
+        return self.max
+
+    def summary(self) -> dict:
+        """
+        Returns:
+            dict: count, sum, min, mean, p50, p90, p99 and max, in seconds.
+        """
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min if self.count else 0.0,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+            "max": self.max,
+        }
+
+
+class Metrics:
+    """
+    Registry of the counters and latency histograms of a run, exported as a JSON report and
+    as a Prometheus textfile (for the node_exporter textfile collector).
+    """
+    PREFIX: str = 'call_log_handler_'
+
+    def __init__(self) -> None:
+        """
+        Initialize an empty registry; the run is timed from now.
+        """
+        self.__counters: dict[str, Counter] = {}
+        self.__histograms: dict[str, Histogram] = {}
+        self.__lock = threading.Lock()
+        self.__started: float = time.monotonic()
+        self.__writer: threading.Thread | None = None
+        self.__stop_writer = threading.Event()
+
+    def counter(self, name: str, description: str = '') -> Counter:
+        """
+        Get the counter called name, creating it on first use.
+        """
+        with self.__lock:
+            if name not in self.__counters:
+                self.__counters[name] = Counter(name, description)
+            return self.__counters[name]
+
+    def histogram(self, name: str, description: str = '') -> Histogram:
+        """
+        Get the histogram called name, creating it on first use.
+        """
+        with self.__lock:
+            if name not in self.__histograms:
+                self.__histograms[name] = Histogram(name, description)
+            return self.__histograms[name]
+
+    def reset(self) -> None:
+        """
+        Zero every metric and restart the run clock. The metric objects are kept, so references
+        held by the instrumented code stay valid.
+        """
+        with self.__lock:
+            for counter in self.__counters.values():
+                counter.reset()
+            for histogram in self.__histograms.values():
+                histogram.reset()
+            self.__started = time.monotonic()
+
+    def snapshot(self) -> dict:
+        """
+        Returns:
+            dict: Elapsed seconds, the counters, their per-second rates and a summary of each histogram.
+        """
+        elapsed = time.monotonic() - self.__started
+        with self.__lock:
+            counters = {name: counter.value for name, counter in sorted(self.__counters.items())}
+            histograms = {name: histogram.summary() for name, histogram in sorted(self.__histograms.items())}
+        return {
+            "elapsed_seconds": elapsed,
+            "counters": counters,
+            "rates_per_second": {name: value / elapsed if elapsed > 0 else 0.0 for name, value in counters.items()},
+            "histograms_seconds": histograms,
+        }
+
+    def write_report(self, report_path: str) -> None:
+        """
+        Write the snapshot as a JSON report.
+
+        Args:
+            report_path (str): Destination file, replaced atomically.
+        """
+        self.__write(Path(report_path), json.dumps(self.snapshot(), indent=2) + "\n")
+        logger.info(f"Metrics report written to: {report_path}")
+
+    def write_prometheus(self, textfile_path: str) -> None:
+        """
+        Write every metric in the Prometheus text exposition format.
+
+        Args:
+            textfile_path (str): Destination file, replaced atomically so the collector never reads a partial file.
+        """
+        lines: list[str] = []
+        with self.__lock:
+            counters = sorted(self.__counters.items())
+            histograms = sorted(self.__histograms.items())
+        for name, counter in counters:
+            metric = self.PREFIX + name
+            lines += [f"# HELP {metric} {counter.description}", f"# TYPE {metric} counter", f"{metric} {counter.value}"]
+        for name, histogram in histograms:
+            metric = self.PREFIX + name
+            lines += [f"# HELP {metric} {histogram.description}", f"# TYPE {metric} histogram"]
+            cumulative = 0
+            for upper, bucket_count in zip(histogram.BUCKETS, histogram.buckets):
+                cumulative += bucket_count
+                lines.append(f'{metric}_bucket{{le="{upper:g}"}} {cumulative}')
+            lines += [f'{metric}_bucket{{le="+Inf"}} {histogram.count}',
+                      f"{metric}_sum {histogram.sum}", f"{metric}_count {histogram.count}"]
+        metric = self.PREFIX + "elapsed_seconds"
+        lines += [f"# HELP {metric} Seconds since the run started.", f"# TYPE {metric} gauge",
+                  f"{metric} {time.monotonic() - self.__started}"]
+        self.__write(Path(textfile_path), "\n".join(lines) + "\n")
+
+    @contextmanager
+    def exporting(self, report_path: str | None = None, textfile_path: str | None = None,
+                  interval: float = 15.0) -> Iterator["Metrics"]:
+        """
+        Export the metrics of the run in the with block: the Prometheus textfile is rewritten every
+        interval seconds, and both files are written a last time on exit, also when the run fails.
+
+        Args:
+            report_path (str | None): JSON report written on exit; None to skip it.
+            textfile_path (str | None): Prometheus textfile; None to skip it.
+            interval (float): Seconds between two writes of the textfile.
+
+        Yields:
+            Metrics: The registry itself.
+        """
+        self.reset()
+        if textfile_path:
+            self.start_prometheus_writer(textfile_path, interval)
+        try:
+            yield self
+        finally:
+            self.stop_prometheus_writer()
+            snapshot = self.snapshot()
+            counters, rates = snapshot["counters"], snapshot["rates_per_second"]
+            logger.info(f"Read {counters['rows_read_total']} rows in {snapshot['elapsed_seconds']:.2f}s: "
+                        f"{rates['rows_read_total']:,.0f} rows/s, {rates['bytes_read_total'] / 1024 / 1024:,.1f} MiB/s, "
+                        f"{counters['rows_rejected_total']} rejected")
+            try:
+                if textfile_path:
+                    self.write_prometheus(textfile_path)
+                if report_path:
+                    self.write_report(report_path)
+            except OSError as e:
+                logger.warning(f"Could not write the metrics: {e}")
+
+    def start_prometheus_writer(self, textfile_path: str, interval: float) -> None:
+        """
+        Rewrite the Prometheus textfile every interval seconds from a background thread,
+        until stop_prometheus_writer() is called.
+
+        Args:
+            textfile_path (str): Destination file.
+            interval (float): Seconds between two writes.
+        """
+        def write_periodically() -> None:
+            while not self.__stop_writer.wait(interval):
+                try:
+                    self.write_prometheus(textfile_path)
+                except OSError as e:
+                    logger.warning(f"Could not write the Prometheus textfile {textfile_path}: {e}")
+
+        self.__stop_writer.clear()
+        self.__writer = threading.Thread(target=write_periodically, name="metrics-writer", daemon=True)
+        self.__writer.start()
+        logger.info(f"Writing Prometheus metrics every {interval:g}s to: {textfile_path}")
+
+    def stop_prometheus_writer(self) -> None:
+        """
+        Stop the background writer, if running.
+        """
+        if self.__writer:
+            self.__stop_writer.set()
+            self.__writer.join()
+            self.__writer = None
+
+    def __write(self, path: Path, content: str) -> None:
+        """
+        Replace a file atomically with content.
+        """
+        temporary_path = path.with_name(path.name + '.tmp')
+        with open(temporary_path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        os.replace(temporary_path, path)
+
+
+# Registry shared by the modules of the handler.
+REGISTRY = Metrics()
+
+# Metrics recorded by the handler. Pipeline work done in worker processes is timed there and
+# observed by the parent; the whole-file workers of the parallel loader record no timings.
+FILE_OPEN_SECONDS = REGISTRY.histogram('file_open_seconds', 'Time to open a CSV file and read its header.')
+DECODE_SECONDS = REGISTRY.histogram('decode_batch_seconds', 'Time to decode the rows of one batch.')
+SERIALIZE_SECONDS = REGISTRY.histogram('serialize_batch_seconds', 'Time to render one batch into its sink payload.')
+SINK_FLUSH_SECONDS = REGISTRY.histogram('sink_flush_seconds', 'Time to flush the data store at a checkpoint.')
+BULK_SECONDS = REGISTRY.histogram('elasticsearch_bulk_seconds', 'Round-trip time of the Elasticsearch _bulk requests.')
+FILES_OPENED = REGISTRY.counter('files_opened_total', 'CSV files opened.')
+FILES_FILTERED = REGISTRY.counter('files_filtered_total', 'CSV files skipped unopened, their name-encoded hour being outside the time window.')
+ROWS_READ = REGISTRY.counter('rows_read_total', 'Data rows read from the CSV files.')
+BYTES_READ = REGISTRY.counter('bytes_read_total', 'Bytes read from the CSV files.')
+ROWS_REJECTED = REGISTRY.counter('rows_rejected_total', 'Malformed rows skipped.')
+ROWS_DUPLICATE = REGISTRY.counter('rows_duplicate_total', 'Rows dropped by the dedup filter.')
+ROWS_FILTERED = REGISTRY.counter('rows_filtered_total', 'Rows dropped by the time window and row predicates.')
+DOCUMENTS_WRITTEN = REGISTRY.counter('documents_written_total', 'Call logs handed to the data store.')
+BULK_DOCUMENTS = REGISTRY.counter('elasticsearch_documents_total', 'Documents sent in _bulk requests.')
+BULK_BYTES = REGISTRY.counter('elasticsearch_bytes_total', 'Bytes of the _bulk request bodies.')
+BULK_FAILED = REGISTRY.counter('elasticsearch_documents_failed_total', 'Documents rejected by Elasticsearch, duplicates excluded.')
+BULK_DUPLICATES = REGISTRY.counter('elasticsearch_documents_duplicate_total', 'Documents Elasticsearch already held.')
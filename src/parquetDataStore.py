@@ -0,0 +1,334 @@
+from datetime import datetime, timezone
+from typing import Callable
+from pathlib import Path
+import iDataStore as interface
+import functools
+import callLog
+import metrics
+import logging
+import json
+import time
+import os
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# Set up module-level logger.
+logger = logging.getLogger(__name__)
+#logger.setLevel(logging.DEBUG)
+
+# Mapping used when none is configured, the same as data/Mapping.json.
+DEFAULT_MAPPING: dict = {"mappings": {"properties": {
+    "timestamp": {"type": "date"},
+    "caller": {"type": "keyword"},
+    "receiver": {"type": "keyword"},
+    "duration": {"type": "integer"},
+    "status": {"type": "keyword"},
+    "UniqueCallReference": {"type": "keyword"},
+}}}
+# Arrow type name of each Elasticsearch field type a column can be mapped to.
+ARROW_TYPES: dict[str, str] = {'date': 'timestamp', 'keyword': 'string', 'text': 'string',
+                               'long': 'int64', 'integer': 'int32', 'short': 'int16'}
+# Fields of the mapping the columns of a CallLogBatch can fill, with the types each one accepts.
+FIELD_TYPES: dict[str, tuple[str, ...]] = {
+    'timestamp': ('date',),
+    'caller': ('keyword', 'text'),
+    'receiver': ('keyword', 'text'),
+    'duration': ('long', 'integer', 'short'),
+    'status': ('keyword', 'text'),
+    'UniqueCallReference': ('keyword', 'text'),
+}
+
+def arrow_schema(mapping: dict | None = None) -> "pa.Schema":
+    """
+    Build the Arrow schema of the Parquet files from an Elasticsearch mapping.
+
+    Columns follow the order of the mapping properties: 'date' becomes a UTC timestamp in seconds,
+    'keyword' and 'text' a string, 'long', 'integer' and 'short' a signed integer of that width.
+
+    Args:
+        mapping (dict | None): The index mapping, e.g. the content of data/Mapping.json; None uses DEFAULT_MAPPING.
+
+    Returns:
+        pa.Schema: One field per mapped property.
+
+    Raises:
+        ValueError: If the mapping has no properties, or a property is not a call log field
+            or is mapped to a type its values cannot be stored as.
+    """
+    properties = (mapping or DEFAULT_MAPPING).get("mappings", {}).get("properties", {})
+    if not properties:
+        error_msg: str = "Invalid mapping for the Parquet export: no 'mappings.properties' found."
+        logger.error(error_msg)
+        raise ValueError(error_msg)
+    fields = []
+    for name, field in properties.items():
+        field_type = field.get("type")
+        if field_type not in FIELD_TYPES.get(name, ()):
+            error_msg: str = (f"Invalid mapping for the Parquet export: field '{name}' of type '{field_type}'"
+                              f" cannot be written, supported fields are {FIELD_TYPES}.")
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+        arrow_type = ARROW_TYPES[field_type]
+        fields.append(pa.field(name, pa.timestamp('s', tz='UTC') if arrow_type == 'timestamp'
+                               else getattr(pa, arrow_type)(), nullable=False))
+    return pa.schema(fields)
+
+def render_partitions(schema: "pa.Schema", batch: callLog.CallLogBatch) -> list[tuple[int, "pa.Table"]]:
+    """
+    Convert a CallLogBatch into Arrow tables, one per hour of call timestamps; the batch renderer of ParquetDataStore.
+
+    Timestamps and durations are wrapped without copying, statuses are expanded from the batch's
+    status table; integer columns are cast to their mapped width, failing on overflow.
+
+    Args:
+        schema (pa.Schema): Schema returned by arrow_schema().
+        batch (CallLogBatch): The call logs to convert.
+
+    Returns:
+        list[tuple[int, pa.Table]]: Hours since the epoch and the rows of that hour, by increasing hour.
+    """
+    size = len(batch)
+    timestamps = pa.Array.from_buffers(pa.int64(), size, [None, pa.py_buffer(batch.timestamps)])
+    columns: dict[str, Callable[[], pa.Array]] = {
+        'timestamp': lambda: timestamps,
+        'caller': lambda: pa.array(batch.callers, pa.string()),
+        'receiver': lambda: pa.array(batch.receivers, pa.string()),
+        'duration': lambda: pa.Array.from_buffers(pa.int64(), size, [None, pa.py_buffer(batch.durations)]),
+        'status': lambda: pa.array(batch.statuses, pa.string()).take(
+            pa.Array.from_buffers(pa.uint16(), size, [None, pa.py_buffer(batch.status_codes)])),
+        'UniqueCallReference': lambda: pa.array(batch.uniqueCallReferences, pa.string()),
+    }
+    table = pa.Table.from_arrays([columns[field.name]().cast(field.type) for field in schema], schema=schema)
+    hours = pc.divide(timestamps, 3600)
+    first_hour, last_hour = pc.min_max(hours).values()
+    if first_hour == last_hour:
+        return [(first_hour.as_py(), table)]
+    return [(hour, table.filter(pc.equal(hours, hour))) for hour in sorted(pc.unique(hours).to_pylist())]
+
+
+class ParquetDataStore(interface.IDataStore):
+    """
+    Implementation of the IDataStore interface writing the call logs to Parquet files, partitioned by call hour.
+
+    Columns are typed after the index mapping, and rows go to a Hive-style directory per hour of their
+    timestamp, e.g. date=2025-01-01/hour=08/, so analytics tools only open the hours they need and
+    only read the columns they use. Each partition buffers its rows until row_group_size of them can
+    be written as one row group.
+
+    Parquet files are only readable once their footer is written. A file is completed when it holds
+    max_file_rows rows, when the rows have moved on to a later hour, when it is the least recently
+    written of max_open_files, or on close(); flush(), e.g. at every checkpoint, only completes the
+    files of the hours before the latest one, so the file of the current hour keeps filling whole
+    row groups across checkpoints. Files are written under a hidden name and renamed once complete,
+    so readers never see a partial file.
+
+    File completion is therefore not tied to the checkpoints: the rows of the files still open are
+    covered by the checkpoints taken meanwhile, and are lost if the run dies before they are
+    completed. Rerun the hours of the hidden .tmp files left behind by such a run without the
+    checkpoint manifest.
+    """
+    COMPRESSIONS: tuple[str, ...] = ('none', 'snappy', 'gzip', 'brotli', 'lz4', 'zstd')
+
+    def __init__(self, parquet_path: str, mapping: dict | None = None, row_group_size: int = 128 * 1024,
+                 compression: str = 'zstd', max_open_files: int = 16, max_file_rows: int = 1024 * 1024) -> None:
+        """
+        Initialize the ParquetDataStore instance.
+
+        Args:
+            parquet_path (str): Root directory of the partitions, created if missing.
+            mapping (dict | None): Index mapping the column types are derived from; None uses DEFAULT_MAPPING.
+            row_group_size (int): Number of rows per row group.
+            compression (str): Codec of the column chunks, one of COMPRESSIONS.
+            max_open_files (int): Number of partitions written at the same time; when rows of
+                another hour arrive, the least recently written file is completed first.
+            max_file_rows (int): Number of rows after which a file is completed and the next rows
+                of its hour go to a new one, rounded up to whole row groups.
+
+        Raises:
+            ValueError: If the pyarrow module is not installed, the compression is unknown or not
+                available in this pyarrow build, or the mapping cannot be written to Parquet.
+        """
+        if pa is None:
+            error_msg: str = "Parquet export requested but the pyarrow module is not installed."
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+        if compression not in self.COMPRESSIONS or (compression != 'none' and not pa.Codec.is_available(compression)):
+            error_msg: str = f"Invalid or unavailable Parquet compression: {compression}. Must be one of {self.COMPRESSIONS}."
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+        logger.info("Initializing ParquetDataStore...")
+        self.parquet_path = Path(parquet_path)
+        self.parquet_path.mkdir(parents=True, exist_ok=True)
+        self.schema = arrow_schema(mapping)
+        self.row_group_size: int = row_group_size
+        self.compression: str = compression
+        self.max_open_files: int = max_open_files
+        self.max_file_rows: int = max_file_rows
+        self.rows_written: int = 0
+        self.files_written: int = 0
+        self.__run = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+        # Open partitions by hour since the epoch, least recently written first.
+        self.__partitions: dict[int, _Partition] = {}
+        # Latest hour since the epoch rows were inserted for, the files of earlier hours are completed on flush().
+        self.__latest_hour: int | None = None
+        logger.info(f"Parquet export path set to: {self.parquet_path} ({compression}, {row_group_size} rows per row group)")
+
+    def insert(self, json_log) -> None:
+        """
+        Write a single JSON-formatted log entry.
+
+        Args:
+            json_log (str): A JSON-formatted string representing a call log entry.
+        """
+        self.insert_many([json_log])
+
+    def insert_many(self, json_logs: list[str]) -> None:
+        """
+        Write a batch of JSON-formatted log entries.
+
+        Args:
+            json_logs (list[str]): JSON-formatted strings representing call log entries.
+        """
+        batch = callLog.CallLogBatch()
+        for json_log in json_logs:
+            log = json.loads(json_log)
+            batch.append(datetime.fromisoformat(log['timestamp']), log['caller'], log['receiver'],
+                         log['duration'], log['status'], log['UniqueCallReference'])
+        self.insert_batch(batch)
+
+    def insert_batch(self, batch: callLog.CallLogBatch) -> None:
+        """
+        Convert a CallLogBatch to Arrow tables and buffer them in their partitions.
+
+        Args:
+            batch (CallLogBatch): The call logs to insert.
+        """
+        if not batch:
+            return
+        with metrics.SERIALIZE_SECONDS.time():
+            payload = self.batch_renderer()(batch)
+        self.insert_rendered(payload, len(batch))
+
+    def batch_renderer(self) -> Callable[[callLog.CallLogBatch], list[tuple[int, "pa.Table"]]]:
+        """
+        Returns:
+            Callable[[CallLogBatch], list[tuple[int, pa.Table]]]: render_partitions bound to the schema.
+        """
+        return functools.partial(render_partitions, self.schema)
+
+    def insert_rendered(self, payload: list[tuple[int, "pa.Table"]], documents: int) -> None:
+        """
+        Buffer the tables of a batch rendered by batch_renderer() and write the full row groups.
+
+        Args:
+            payload (list[tuple[int, pa.Table]]): Tables by hour since the epoch.
+            documents (int): Number of call logs in the payload.
+        """
+        for hour, table in payload:
+            if self.__latest_hour is None or hour > self.__latest_hour:
+                self.__latest_hour = hour
+            partition = self.__partitions.pop(hour, None)
+            if partition is None:
+                if len(self.__partitions) >= self.max_open_files:
+                    self.__close(self.__partitions.pop(next(iter(self.__partitions))))
+                partition = _Partition(self.__file_path(hour))
+            # Reinserted last, so the first partition is always the least recently written.
+            self.__partitions[hour] = partition
+            partition.tables.append(table)
+            partition.rows += len(table)
+            while partition.rows >= self.row_group_size:
+                # Whole row groups, up to the first one reaching max_file_rows.
+                room = -(-(self.max_file_rows - partition.written) // self.row_group_size) * self.row_group_size
+                self.__write(partition, min(partition.rows - partition.rows % self.row_group_size, room))
+                if partition.written >= self.max_file_rows:
+                    self.__complete(partition)
+                    partition = self.__partitions[hour] = partition.carry_over(self.__file_path(hour))
+
+    def flush(self) -> None:
+        """
+        Complete the files of the hours before the latest one inserted; the file of the latest hour
+        stays open, with its rows short of a row group still buffered.
+        """
+        for hour in [hour for hour in self.__partitions if hour < self.__latest_hour]:
+            self.__close(self.__partitions.pop(hour))
+
+    def close(self) -> None:
+        """
+        Write the buffered rows, complete every open file and report what was written.
+        """
+        partitions, self.__partitions = self.__partitions, {}
+        for partition in partitions.values():
+            self.__close(partition)
+        logger.info(f"Wrote {self.rows_written} logs to {self.files_written} Parquet files under {self.parquet_path}")
+
+    def __file_path(self, hour: int) -> Path:
+        """
+        Returns:
+            Path: A new file of the partition of an hour since the epoch, e.g.
+                date=2025-01-01/hour=08/part-20250101T120000-4242-00001.parquet
+        """
+        start = datetime.fromtimestamp(hour * 3600, timezone.utc)
+        self.files_written += 1
+        return (self.parquet_path / f"date={start:%Y-%m-%d}" / f"hour={start:%H}"
+                / f"part-{self.__run}-{self.files_written:05d}.parquet")
+
+    def __write(self, partition: "_Partition", rows: int) -> None:
+        """
+        Write the first rows buffered in a partition, opening its file if needed, and keep the rest buffered.
+        """
+        table = pa.concat_tables(partition.tables)
+        if partition.writer is None:
+            partition.file_path.parent.mkdir(parents=True, exist_ok=True)
+            partition.writer = pq.ParquetWriter(partition.temporary_path, self.schema, compression=self.compression)
+        partition.writer.write_table(table.slice(0, rows), row_group_size=self.row_group_size)
+        partition.tables = [table.slice(rows)] if rows < len(table) else []
+        partition.rows -= rows
+        partition.written += rows
+        self.rows_written += rows
+
+    def __close(self, partition: "_Partition") -> None:
+        """
+        Write the rows left in a partition and complete its file.
+        """
+        if partition.rows:
+            self.__write(partition, partition.rows)
+        self.__complete(partition)
+
+    def __complete(self, partition: "_Partition") -> None:
+        """
+        Close the file of a partition, if it was opened, and give it its final name.
+        """
+        if partition.writer is not None:
+            partition.writer.close()
+            os.replace(partition.temporary_path, partition.file_path)
+            logger.debug(f"Completed Parquet file: {partition.file_path}")
+
+
+class _Partition:
+    """
+    File being written for one hour, with the rows buffered until the next row group.
+    """
+    __slots__ = ('file_path', 'temporary_path', 'writer', 'tables', 'rows', 'written')
+
+    def __init__(self, file_path: Path) -> None:
+        self.file_path = file_path
+        # Readers of the dataset skip names starting with a dot.
+        self.temporary_path = file_path.with_name(f".{file_path.name}.tmp")
+        self.writer = None
+        self.tables: list = []
+        self.rows: int = 0
+        self.written: int = 0
+
+    def carry_over(self, file_path: Path) -> "_Partition":
+        """
+        Returns:
+            _Partition: A partition writing to a new file, with the rows still buffered in this one.
+        """
+        partition = _Partition(file_path)
+        partition.tables, partition.rows = self.tables, self.rows
+        return partition
@@ -0,0 +1,423 @@
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Generator
+from collections import deque
+from pathlib import Path
+import threading
+import functools
+import callLog
+import decoder
+import dedup
+import logging
+import loader
+import metrics
+import queue
+import time
+
+# Set up module-level logger.
+logger = logging.getLogger(__name__)
+#logger.setLevel(logging.DEBUG)
+
+# Marks the end of the stream on a stage queue.
+_END = object()
+# Reject channel of each worker thread or process, so rate limiting spans the chunks it decodes.
+_worker_state = threading.local()
+
+class Chunk:
+    """
+    Unit of work flowing through the pipeline: a run of consecutive lines of one file, first raw,
+    then decoded into a CallLogBatch, then rendered into the payload of the sink.
+    """
+    __slots__ = ('csv_file', 'header', 'lines', 'first_row', 'offset', 'rows', 'complete', 'line_count',
+                 'size', 'batch', 'payload', 'documents', 'rejected', 'filtered', 'duplicates',
+                 'decode_seconds', 'serialize_seconds')
+
+    def __init__(self, csv_file: Path, header: list[str], lines: list[bytes] | loader.ByteRange, first_row: int,
+                 offset: int, rows: int, complete: bool = False) -> None:
+        """
+        Initialize a raw chunk.
+
+        Args:
+            csv_file (Path): File the lines come from.
+            header (list[str]): Column names of the file.
+            lines (list[bytes] | ByteRange): The raw lines, terminators included, or the byte range
+                holding them when the file is split; the range is then read by the parse stage.
+            first_row (int): Number of the first data row of the chunk.
+            offset (int): Byte offset just past the last line of the chunk.
+            rows (int): Number of data rows read from the start of the file after the chunk.
+            complete (bool): Whether the file was read to its end with this chunk.
+
+        Attributes:
+            line_count (int): Number of raw lines in the chunk.
+            size (int): Number of bytes of the raw lines.
+            batch (CallLogBatch | None): The decoded rows, once parsed.
+            payload (Any): Output of the store's batch renderer, once serialized.
+            documents (int): Number of valid rows in the chunk, once parsed.
+            rejected (int): Number of malformed rows in the chunk, once parsed.
+            filtered (int): Number of rows dropped by the row filter, once parsed.
+            duplicates (int): Number of rows dropped by the dedup filter.
+            decode_seconds (float): Time spent decoding the lines, once parsed.
+            serialize_seconds (float): Time spent rendering the batch, once serialized.
+        """
+        self.csv_file = csv_file
+        self.header = header
+        self.lines: list[bytes] | loader.ByteRange | None = lines
+        self.first_row = first_row
+        self.offset = offset
+        self.rows = rows
+        self.complete = complete
+        self.line_count: int = len(lines)
+        self.size: int = lines.stop - lines.start if isinstance(lines, loader.ByteRange) else sum(map(len, lines))
+        self.batch: callLog.CallLogBatch | None = None
+        self.payload: Any = None
+        self.documents: int = 0
+        self.rejected: int = 0
+        self.filtered: int = 0
+        self.duplicates: int = 0
+        self.decode_seconds: float = 0.0
+        self.serialize_seconds: float = 0.0
+
+
+def parse_chunk(row_filter: decoder.RowFilter | None, chunk: Chunk) -> Chunk:
+    """
+    Decode the raw lines of a chunk into a CallLogBatch; the work of the parse stage.
+    The lines of a byte range are read here, in the worker, instead of in the read stage.
+
+    Args:
+        row_filter (RowFilter | None): Conditions the rows must pass, None to keep every row.
+        chunk (Chunk): A raw chunk.
+
+    Returns:
+        Chunk: The same chunk, holding the batch instead of the raw lines.
+    """
+    rejects = getattr(_worker_state, 'rejects', None)
+    if rejects is None:
+        rejects = _worker_state.rejects = decoder.RejectChannel()
+    rejected_before = rejects.rejected
+    filtered_before = rejects.filtered
+    started = time.perf_counter()
+    lines = chunk.lines
+    if isinstance(lines, loader.ByteRange):
+        lines = lines.read_lines(chunk.csv_file)
+    row_decoder = decoder.RowDecoder(chunk.header, chunk.csv_file, rejects, row_filter)
+    decode_into = row_decoder.decode_into
+    batch = callLog.CallLogBatch()
+    for row_number, line in enumerate(lines, chunk.first_row):
+        decode_into(line, row_number, batch)
+    chunk.batch = batch
+    chunk.lines = None
+    chunk.documents = len(batch)
+    chunk.rejected = rejects.rejected - rejected_before
+    chunk.filtered = rejects.filtered - filtered_before
+    chunk.decode_seconds = time.perf_counter() - started
+    return chunk
+
+def dedup_chunk(dedup_filter: dedup.DedupFilter, chunk: Chunk) -> Chunk:
+    """
+    Drop the rows of a chunk whose uniqueCallReference was already seen; the work of the dedup stage.
+
+    Args:
+        dedup_filter (DedupFilter): The filter, shared by every chunk of the run.
+        chunk (Chunk): A parsed chunk.
+
+    Returns:
+        Chunk: The same chunk, without its duplicate rows.
+    """
+    if chunk.batch:
+        chunk.batch = dedup_filter.filter_batch(chunk.batch)
+        chunk.duplicates = chunk.documents - len(chunk.batch)
+        chunk.documents = len(chunk.batch)
+    return chunk
+
+def serialize_chunk(render: Callable[[callLog.CallLogBatch], Any], chunk: Chunk) -> Chunk:
+    """
+    Render the batch of a chunk with the store's batch renderer; the work of the serialize stage.
+
+    Args:
+        render (Callable[[CallLogBatch], Any]): Function returned by IDataStore.batch_renderer().
+        chunk (Chunk): A parsed chunk.
+
+    Returns:
+        Chunk: The same chunk, holding the payload instead of the batch.
+    """
+    if chunk.batch:
+        started = time.perf_counter()
+        chunk.payload = render(chunk.batch)
+        chunk.serialize_seconds = time.perf_counter() - started
+    chunk.batch = None
+    return chunk
+
+
+class Stage:
+    """
+    One step of the pipeline: applies a function to every chunk of its input queue with a pool of
+    thread or process workers and forwards the results, in input order, to the next queue.
+    """
+    MODES: tuple[str, ...] = ('thread', 'process')
+
+    def __init__(self, name: str, function: Callable[[Chunk], Chunk] | None, workers: int = 1,
+                 mode: str = 'thread', queue_size: int = 8) -> None:
+        """
+        Initialize the stage.
+
+        Args:
+            name (str): Name used in progress reports.
+            function (Callable[[Chunk], Chunk] | None): Work applied to each chunk; must be picklable
+                in process mode. None for the read and sink ends, which only count chunks.
+            workers (int): Number of workers; a single thread worker runs in the stage thread itself.
+            mode (str): 'thread' or 'process'.
+            queue_size (int): Capacity of the input queue, in chunks; 0 for the read stage, which has none.
+
+        Attributes:
+            input (queue.Queue | None): Bounded queue feeding the stage.
+            lines (int): Number of lines that went through the stage.
+            size (int): Number of raw bytes that went through the stage.
+
+        Raises:
+            ValueError: If the mode is unknown or workers is lower than 1.
+        """
+        if mode not in self.MODES:
+            error_msg: str = f"Invalid {name} stage mode: {mode}. Must be one of {self.MODES}."
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+        if workers < 1:
+            error_msg: str = f"Invalid {name} stage workers: {workers}. Must be at least 1."
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+        self.name: str = name
+        self.function = function
+        self.workers: int = workers
+        self.mode: str = mode
+        self.input: queue.Queue | None = queue.Queue(queue_size) if queue_size else None
+        self.lines: int = 0
+        self.size: int = 0
+
+    def count(self, chunk: Chunk) -> None:
+        """
+        Account a chunk that went through the stage.
+        """
+        self.lines += chunk.line_count
+        self.size += chunk.size
+
+    def executor(self) -> Executor | None:
+        """
+        Returns:
+            Executor | None: The pool running the work, or None when it runs in the stage thread.
+        """
+        if self.mode == 'process':
+            return ProcessPoolExecutor(max_workers=self.workers)
+        if self.workers > 1:
+            return ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"{self.name}-stage")
+        return None
+
+    def describe(self, elapsed: float) -> str:
+        """
+        Returns:
+            str: Queue depth and throughput of the stage, for progress reports.
+        """
+        depth = f"queue {self.input.qsize()}/{self.input.maxsize}, " if self.input is not None else ""
+        return f"{self.name}: {depth}{self.lines / elapsed if elapsed > 0 else 0:,.0f} rows/s"
+
+
+class Pipeline:
+    """
+    Runs the read -> parse -> dedup -> serialize stages of process_logs in background threads, connected
+    by bounded queues, and hands the chunks to the sink in file order by iterating over it.
+
+    Reading runs in one thread, since it follows the byte offsets of each file, and the sink runs in
+    the iterating thread, since stores and checkpoints are sequential; the optional dedup stage runs in
+    one thread, since the filter is shared. Parse and serialize can use several thread or process
+    workers each. Every queue is bounded, so the slowest stage sets the
+    pace: the stages before it block on a full queue instead of buffering more chunks.
+    """
+
+    def __init__(self, files: loader.CallLogLoader, chunk_size: int,
+                 render: Callable[[callLog.CallLogBatch], Any] | None = None,
+                 parse_workers: int = 1, parse_mode: str = 'thread',
+                 serialize_workers: int = 1, serialize_mode: str = 'thread', queue_size: int = 8,
+                 dedup_filter: dedup.DedupFilter | None = None) -> None:
+        """
+        Initialize the pipeline; use it as a context manager and iterate over it to run it.
+
+        Args:
+            files (CallLogLoader): Loader providing the raw chunks, and the row filter of the parse stage.
+            chunk_size (int): Maximum number of lines per chunk.
+            render (Callable[[CallLogBatch], Any] | None): Function returned by IDataStore.batch_renderer();
+                when None there is no serialize stage and the sink receives the batches.
+            parse_workers (int): Number of workers of the parse stage.
+            parse_mode (str): 'thread' or 'process' workers for the parse stage.
+            serialize_workers (int): Number of workers of the serialize stage.
+            serialize_mode (str): 'thread' or 'process' workers for the serialize stage.
+            queue_size (int): Capacity of each queue between two stages, in chunks.
+            dedup_filter (DedupFilter | None): Filter dropping already seen references before
+                serialization; no dedup stage when None.
+
+        Raises:
+            ValueError: If a stage mode is unknown or a worker count is lower than 1.
+        """
+        self.__files = files
+        self.__chunk_size = chunk_size
+        self.read = Stage('read', None, queue_size=0)
+        self.stages: list[Stage] = [Stage('parse', functools.partial(parse_chunk, files.row_filter),
+                                          parse_workers, parse_mode, queue_size)]
+        if dedup_filter is not None:
+            self.stages.append(Stage('dedup', functools.partial(dedup_chunk, dedup_filter), queue_size=queue_size))
+        if render is not None:
+            self.stages.append(Stage('serialize', functools.partial(serialize_chunk, render),
+                                     serialize_workers, serialize_mode, queue_size))
+        self.sink = Stage('sink', None, queue_size=queue_size)
+        self.__stop = threading.Event()
+        self.__failure: BaseException | None = None
+        self.__threads: list[threading.Thread] = []
+        self.__executors: list[Executor] = []
+        self.__started: float = 0.0
+
+    def __enter__(self) -> "Pipeline":
+        self.__started = time.perf_counter()
+        outputs = [stage.input for stage in self.stages[1:]] + [self.sink.input]
+        chunks = self.__files.load_raw_chunks(self.__chunk_size)
+        self.__threads.append(threading.Thread(
+            target=self.__guard, args=(self.__read, chunks, self.stages[0].input), name="read-stage", daemon=True))
+        for stage, output in zip(self.stages, outputs):
+            executor = stage.executor()
+            if executor is not None:
+                self.__executors.append(executor)
+            self.__threads.append(threading.Thread(
+                target=self.__guard, args=(self.__work, stage, executor, output), name=f"{stage.name}-stage", daemon=True))
+        for thread in self.__threads:
+            thread.start()
+        logger.info("Pipeline started: " + ", ".join(
+            f"{stage.name} x{stage.workers} {stage.mode}" for stage in self.stages))
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.__stop.set()
+        for thread in self.__threads:
+            thread.join()
+        for executor in self.__executors:
+            executor.shutdown(cancel_futures=True)
+
+    def __iter__(self) -> Generator[Chunk, None, None]:
+        """
+        Yields:
+            Chunk: The chunks in file order, serialized when the store provides a renderer,
+                otherwise holding their CallLogBatch.
+
+        Raises:
+            Exception: The first error raised by a stage.
+        """
+        while True:
+            chunk = self.__get(self.sink.input)
+            if chunk is _END:
+                break
+            self.sink.count(chunk)
+            self.__files.rejects.rejected += chunk.rejected
+            self.__files.rejects.filtered += chunk.filtered
+            metrics.DECODE_SECONDS.observe(chunk.decode_seconds)
+            if chunk.serialize_seconds:
+                metrics.SERIALIZE_SECONDS.observe(chunk.serialize_seconds)
+            yield chunk
+        if self.__failure is not None:
+            raise self.__failure
+
+    def report(self) -> str:
+        """
+        Returns:
+            str: Queue depth and throughput of every stage since the pipeline started.
+        """
+        elapsed = time.perf_counter() - self.__started
+        return " | ".join(stage.describe(elapsed) for stage in [self.read, *self.stages, self.sink])
+
+    def __guard(self, target: Callable, *args) -> None:
+        """
+        Run a stage thread, recording its error and stopping the other stages if it fails.
+        """
+        try:
+            target(*args)
+        except _Stopped:
+            pass
+        except BaseException as e:
+            if self.__failure is None:
+                self.__failure = e
+            logger.error(f"Pipeline stage failed: {e}")
+            self.__stop.set()
+
+    def __read(self, chunks, output: queue.Queue) -> None:
+        """
+        Read the raw chunks of the pending files into the first queue.
+        """
+        for csv_file, header, lines, first_row, offset, rows, complete in chunks:
+            chunk = Chunk(csv_file, header, lines, first_row, offset, rows, complete)
+            self.read.count(chunk)
+            metrics.ROWS_READ.inc(chunk.line_count)
+            metrics.BYTES_READ.inc(chunk.size)
+            self.__put(output, chunk)
+        self.__put(output, _END)
+
+    def __work(self, stage: Stage, executor: Executor | None, output: queue.Queue) -> None:
+        """
+        Apply the work of a stage to its input queue, keeping at most two chunks per worker in flight
+        and forwarding the results in input order.
+        """
+        if executor is None:
+            while (chunk := self.__get(stage.input)) is not _END:
+                chunk = stage.function(chunk)
+                stage.count(chunk)
+                self.__put(output, chunk)
+            self.__put(output, _END)
+            return
+
+        in_flight: deque[Future] = deque()
+
+        def forward(block: bool) -> None:
+            while in_flight and (block or in_flight[0].done()):
+                chunk = in_flight.popleft().result()
+                stage.count(chunk)
+                self.__put(output, chunk)
+                block = False
+
+        while True:
+            try:
+                chunk = stage.input.get(timeout=0.05)
+            except queue.Empty:
+                if self.__stop.is_set():
+                    raise _Stopped()
+                forward(False)
+                continue
+            if chunk is _END:
+                break
+            in_flight.append(executor.submit(stage.function, chunk))
+            forward(len(in_flight) >= stage.workers * 2)
+        while in_flight:
+            forward(True)
+        self.__put(output, _END)
+
+    def __put(self, output: queue.Queue, item: Any) -> None:
+        """
+        Put an item on a queue, waiting while it is full unless the pipeline is stopping.
+        """
+        while True:
+            try:
+                output.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                if self.__stop.is_set():
+                    raise _Stopped()
+
+    def __get(self, source: queue.Queue) -> Any:
+        """
+        Take an item from a queue, waiting while it is empty unless the pipeline is stopping.
+        """
+        while True:
+            try:
+                return source.get(timeout=0.1)
+            except queue.Empty:
+                if self.__stop.is_set():
+                    if self.__failure is not None:
+                        raise self.__failure
+                    raise _Stopped()
+
+
+class _Stopped(Exception):
+    """
+    Raised in a stage thread when the pipeline stops before the stream ends.
+    """
@@ -0,0 +1,283 @@
+from collections import Counter, defaultdict
+from pathlib import Path
+import tracemalloc
+import threading
+import cProfile
+import logging
+import pstats
+import time
+import json
+import sys
+import io
+import os
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+import metrics
+
+# Set up module-level logger.
+logger = logging.getLogger(__name__)
+#logger.setLevel(logging.DEBUG)
+
+# Until Python 3.12 a cProfile profiler only sees the thread that enabled it, so each thread gets its own;
+# from 3.12 it is built on sys.monitoring, which allows a single profiler seeing every thread.
+PER_THREAD_CPROFILE: bool = sys.version_info < (3, 12)
+
+def stage_of(thread_name: str) -> str:
+    """
+    Name the pipeline stage a thread works for, from the thread names given by Pipeline and FanOutDataStore,
+    e.g. 'parse-stage_0' -> 'parse', 'elasticsearch-sink' -> 'elasticsearch-sink'; the main thread is the sink.
+
+    Returns:
+        str: The stage name.
+    """
+    if thread_name == 'MainThread':
+        return 'sink'
+    if '-stage' in thread_name:
+        return thread_name.split('-stage')[0]
+    return thread_name
+
+
+class RunProfiler:
+    """
+    Profiles a run of the handler, writing its artifacts to a directory of its own.
+
+    Up to three profilers run together; by default only the sampler, the only one cheap enough for
+    production runs, while cProfile and tracemalloc are opt-ins:
+    - cProfile, deterministic, in every thread: profile.pstats holds the whole run and
+      hot_functions.txt its top functions, per pipeline stage before Python 3.12 (see
+      PER_THREAD_CPROFILE) and for the whole process after. It slows the run ~3.4x.
+    - A sampling wall-clock profiler, reading the stacks of every thread each sample interval:
+      wallclock.folded holds the collapsed stacks by stage (for flamegraph.pl or speedscope) and
+      hot_functions.txt the functions seen most often on top of each stage's stack, including
+      time spent waiting on queues and I/O. Its cost is bounded by the sample interval: ~5% at 10 ms.
+    - tracemalloc, with a snapshot every memory interval of call logs written: memory.txt and
+      profile.json hold the peak traced memory and the top allocation sites of the largest snapshot.
+      Tracing every allocation slows the run ~9x, as decoding allocates per field.
+
+    The costs are from 300k logs exported to a file; with the sampler alone a production run
+    can be profiled. profile.json records the time spent sampling and the peak RSS of every run.
+
+    Only this process is profiled: the work of process workers shows as waits on their results.
+    """
+
+    def __init__(self, profile_path: str, cprofile: bool = False, sample_interval: float = 0.01,
+                 memory_interval: int = 0, memory_frames: int = 1, top: int = 25) -> None:
+        """
+        Initialize the profiler; use it as a context manager around the run.
+
+        Args:
+            profile_path (str): Directory receiving the artifacts; each run writes to a subdirectory named after its start time.
+            cprofile (bool): Run cProfile in every thread.
+            sample_interval (float): Seconds between two samples of the wall-clock profiler, 0 to disable it.
+            memory_interval (int): Number of call logs written between two tracemalloc snapshots, 0 to disable tracemalloc.
+            memory_frames (int): Number of frames kept per allocation by tracemalloc.
+            top (int): Number of functions and allocation sites reported.
+        """
+        self.directory = Path(profile_path) / f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+        self.cprofile: bool = cprofile
+        self.sample_interval: float = sample_interval
+        self.memory_interval: int = memory_interval
+        self.memory_frames: int = memory_frames
+        self.top: int = top
+        self.samples: int = 0
+        self.sampler_seconds: float = 0.0
+        self.__profiles: dict[str, list[cProfile.Profile]] = defaultdict(list)
+        self.__profiles_lock = threading.Lock()
+        self.__stacks: Counter = Counter()
+        self.__snapshots: int = 0
+        self.__peak_snapshot: tracemalloc.Snapshot | None = None
+        self.__peak_snapshot_size: int = 0
+        self.__next_snapshot: int = memory_interval
+        self.__stop = threading.Event()
+        self.__sampler: threading.Thread | None = None
+        self.__started: float = 0.0
+        self.__cpu_started: float = 0.0
+
+    def __enter__(self) -> "RunProfiler":
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if self.memory_interval:
+            tracemalloc.start(self.memory_frames)
+        # Started first, so the sampler is not profiled itself.
+        if self.sample_interval or self.memory_interval:
+            self.__sampler = threading.Thread(target=self.__sample, name="profiler", daemon=True)
+            self.__sampler.start()
+        if self.cprofile and PER_THREAD_CPROFILE:
+            # New threads install their own profiler on their first event; the main thread profiles itself now.
+            threading.setprofile(self.__profile_thread)
+            self.__profile_thread(sys._getframe(), 'call', None)
+        elif self.cprofile:
+            profile = cProfile.Profile()
+            self.__profiles['process'].append(profile)
+            profile.enable()
+        self.__started = time.perf_counter()
+        self.__cpu_started = time.process_time()
+        logger.info(f"Profiling the run to: {self.directory}")
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        elapsed = time.perf_counter() - self.__started
+        cpu = time.process_time() - self.__cpu_started
+        self.__stop.set()
+        if self.__sampler is not None:
+            self.__sampler.join()
+        if self.cprofile and PER_THREAD_CPROFILE:
+            threading.setprofile(None)
+            sys.setprofile(None)
+        elif self.cprofile:
+            for profile in self.__profiles['process']:
+                profile.disable()
+        try:
+            self.__write(elapsed, cpu)
+        except OSError as e:
+            logger.warning(f"Could not write the profile: {e}")
+        finally:
+            if self.memory_interval:
+                tracemalloc.stop()
+
+    def __profile_thread(self, frame, event: str, arg) -> None:
+        """
+        Profile function of the threads started during the run: replaces itself with a cProfile profiler for the thread.
+        """
+        profile = cProfile.Profile()
+        with self.__profiles_lock:
+            self.__profiles[stage_of(threading.current_thread().name)].append(profile)
+        profile.enable()
+
+    def __sample(self) -> None:
+        """
+        Sample the stacks of every thread, and take the tracemalloc snapshots, until the run ends.
+        """
+        interval = self.sample_interval or 0.1
+        own = threading.get_ident()
+        labels: dict = {}
+        while not self.__stop.wait(interval):
+            started = time.perf_counter()
+            if self.sample_interval:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                for ident, frame in sys._current_frames().items():
+                    if ident == own:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        code = frame.f_code
+                        label = labels.get(code)
+                        if label is None:
+                            label = labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+                        stack.append(label)
+                        frame = frame.f_back
+                    stack.append(stage_of(names.get(ident, str(ident))))
+                    self.__stacks[";".join(reversed(stack))] += 1
+                self.samples += 1
+            if self.memory_interval and metrics.DOCUMENTS_WRITTEN.value >= self.__next_snapshot:
+                self.__snapshot()
+                while self.__next_snapshot <= metrics.DOCUMENTS_WRITTEN.value:
+                    self.__next_snapshot += self.memory_interval
+            self.sampler_seconds += time.perf_counter() - started
+
+    def __snapshot(self) -> None:
+        """
+        Take a tracemalloc snapshot, keeping it if it is the largest one so far.
+        """
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap>")])
+        size = sum(statistic.size for statistic in snapshot.statistics('filename'))
+        self.__snapshots += 1
+        logger.debug(f"tracemalloc snapshot {self.__snapshots}: {size / 1024 / 1024:.1f} MiB traced")
+        if size >= self.__peak_snapshot_size:
+            self.__peak_snapshot, self.__peak_snapshot_size = snapshot, size
+
+    def __write(self, elapsed: float, cpu: float) -> None:
+        """
+        Write the artifacts of the run.
+        """
+        summary: dict = {"elapsed_seconds": elapsed, "cpu_seconds": cpu,
+                         "documents_written": metrics.DOCUMENTS_WRITTEN.value,
+                         "sampler_seconds": self.sampler_seconds}
+        if resource is not None:
+            # ru_maxrss is in KiB on Linux and in bytes on macOS.
+            max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            summary["max_rss_bytes"] = max_rss if sys.platform == 'darwin' else max_rss * 1024
+        report = io.StringIO()
+        if self.cprofile:
+            with self.__profiles_lock:
+                profiles = {stage: list(stage_profiles) for stage, stage_profiles in self.__profiles.items()}
+            stats_by_stage = {stage: self.__merge(stage_profiles) for stage, stage_profiles in profiles.items()}
+            stats_by_stage = {stage: stats for stage, stats in stats_by_stage.items() if stats is not None}
+            if stats_by_stage:
+                run_stats = self.__merge([stats for stats in stats_by_stage.values()])
+                run_stats.dump_stats(self.directory / "profile.pstats")
+            summary["cprofile"] = {}
+            report.write(f"# cProfile: top {self.top} functions by own time, per stage\n")
+            for stage, stats in sorted(stats_by_stage.items()):
+                hot = top_functions(stats, self.top)
+                summary["cprofile"][stage] = hot
+                report.write(f"\n## {stage}\n")
+                for function in hot:
+                    report.write(f"{function['own_seconds']:10.3f}s {function['cumulative_seconds']:10.3f}s "
+                                 f"{function['calls']:>10}  {function['function']}\n")
+        if self.sample_interval:
+            with open(self.directory / "wallclock.folded", 'w', encoding='utf-8') as folded:
+                for stack, count in self.__stacks.most_common():
+                    folded.write(f"{stack} {count}\n")
+            leaves: dict[str, Counter] = defaultdict(Counter)
+            for stack, count in self.__stacks.items():
+                frames = stack.split(";")
+                leaves[frames[0]][frames[-1]] += count
+            summary["wallclock"] = {"samples": self.samples, "interval_seconds": self.sample_interval, "stages": {}}
+            report.write(f"\n# Wall clock: top {self.top} functions on top of the stack, per stage "
+                         f"({self.samples} samples every {self.sample_interval * 1000:g} ms)\n")
+            for stage, functions in sorted(leaves.items()):
+                hot = [{"function": function, "samples": count, "share": count / self.samples}
+                       for function, count in functions.most_common(self.top)]
+                summary["wallclock"]["stages"][stage] = hot
+                report.write(f"\n## {stage}\n")
+                for function in hot:
+                    report.write(f"{function['share']:7.1%} {function['samples']:>8}  {function['function']}\n")
+        (self.directory / "hot_functions.txt").write_text(report.getvalue(), encoding='utf-8')
+        if self.memory_interval:
+            self.__snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            sites = [{"site": str(statistic.traceback), "bytes": statistic.size, "blocks": statistic.count}
+                     for statistic in self.__peak_snapshot.statistics('lineno')[:self.top]]
+            summary["memory"] = {"peak_traced_bytes": peak, "snapshots": self.__snapshots,
+                                 "largest_snapshot_bytes": self.__peak_snapshot_size, "top_sites": sites}
+            with open(self.directory / "memory.txt", 'w', encoding='utf-8') as memory:
+                memory.write(f"# Peak traced memory: {peak / 1024 / 1024:.1f} MiB; top {self.top} allocation sites "
+                             f"of the largest of {self.__snapshots} snapshots ({self.__peak_snapshot_size / 1024 / 1024:.1f} MiB)\n\n")
+                for site in sites:
+                    memory.write(f"{site['bytes'] / 1024:12.1f} KiB {site['blocks']:>10} blocks  {site['site']}\n")
+        (self.directory / "profile.json").write_text(json.dumps(summary, indent=2) + "\n", encoding='utf-8')
+        logger.info(f"Profile written to: {self.directory} ({elapsed:.2f}s elapsed, {cpu:.2f}s CPU)")
+
+    def __merge(self, sources: list) -> pstats.Stats | None:
+        """
+        Returns:
+            pstats.Stats | None: The statistics of the profilers or Stats combined, None when none of them recorded anything.
+        """
+        merged: pstats.Stats | None = None
+        for source in sources:
+            if isinstance(source, cProfile.Profile):
+                source.create_stats()
+                if not source.stats:
+                    continue
+            if merged is None:
+                merged = pstats.Stats()
+            merged.add(source)
+        return merged
+
+
+def top_functions(stats: pstats.Stats, top: int) -> list[dict]:
+    """
+    Returns:
+        list[dict]: The functions with the most own time, with their own and cumulative seconds and call count.
+    """
+    rows = []
+    for (filename, line, name), (_, calls, own, cumulative, _) in stats.stats.items():
+        rows.append({"function": f"{name} ({Path(filename).name}:{line})", "own_seconds": own,
+                     "cumulative_seconds": cumulative, "calls": calls})
+    rows.sort(key=lambda row: row["own_seconds"], reverse=True)
+    return rows[:top]
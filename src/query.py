@@ -0,0 +1,86 @@
+from datetime import datetime
+from pathlib import Path
+import argparse
+import logging
+import time
+import sys
+
+import exportIndex
+import config
+
+# Set up module-level logger; the documents go to stdout, so the logs go to stderr.
+logging.basicConfig(level=logging.INFO, format="[%(levelname)s] - %(name)s: %(message)s", stream=sys.stderr)
+logger = logging.getLogger(__name__)
+#logger.setLevel(logging.DEBUG)
+
+
+def query(export_path: str, start: datetime | None = None, end: datetime | None = None, caller: str | None = None,
+          receiver: str | None = None, reference: str | None = None, limit: int | None = None,
+          count: bool = False, update: bool = True) -> int:
+    """
+    Print the exported call logs matching every given condition, as NDJSON on stdout.
+
+    The sidecar index of the export is brought up to date first, which only parses the rows
+    exported since the previous query.
+
+    Args:
+        export_path (str): The NDJSON export file.
+        start (datetime | None): Smallest call timestamp, None for no bound.
+        end (datetime | None): Call timestamp the logs are before, None for no bound.
+        caller (str | None): Caller the logs must have.
+        receiver (str | None): Receiver the logs must have.
+        reference (str | None): uniqueCallReference the logs must have.
+        limit (int | None): Maximum number of logs printed, None for all of them.
+        count (bool): Only print the number of matching logs.
+        update (bool): Index the rows exported since the last update before querying.
+
+    Returns:
+        int: Number of matching logs.
+    """
+    with exportIndex.ExportIndex(export_path) as index:
+        if update:
+            index.update()
+        started = time.perf_counter()
+        matches = 0
+        output = sys.stdout.buffer
+        for document in index.query(
+                exportIndex.seconds_of(start.isoformat()) if start else None,
+                exportIndex.seconds_of(end.isoformat()) if end else None, caller, receiver, reference):
+            matches += 1
+            if not count:
+                output.write(document + b"\n")
+            if limit is not None and matches >= limit:
+                break
+        if count:
+            output.write(f"{matches}\n".encode())
+        output.flush()
+        logger.info(f"{matches} logs found in {time.perf_counter() - started:.3f}s ({index.rows} rows indexed)")
+    return matches
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Query the exported call logs through their sidecar index, e.g. the calls from a caller between two times.")
+    parser.add_argument("--export", default=None,
+                        help="NDJSON export file (default: export_path of src/data/config.ini)")
+    parser.add_argument("--start", type=datetime.fromisoformat, default=None,
+                        help="smallest call timestamp, ISO 8601, e.g. 2025-01-01T08:00:00")
+    parser.add_argument("--end", type=datetime.fromisoformat, default=None,
+                        help="call timestamp the logs are before (excluded), ISO 8601")
+    parser.add_argument("--caller", default=None, help="caller number")
+    parser.add_argument("--receiver", default=None, help="receiver number")
+    parser.add_argument("--reference", default=None, help="uniqueCallReference")
+    parser.add_argument("--limit", type=int, default=None, help="maximum number of logs printed")
+    parser.add_argument("--count", action="store_true", help="only print the number of matching logs")
+    parser.add_argument("--no-update", action="store_true",
+                        help="query the index as it is, without indexing the rows exported since its last update")
+    args = parser.parse_args()
+    export_path = args.export
+    if export_path is None:
+        export_path = config.Config().export_path
+        if export_path is None:
+            parser.error("export_path is not configured, pass --export")
+    if not Path(export_path).is_file():
+        parser.error(f"export file not found: {export_path}")
+    query(export_path, args.start, args.end, args.caller, args.receiver, args.reference,
+          args.limit, args.count, not args.no_update)
@@ -0,0 +1,430 @@
+from elasticsearch import Elasticsearch
+from datetime import datetime, timedelta
+from typing import Callable
+from pathlib import Path
+import iDataStore as interface
+import dataStore
+import functools
+import callLog
+import logging
+import json
+import math
+import os
+
+# Set up module-level logger.
+logger = logging.getLogger(__name__)
+#logger.setLevel(logging.DEBUG)
+
+# Call log fields the rollups are grouped by, within each hour.
+DIMENSIONS: tuple[str, ...] = ('status', 'caller', 'receiver')
+# Duration percentiles precomputed in every rollup document.
+PERCENTILES: tuple[int, ...] = (50, 90, 95, 99)
+# Mapping of the summary index.
+ROLLUP_MAPPING: dict = {"mappings": {"properties": {
+    "hour": {"type": "date"},
+    "dimension": {"type": "keyword"},
+    "key": {"type": "keyword"},
+    "count": {"type": "long"},
+    "duration_sum": {"type": "long"},
+    "duration_min": {"type": "long"},
+    "duration_max": {"type": "long"},
+    "duration_avg": {"type": "double"},
+    **{f"duration_p{percentile}": {"type": "double"} for percentile in PERCENTILES},
+    "duration_sketch": {"type": "object", "enabled": False},
+}}}
+# Rollup key: hour since the epoch, dimension and value of the call log field.
+RollupKey = tuple[int, str, str]
+
+def sketch_bin(duration: int, log_gamma: float) -> int:
+    """
+    Args:
+        duration (int): Call duration in seconds.
+        log_gamma (float): Natural logarithm of the bin growth factor of the sketch.
+
+    Returns:
+        int: Bin of the duration: 0 for zero, else 1 + ceil(log_gamma(duration)).
+    """
+    if duration <= 0:
+        return 0
+    return 1 + math.ceil(math.log(duration) / log_gamma - 1e-9)
+
+def gamma_of(relative_accuracy: float) -> float:
+    """
+    Returns:
+        float: Bin growth factor giving quantile estimates within relative_accuracy of the true value.
+    """
+    return (1 + relative_accuracy) / (1 - relative_accuracy)
+
+def rollup_batch(group_digits: int, log_gamma: float, batch: callLog.CallLogBatch) -> dict[RollupKey, "Rollup"]:
+    """
+    Aggregate a batch per hour and dimension; the batch renderer of RollupDataStore.
+
+    Args:
+        group_digits (int): Callers and receivers are grouped by their first group_digits characters, 0 to keep the full number.
+        log_gamma (float): Natural logarithm of the bin growth factor of the sketches.
+        batch (CallLogBatch): The call logs to aggregate.
+
+    Returns:
+        dict[RollupKey, Rollup]: The rollups of the batch.
+    """
+    rollups: dict[RollupKey, Rollup] = {}
+    bins: dict[int, int] = {}
+    statuses = batch.statuses
+    for timestamp, caller, receiver, duration, code in zip(
+            batch.timestamps, batch.callers, batch.receivers, batch.durations, batch.status_codes):
+        hour = timestamp // 3600
+        duration_bin = bins.get(duration)
+        if duration_bin is None:
+            duration_bin = bins[duration] = sketch_bin(duration, log_gamma)
+        if group_digits:
+            caller, receiver = caller[:group_digits], receiver[:group_digits]
+        for key in ((hour, 'status', statuses[code]), (hour, 'caller', caller), (hour, 'receiver', receiver)):
+            rollup = rollups.get(key)
+            if rollup is None:
+                rollups[key] = Rollup(duration, duration_bin)
+            else:
+                rollup.add(duration, duration_bin)
+    return rollups
+
+
+class Rollup:
+    """
+    Count, sum, minimum and maximum of the durations of a group of calls, with a mergeable
+    sketch of their distribution.
+
+    The sketch counts durations in logarithmic bins, so any percentile is estimated within the
+    relative accuracy it was built with, and two sketches merge exactly by adding their bins.
+    """
+    __slots__ = ('count', 'duration_sum', 'duration_min', 'duration_max', 'bins')
+
+    def __init__(self, duration: int, duration_bin: int) -> None:
+        self.count: int = 1
+        self.duration_sum: int = duration
+        self.duration_min: int = duration
+        self.duration_max: int = duration
+        self.bins: dict[int, int] = {duration_bin: 1}
+
+    def add(self, duration: int, duration_bin: int) -> None:
+        self.count += 1
+        self.duration_sum += duration
+        if duration < self.duration_min:
+            self.duration_min = duration
+        elif duration > self.duration_max:
+            self.duration_max = duration
+        self.bins[duration_bin] = self.bins.get(duration_bin, 0) + 1
+
+    def merge(self, other: "Rollup") -> None:
+        """
+        Add the calls of another rollup built with the same relative accuracy.
+        """
+        self.count += other.count
+        self.duration_sum += other.duration_sum
+        self.duration_min = min(self.duration_min, other.duration_min)
+        self.duration_max = max(self.duration_max, other.duration_max)
+        for duration_bin, count in other.bins.items():
+            self.bins[duration_bin] = self.bins.get(duration_bin, 0) + count
+
+    def percentile(self, percentile: float, gamma: float) -> float:
+        """
+        Args:
+            percentile (float): Percentile between 0 and 100.
+            gamma (float): Bin growth factor the sketch was built with.
+
+        Returns:
+            float: Estimated duration at that percentile, clamped to the exact minimum and maximum.
+        """
+        rank = percentile / 100 * (self.count - 1)
+        seen = 0
+        for duration_bin in sorted(self.bins):
+            seen += self.bins[duration_bin]
+            if seen > rank:
+                break
+        estimate = 0.0 if duration_bin == 0 else 2 * gamma ** (duration_bin - 1) / (gamma + 1)
+        return min(max(estimate, self.duration_min), self.duration_max)
+
+    def to_document(self, key: RollupKey, relative_accuracy: float) -> dict:
+        """
+        Returns:
+            dict: The rollup document of a key, with the precomputed percentiles and the sketch to merge later runs into.
+        """
+        hour, dimension, value = key
+        gamma = gamma_of(relative_accuracy)
+        document = {
+            "hour": (callLog.EPOCH + timedelta(hours=hour)).isoformat(),
+            "dimension": dimension,
+            "key": value,
+            "count": self.count,
+            "duration_sum": self.duration_sum,
+            "duration_min": self.duration_min,
+            "duration_max": self.duration_max,
+            "duration_avg": round(self.duration_sum / self.count, 3),
+        }
+        for percentile in PERCENTILES:
+            document[f"duration_p{percentile}"] = round(self.percentile(percentile, gamma), 3)
+        document["duration_sketch"] = {"relative_accuracy": relative_accuracy,
+                                       "bins": {str(duration_bin): count for duration_bin, count in sorted(self.bins.items())}}
+        return document
+
+    @classmethod
+    def from_document(cls, document: dict, relative_accuracy: float) -> tuple[RollupKey, "Rollup"]:
+        """
+        Rebuild a rollup written by to_document().
+
+        Raises:
+            ValueError: If the document was written with another relative accuracy, so the sketches cannot be merged.
+        """
+        sketch = document["duration_sketch"]
+        if sketch["relative_accuracy"] != relative_accuracy:
+            error_msg: str = (f"Cannot merge rollups of relative accuracy {sketch['relative_accuracy']} "
+                              f"and {relative_accuracy}: {document['hour']} {document['dimension']} {document['key']}")
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+        rollup = cls.__new__(cls)
+        rollup.count = document["count"]
+        rollup.duration_sum = document["duration_sum"]
+        rollup.duration_min = document["duration_min"]
+        rollup.duration_max = document["duration_max"]
+        rollup.bins = {int(duration_bin): count for duration_bin, count in sketch["bins"].items()}
+        hour = int((datetime.fromisoformat(document["hour"]) - callLog.EPOCH).total_seconds()) // 3600
+        return (hour, document["dimension"], document["key"]), rollup
+
+
+class RollupDataStore(interface.IDataStore):
+    """
+    Implementation of the IDataStore interface keeping pre-aggregated rollups of the call logs,
+    per hour × status, hour × caller and hour × receiver, next to the raw documents written by the other stores.
+
+    Batches are aggregated in the serialize stage of the pipeline and merged in memory; every
+    flush() merges what was aggregated since the previous one into the rollups already written,
+    so runs covering the same hour add up. Rollups go to one NDJSON file per hour, e.g.
+    date=2025-01-01/hour=10/rollups.ndjson, replaced atomically, and/or to a summary index where
+    each document's _id is its hour, dimension and key. Each destination keeps the rollups it has
+    not merged yet, hour files and index chunks being dropped as they are written, so a flush()
+    retried after a failure only merges what the failed one did not.
+
+    Merging adds counts, so every row must be aggregated once: main.py only opens the rollups for
+    runs keeping the checkpoint manifest, and never for filtered runs. The rows written but not
+    yet checkpointed when a run is interrupted, and the rows of a CSV file rewritten after it
+    was checkpointed, are still aggregated again by the next run.
+    """
+
+    def __init__(self, rollup_path: str | None = None, elasticsearch_address: str | None = None,
+                 rollup_index: str | None = None, group_digits: int = 3, relative_accuracy: float = 0.01) -> None:
+        """
+        Initialize the RollupDataStore instance.
+
+        Args:
+            rollup_path (str | None): Root directory of the hourly rollup files, created if missing.
+            elasticsearch_address (str | None): URL to the Elasticsearch instance holding the summary index.
+            rollup_index (str | None): Name of the summary index, created if missing.
+            group_digits (int): Callers and receivers are grouped by their first group_digits characters, 0 to keep the full number.
+            relative_accuracy (float): Relative accuracy of the duration percentiles, between 0 and 1.
+
+        Raises:
+            ConnectionError: If connection to Elasticsearch fails.
+            ValueError: If neither destination is given, the summary index has no Elasticsearch
+                address or an invalid name, or the relative accuracy is out of range.
+        """
+        if not rollup_path and not rollup_index:
+            error_msg: str = "Rollups requested without a rollup path or index."
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+        if rollup_index and (not elasticsearch_address or not dataStore.validate_index_name(rollup_index)):
+            error_msg: str = f"Invalid rollup index: {rollup_index}. It needs an Elasticsearch address and a valid index name."
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+        if not 0 < relative_accuracy < 1:
+            error_msg: str = f"Invalid rollup relative accuracy: {relative_accuracy}. Must be between 0 and 1."
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+        logger.info("Initializing RollupDataStore...")
+        self.rollup_path = Path(rollup_path) if rollup_path else None
+        self.rollup_index: str | None = rollup_index
+        self.group_digits: int = group_digits
+        self.relative_accuracy: float = relative_accuracy
+        self.rollups_written: int = 0
+        self.es = None
+        # Rollups aggregated since the last flush.
+        self.__pending: dict[RollupKey, Rollup] = {}
+        # Rollups handed to each destination and not merged yet, with the number of keys handed over.
+        self.__unmerged_hours: dict[int, dict[RollupKey, Rollup]] = {}
+        self.__unmerged_index: dict[RollupKey, Rollup] = {}
+        self.__unmerged: int = 0
+        if self.rollup_path:
+            self.rollup_path.mkdir(parents=True, exist_ok=True)
+        if rollup_index:
+            try:
+                self.es = Elasticsearch(elasticsearch_address, verify_certs=False)
+                if self.es.indices.exists(index=rollup_index).meta.status != 200:
+                    self.es.indices.create(index=rollup_index, body=ROLLUP_MAPPING)
+                    logger.info(f"Rollup index '{rollup_index}' created.")
+            except Exception as e:
+                error_msg = f"Failed to prepare rollup index '{rollup_index}' at {elasticsearch_address}: {e}"
+                logger.exception(error_msg)
+                raise ConnectionError(error_msg)
+        logger.info(f"Rollups set to: {self.__destinations()} (relative accuracy {relative_accuracy})")
+
+    def insert(self, json_log) -> None:
+        """
+        Aggregate a single JSON-formatted log entry.
+
+        Args:
+            json_log (str): A JSON-formatted string representing a call log entry.
+        """
+        self.insert_many([json_log])
+
+    def insert_many(self, json_logs: list[str]) -> None:
+        """
+        Aggregate a batch of JSON-formatted log entries.
+
+        Args:
+            json_logs (list[str]): JSON-formatted strings representing call log entries.
+        """
+        batch = callLog.CallLogBatch()
+        for json_log in json_logs:
+            log = json.loads(json_log)
+            batch.append(datetime.fromisoformat(log['timestamp']), log['caller'], log['receiver'],
+                         log['duration'], log['status'], log['UniqueCallReference'])
+        self.insert_batch(batch)
+
+    def insert_batch(self, batch: callLog.CallLogBatch) -> None:
+        """
+        Aggregate a CallLogBatch.
+
+        Args:
+            batch (CallLogBatch): The call logs to aggregate.
+        """
+        self.insert_rendered(self.batch_renderer()(batch), len(batch))
+
+    def batch_renderer(self) -> Callable[[callLog.CallLogBatch], dict[RollupKey, Rollup]]:
+        """
+        Returns:
+            Callable[[CallLogBatch], dict[RollupKey, Rollup]]: rollup_batch bound to the grouping and the sketch accuracy.
+        """
+        return functools.partial(rollup_batch, self.group_digits, math.log(gamma_of(self.relative_accuracy)))
+
+    def insert_rendered(self, payload: dict[RollupKey, Rollup], documents: int) -> None:
+        """
+        Merge the rollups of a batch aggregated by batch_renderer().
+
+        Args:
+            payload (dict[RollupKey, Rollup]): The rollups of the batch.
+            documents (int): Number of call logs in the payload.
+        """
+        pending = self.__pending
+        for key, rollup in payload.items():
+            current = pending.get(key)
+            if current is None:
+                pending[key] = rollup
+            else:
+                current.merge(rollup)
+
+    def flush(self) -> None:
+        """
+        Merge the rollups aggregated since the last flush, and those a failed flush left unmerged,
+        into the rollup files and the summary index.
+
+        Raises:
+            ValueError: If stored rollups were written with another relative accuracy, or the summary index rejects rollups.
+            elasticsearch.ElasticsearchException: If a request to the summary index fails.
+        """
+        if self.__pending:
+            pending, self.__pending = self.__pending, {}
+            # Each destination merges copies, so what one has not merged yet is unaffected by the other.
+            if self.rollup_path:
+                hours: dict[int, dict[RollupKey, Rollup]] = {}
+                for key, rollup in pending.items():
+                    hours.setdefault(key[0], {})[key] = rollup
+                for hour, rollups in hours.items():
+                    self.__merge(self.__unmerged_hours.setdefault(hour, {}), rollups)
+            if self.es:
+                self.__merge(self.__unmerged_index, pending)
+            self.__unmerged += len(pending)
+        for hour in list(self.__unmerged_hours):
+            self.__merge_file(hour, self.__unmerged_hours[hour])
+            del self.__unmerged_hours[hour]
+        if self.__unmerged_index:
+            self.__merge_index(self.__unmerged_index)
+        self.rollups_written += self.__unmerged
+        self.__unmerged = 0
+
+    def close(self) -> None:
+        """
+        Flush the pending rollups and release the Elasticsearch connection.
+        """
+        try:
+            self.flush()
+        finally:
+            if self.es:
+                self.es.close()
+                self.es = None
+            logger.info(f"Merged {self.rollups_written} rollups into {self.__destinations()}")
+
+    def __destinations(self) -> str:
+        """
+        Returns:
+            str: The configured rollup file directory and summary index, for the logs.
+        """
+        return ", ".join(str(destination) for destination in (self.rollup_path, self.rollup_index) if destination)
+
+    def __merge_file(self, hour: int, rollups: dict[RollupKey, Rollup]) -> None:
+        """
+        Merge rollups into the file of their hour, written under a temporary name and renamed.
+        """
+        start = callLog.EPOCH + timedelta(hours=hour)
+        file_path = self.rollup_path / f"date={start:%Y-%m-%d}" / f"hour={start:%H}" / "rollups.ndjson"
+        merged: dict[RollupKey, Rollup] = {}
+        if file_path.is_file():
+            with open(file_path, 'rb') as rollup_file:
+                merged = dict(Rollup.from_document(json.loads(line), self.relative_accuracy) for line in rollup_file)
+        self.__merge(merged, rollups)
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = file_path.with_name(f".{file_path.name}.tmp")
+        with open(temporary_path, 'w', encoding='utf-8') as rollup_file:
+            for key in sorted(merged, key=lambda key: (key[1], -merged[key].count, key[2])):
+                rollup_file.write(json.dumps(merged[key].to_document(key, self.relative_accuracy)) + "\n")
+        os.replace(temporary_path, file_path)
+
+    def __merge_index(self, rollups: dict[RollupKey, Rollup], chunk_size: int = 1000) -> None:
+        """
+        Merge rollups into the summary index: read the stored documents of the same keys, then index the sums.
+        The keys indexed are removed from rollups, the ones rejected are kept for the next flush.
+        """
+        keys = list(rollups)
+        for start in range(0, len(keys), chunk_size):
+            chunk = keys[start:start + chunk_size]
+            documents = {key: rollups[key].to_document(key, self.relative_accuracy) for key in chunk}
+            ids = {key: f"{document['hour']}|{key[1]}|{key[2]}" for key, document in documents.items()}
+            response = self.es.mget(index=self.rollup_index, ids=list(ids.values()))
+            merged: dict[RollupKey, Rollup] = dict(
+                Rollup.from_document(found["_source"], self.relative_accuracy) for found in response["docs"] if found.get("found"))
+            self.__merge(merged, {key: rollups[key] for key in chunk})
+            operations: list[dict] = []
+            for key in chunk:
+                operations.append({"index": {"_index": self.rollup_index, "_id": ids[key]}})
+                operations.append(merged[key].to_document(key, self.relative_accuracy))
+            response = self.es.bulk(operations=operations)
+            failed: list[dict] = []
+            for key, item in zip(chunk, response['items']):
+                if 'error' in item['index']:
+                    failed.append(item)
+                else:
+                    del rollups[key]
+            if failed:
+                error_msg: str = f"Summary index rejected {len(failed)} rollups, e.g. {failed[0]['index']['error']}"
+                logger.error(error_msg)
+                raise ValueError(error_msg)
+
+    @staticmethod
+    def __merge(merged: dict[RollupKey, Rollup], rollups: dict[RollupKey, Rollup]) -> None:
+        """
+        Add rollups to the stored ones, copying the new keys so the pending rollups are never modified.
+        """
+        for key, rollup in rollups.items():
+            current = merged.get(key)
+            if current is None:
+                current = merged[key] = Rollup.__new__(Rollup)
+                current.count, current.duration_sum = 0, 0
+                current.duration_min, current.duration_max = rollup.duration_min, rollup.duration_max
+                current.bins = {}
+            current.merge(rollup)
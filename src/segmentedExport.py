@@ -0,0 +1,268 @@
+from datetime import datetime, timedelta, timezone
+from typing import BinaryIO
+from pathlib import Path
+import compressedFiles
+import callLog
+import logging
+import gzip
+import json
+import time
+import os
+
+# Set up module-level logger.
+logger = logging.getLogger(__name__)
+#logger.setLevel(logging.DEBUG)
+
+# Length in seconds of the call timestamp period of each rotation.
+ROTATIONS: dict[str, int] = {'none': 0, 'hour': 3600, 'day': 86400}
+# File suffix of each compression.
+COMPRESSIONS: dict[str, str] = {'none': '', 'gzip': '.gz', 'zstd': '.zst'}
+# Segment documents: period start, NDJSON lines, rows, first and last call timestamp in seconds since the epoch.
+Part = tuple[int, bytes, int, int, int]
+
+def split_parts(ndjson: bytes, batch: callLog.CallLogBatch, period: int) -> list[Part]:
+    """
+    Split the NDJSON documents rendered from a batch by call timestamp period.
+
+    Batches read from hourly files usually fall in a single period and are not split.
+
+    Args:
+        ndjson (bytes): The documents returned by NdjsonSerializer.render(), in batch order.
+        batch (CallLogBatch): The call logs they were rendered from.
+        period (int): Length in seconds of a period, 0 to keep the batch in one part.
+
+    Returns:
+        list[Part]: The parts of the NDJSON export, by increasing period.
+    """
+    if not batch:
+        return []
+    timestamps = batch.timestamps
+    first, last = min(timestamps), max(timestamps)
+    if not period or first // period == last // period:
+        return [(first // period * period if period else 0, ndjson, len(batch), first, last)]
+    return group_documents(ndjson.split(b"\n")[:-1], timestamps, period)
+
+def parse_parts(json_logs: list[str], period: int) -> list[Part]:
+    """
+    Split JSON-formatted call logs by call timestamp period.
+
+    Args:
+        json_logs (list[str]): JSON-formatted strings representing call log entries.
+        period (int): Length in seconds of a period, 0 to keep the documents in one part.
+
+    Returns:
+        list[Part]: The parts of the NDJSON export, by increasing period.
+    """
+    timestamps = []
+    for json_log in json_logs:
+        timestamp = datetime.fromisoformat(json.loads(json_log)['timestamp'])
+        if timestamp.tzinfo is not None:
+            timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+        timestamps.append(int((timestamp - callLog.EPOCH).total_seconds()))
+    return group_documents([json_log.encode('utf-8') for json_log in json_logs], timestamps, period)
+
+def group_documents(documents: list[bytes], timestamps, period: int) -> list[Part]:
+    """
+    Group documents, without line terminator, by the period of their call timestamp.
+
+    Returns:
+        list[Part]: The parts of the NDJSON export, by increasing period.
+    """
+    groups: dict[int, list[int]] = {}
+    for row, timestamp in enumerate(timestamps):
+        groups.setdefault(timestamp // period * period if period else 0, []).append(row)
+    parts = []
+    for start, rows in sorted(groups.items()):
+        part_timestamps = [timestamps[row] for row in rows]
+        parts.append((start, b"".join(documents[row] + b"\n" for row in rows), len(rows),
+                      min(part_timestamps), max(part_timestamps)))
+    return parts
+
+
+class SegmentedExport:
+    """
+    NDJSON export split into segment files, rotated by call timestamp period and/or by size,
+    optionally compressed on the fly.
+
+    Segments are laid out under a directory named after the export file, one subdirectory per
+    period, e.g. export/date=2025-01-01/hour=08/export-20250101T120000-4242-00001.ndjson.gz, and
+    every run starts new segments. When a segment is complete a sidecar index is written next to it,
+    e.g. export-20250101T120000-4242-00001.index.json, holding its row count and the first and last
+    call timestamps, so readers can skip segments without opening them; a segment without its
+    sidecar is still being written or was interrupted.
+    """
+    MAX_OPEN_SEGMENTS: int = 16
+
+    def __init__(self, export_path: str, rotate: str = 'none', segment_bytes: int = 0, compression: str = 'none',
+                 buffer_size: int = 1024 * 1024) -> None:
+        """
+        Initialize the export; segments are created when the first documents of their period arrive.
+
+        Args:
+            export_path (str): Path of the single-file export; the segments go to a directory next to it,
+                named after its stem.
+            rotate (str): Call timestamp period of a segment: 'none', 'hour' or 'day'.
+            segment_bytes (int): Uncompressed size in bytes that ends a segment, 0 for no limit.
+            compression (str): 'none', 'gzip' or 'zstd'.
+            buffer_size (int): Size in bytes of the write buffer of each segment file.
+
+        Raises:
+            ValueError: If the rotation or compression is unknown, or 'zstd' is requested but no zstd module is installed.
+        """
+        if rotate not in ROTATIONS:
+            error_msg: str = f"Invalid export rotation: {rotate}. Must be one of {tuple(ROTATIONS)}."
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+        if compression not in COMPRESSIONS:
+            error_msg: str = f"Invalid export compression: {compression}. Must be one of {tuple(COMPRESSIONS)}."
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+        if compression == 'zstd' and compressedFiles.zstd is None:
+            error_msg: str = "Export compression 'zstd' requested but neither compression.zstd nor zstandard is installed."
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+        path = Path(export_path)
+        self.stem: str = path.stem
+        self.directory = path.parent / path.stem
+        self.rotate: str = rotate
+        self.period: int = ROTATIONS[rotate]
+        self.segment_bytes: int = segment_bytes
+        self.compression: str = compression
+        self.buffer_size: int = buffer_size
+        self.segments_written: int = 0
+        self.__run = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+        # Open segments by period start, least recently written first.
+        self.__segments: dict[int, _Segment] = {}
+        self.directory.mkdir(parents=True, exist_ok=True)
+        logger.info(f"Segmented export set to: {self.directory} (rotate {rotate}, "
+                    f"{segment_bytes or 'unlimited'} bytes per segment, compression {compression})")
+
+    def write_documents(self, json_logs: list[str]) -> None:
+        """
+        Write JSON-formatted call logs to the segments of their period.
+
+        Args:
+            json_logs (list[str]): JSON-formatted strings representing call log entries.
+        """
+        self.write(parse_parts(json_logs, self.period))
+
+    def write(self, parts: list[Part]) -> None:
+        """
+        Write rendered parts to the segments of their period, starting a new segment when the size limit is reached.
+
+        Args:
+            parts (list[Part]): Parts returned by split_parts() or parse_parts().
+        """
+        for start, ndjson, rows, first, last in parts:
+            segment = self.__segments.pop(start, None)
+            if segment is not None and self.segment_bytes and segment.bytes and segment.bytes + len(ndjson) > self.segment_bytes:
+                self.__close(segment)
+                segment = None
+            if segment is None:
+                if len(self.__segments) >= self.MAX_OPEN_SEGMENTS:
+                    self.__close(self.__segments.pop(next(iter(self.__segments))))
+                segment = self.__open(start)
+            # Reinserted last, so the first segment is always the least recently written.
+            self.__segments[start] = segment
+            segment.stream.write(ndjson)
+            segment.bytes += len(ndjson)
+            segment.rows += rows
+            segment.first = first if segment.first is None else min(segment.first, first)
+            segment.last = last if segment.last is None else max(segment.last, last)
+
+    def flush(self, fsync: bool = False) -> None:
+        """
+        Flush the open segments; compressed segments are flushed to a block boundary, so every
+        document written so far can be decompressed, although the file only gets its trailer on close.
+
+        Args:
+            fsync (bool): Also fsync the segment files.
+        """
+        for segment in self.__segments.values():
+            segment.flush(fsync)
+
+    def close(self, fsync: bool = False) -> None:
+        """
+        Complete the open segments and write their sidecar indexes.
+
+        Args:
+            fsync (bool): Fsync the segment files before closing them.
+        """
+        segments, self.__segments = self.__segments, {}
+        for segment in segments.values():
+            self.__close(segment, fsync)
+        logger.info(f"Wrote {self.segments_written} export segments under {self.directory}")
+
+    def __open(self, start: int) -> "_Segment":
+        """
+        Create a new segment for the period starting at start, in seconds since the epoch.
+        """
+        directory = self.directory
+        if self.period:
+            period_start = callLog.EPOCH + timedelta(seconds=start)
+            directory = directory / f"date={period_start:%Y-%m-%d}"
+            if self.rotate == 'hour':
+                directory = directory / f"hour={period_start:%H}"
+        directory.mkdir(parents=True, exist_ok=True)
+        self.segments_written += 1
+        name = f"{self.stem}-{self.__run}-{self.segments_written:05d}"
+        file_path = directory / f"{name}.ndjson{COMPRESSIONS[self.compression]}"
+        logger.debug(f"Starting export segment: {file_path}")
+        return _Segment(file_path, directory / f"{name}.index.json", self.compression, self.buffer_size)
+
+    def __close(self, segment: "_Segment", fsync: bool = False) -> None:
+        """
+        Complete a segment, then write its sidecar index atomically.
+        """
+        segment.close(fsync)
+        index = {
+            "segment": segment.file_path.name,
+            "compression": self.compression,
+            "rows": segment.rows,
+            "bytes": segment.bytes,
+            "min_timestamp": (callLog.EPOCH + timedelta(seconds=segment.first)).isoformat() if segment.rows else None,
+            "max_timestamp": (callLog.EPOCH + timedelta(seconds=segment.last)).isoformat() if segment.rows else None,
+        }
+        temporary_path = segment.index_path.with_name(segment.index_path.name + ".tmp")
+        temporary_path.write_text(json.dumps(index, indent=2) + "\n")
+        os.replace(temporary_path, segment.index_path)
+        logger.debug(f"Completed export segment: {segment.file_path} ({segment.rows} rows)")
+
+
+class _Segment:
+    """
+    Segment file being written, with the statistics of its sidecar index.
+    """
+    __slots__ = ('file_path', 'index_path', 'file', 'stream', 'rows', 'bytes', 'first', 'last')
+
+    def __init__(self, file_path: Path, index_path: Path, compression: str, buffer_size: int) -> None:
+        self.file_path = file_path
+        self.index_path = index_path
+        self.file = open(file_path, 'wb', buffering=buffer_size)
+        self.stream: BinaryIO = self.file
+        if compression == 'gzip':
+            self.stream = gzip.GzipFile(fileobj=self.file, mode='wb', compresslevel=6)
+        elif compression == 'zstd':
+            self.stream = compressedFiles.zstd.open(self.file, 'wb')
+        self.rows: int = 0
+        self.bytes: int = 0
+        self.first: int | None = None
+        self.last: int | None = None
+
+    def flush(self, fsync: bool = False) -> None:
+        self.stream.flush()
+        self.file.flush()
+        if fsync:
+            os.fsync(self.file.fileno())
+
+    def close(self, fsync: bool = False) -> None:
+        # zstandard closes the file together with the stream, so the fsync goes through a duplicate descriptor.
+        descriptor = os.dup(self.file.fileno()) if fsync else None
+        try:
+            self.stream.close()
+            self.file.close()
+            if descriptor is not None:
+                os.fsync(descriptor)
+        finally:
+            if descriptor is not None:
+                os.close(descriptor)
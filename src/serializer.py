@@ -0,0 +1,182 @@
+from json.encoder import encode_basestring_ascii
+from datetime import timedelta
+import callLog
+import logging
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Set up module-level logger.
+logger = logging.getLogger(__name__)
+#logger.setLevel(logging.DEBUG)
+
+# "MM:SS" for every second of an hour, so timestamps only need their hour prefix formatted.
+_MINUTES_SECONDS: tuple[str, ...] = tuple(f"{second // 60:02d}:{second % 60:02d}" for second in range(3600))
+
+class NdjsonSerializer:
+    """
+    Renders a CallLogBatch straight to NDJSON bytes, without building a dict or calling json.dumps per record.
+
+    The 'template' backend fills a precompiled document template whose output is byte-for-byte
+    identical to CallLog.to_json(); the optional 'orjson' backend needs the orjson module and
+    produces the same documents without the optional whitespace.
+    """
+    BACKENDS: tuple[str, ...] = ('template', 'orjson')
+    TEMPLATE: str = ('{"timestamp": "%s", "caller": %s, "receiver": %s, "duration": %d, '
+                     '"status": %s, "UniqueCallReference": %s}')
+
+    def __init__(self, backend: str = 'template') -> None:
+        """
+        Initialize the serializer.
+
+        Args:
+            backend (str): 'template' or 'orjson'.
+
+        Raises:
+            ValueError: If the backend is unknown, or 'orjson' is requested but not installed.
+        """
+        if backend not in self.BACKENDS:
+            error_msg: str = f"Invalid serializer backend: {backend}. Must be one of {self.BACKENDS}."
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+        if backend == 'orjson' and orjson is None:
+            error_msg: str = "Serializer backend 'orjson' requested but the orjson module is not installed."
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+        self.backend: str = backend
+        logger.debug(f"Using NDJSON serializer backend: {self.backend}")
+
+    def documents(self, batch: callLog.CallLogBatch) -> list[bytes]:
+        """
+        Render each record of a batch as a JSON document.
+
+        Args:
+            batch (CallLogBatch): The call logs to render.
+
+        Returns:
+            list[bytes]: One JSON document per record, without line terminator.
+        """
+        documents = self.__documents(batch)
+        if self.backend == 'orjson':
+            return documents
+        return [document.encode('ascii') for document in documents]
+
+    def render(self, batch: callLog.CallLogBatch, bulk_action: bytes | None = None,
+               routes: tuple[list[str], list[int] | None] | None = None) -> tuple[bytes, bytes | None]:
+        """
+        Render a batch as an NDJSON export payload and, in the same pass, as an Elasticsearch _bulk body.
+
+        Args:
+            batch (CallLogBatch): The call logs to render.
+            bulk_action (bytes | None): Action/metadata line preceding every document in the
+                _bulk body, e.g. b'{"index":{}}'. A %s in it is replaced by the JSON-encoded
+                uniqueCallReference of the document, e.g. b'{"create":{"_id":%s}}'.
+                No _bulk body is built when None.
+            routes (tuple[list[str], list[int] | None] | None): Index of each document, as returned by
+                IndexRouter.route(): the index names and, when there is more than one, the position of
+                each document's index in that list. The action lines then carry an explicit _index.
+
+        Returns:
+            tuple[bytes, bytes | None]: The NDJSON documents, and the _bulk body or None.
+        """
+        documents = self.__documents(batch)
+        if not documents:
+            return b"", (b"" if bulk_action is not None else None)
+        index_names, codes = routes if routes is not None else ([], None)
+        actions = []
+        if bulk_action is not None:
+            actions = [bulk_action_with_index(bulk_action, index_name) for index_name in index_names] or [bulk_action]
+        if self.backend == 'orjson':
+            newline, encode = b"\n", orjson.dumps
+        else:
+            newline, encode = "\n", encode_basestring_ascii
+            actions = [action.decode('ascii') for action in actions]
+        ndjson = newline.join(documents) + newline
+        bulk = None
+        if actions and b'%s' in bulk_action:
+            references = batch.uniqueCallReferences
+            if codes is None:
+                action = actions[0]
+                lines = [action % encode(reference) for reference in references]
+            else:
+                lines = [actions[code] % encode(reference) for code, reference in zip(codes, references)]
+            bulk = newline.join(line for pair in zip(lines, documents) for line in pair) + newline
+        elif actions and codes is not None:
+            bulk = newline.join(line for pair in zip((actions[code] for code in codes), documents) for line in pair) + newline
+        elif actions:
+            action = actions[0]
+            bulk = action + newline + (newline + action + newline).join(documents) + newline
+        if self.backend == 'orjson':
+            return ndjson, bulk
+        # Escaped JSON is pure ASCII, so encoding cannot fail.
+        return ndjson.encode('ascii'), bulk.encode('ascii') if bulk is not None else None
+
+    def __documents(self, batch: callLog.CallLogBatch) -> list[str] | list[bytes]:
+        """
+        Render the documents of a batch: str with the template backend, bytes with orjson.
+        """
+        timestamps = self.__timestamps(batch)
+        if self.backend == 'orjson':
+            dumps = orjson.dumps
+            statuses = batch.statuses
+            return [
+                dumps({
+                    "timestamp": timestamp,
+                    "caller": caller,
+                    "receiver": receiver,
+                    "duration": duration,
+                    "status": statuses[code],
+                    "UniqueCallReference": reference
+                })
+                for timestamp, caller, receiver, duration, code, reference in zip(
+                    timestamps, batch.callers, batch.receivers, batch.durations, batch.status_codes,
+                    batch.uniqueCallReferences)
+            ]
+
+        template = self.TEMPLATE
+        escape = encode_basestring_ascii
+        statuses = [escape(status) for status in batch.statuses]
+        return [
+            template % (timestamp, escape(caller), escape(receiver), duration, statuses[code], escape(reference))
+            for timestamp, caller, receiver, duration, code, reference in zip(
+                timestamps, batch.callers, batch.receivers, batch.durations, batch.status_codes,
+                batch.uniqueCallReferences)
+        ]
+
+    def __timestamps(self, batch: callLog.CallLogBatch) -> list[str]:
+        """
+        Format the epoch timestamps of a batch as ISO 8601, formatting the date and hour once per hour.
+
+        Returns:
+            list[str]: The timestamps as 'YYYY-MM-DDTHH:MM:SS'.
+        """
+        formatted: list[str] = []
+        current_hour = None
+        prefix = ''
+        for timestamp in batch.timestamps:
+            hour, second = divmod(timestamp, 3600)
+            if hour != current_hour:
+                current_hour = hour
+                prefix = (callLog.EPOCH + timedelta(hours=hour)).isoformat()[:14]
+            formatted.append(prefix + _MINUTES_SECONDS[second])
+        return formatted
+
+
+def bulk_action_with_index(bulk_action: bytes, index_name: str) -> bytes:
+    """
+    Add an explicit _index to a _bulk action line, e.g. b'{"index":{}}' becomes b'{"index":{"_index":"name"}}'.
+
+    Args:
+        bulk_action (bytes): Action line, possibly with a %s placeholder, which is kept.
+        index_name (str): The target index.
+
+    Returns:
+        bytes: The action line; a % in the index name is escaped when the line has a placeholder.
+    """
+    index = encode_basestring_ascii(index_name).encode('ascii')
+    if b'%s' in bulk_action:
+        index = index.replace(b'%', b'%%')
+    head, separator, rest = bulk_action.partition(b':{')
+    return head + separator + b'"_index":' + index + (b'' if rest.startswith(b'}') else b',') + rest
@@ -0,0 +1,208 @@
+from datetime import datetime, timezone
+from typing import Callable
+from pathlib import Path
+import iDataStore as interface
+import callLog
+import metrics
+import logging
+import sqlite3
+import json
+
+# Set up module-level logger.
+logger = logging.getLogger(__name__)
+#logger.setLevel(logging.DEBUG)
+
+# Table row of a call log: timestamp in seconds since the epoch, caller, receiver, duration, status, reference.
+Row = tuple[int, str, str, int, str, str]
+
+def render_rows(batch: callLog.CallLogBatch) -> list[Row]:
+    """
+    Convert a CallLogBatch into table rows; the batch renderer of SqliteDataStore.
+
+    Returns:
+        list[Row]: One tuple per call log, in the column order of the table.
+    """
+    statuses = batch.statuses
+    return list(zip(batch.timestamps, batch.callers, batch.receivers, batch.durations,
+                    [statuses[code] for code in batch.status_codes], batch.uniqueCallReferences))
+
+
+class SqliteDataStore(interface.IDataStore):
+    """
+    Implementation of the IDataStore interface storing the call logs in an embedded SQLite database,
+    for installs without Elasticsearch.
+
+    The database runs in WAL mode and rows are inserted with executemany() in one transaction
+    per flush, i.e. per checkpoint, so the checkpoint manifest never gets ahead of the rows
+    committed. uniqueCallReference is unique: in 'create' mode rows whose reference is already
+    stored are skipped, in 'upsert' mode they replace the stored row. Timestamps are stored as
+    seconds since the epoch, UTC, and timestamp, caller and receiver are indexed for queries.
+    """
+    # INSERT statement of each write mode; 'append' would need duplicate references, which the table rejects.
+    WRITE_MODES: dict[str, str] = {'create': 'INSERT OR IGNORE', 'upsert': 'INSERT OR REPLACE'}
+    SYNCHRONOUS: tuple[str, ...] = ('off', 'normal', 'full')
+    # Secondary indexes, by name suffix: their columns.
+    INDEXES: dict[str, str] = {'timestamp': 'timestamp', 'caller': 'caller, timestamp', 'receiver': 'receiver, timestamp'}
+
+    def __init__(self, sqlite_path: str, table: str = 'call_logs', write_mode: str = 'create',
+                 synchronous: str = 'normal', ingest_mode: bool = False) -> None:
+        """
+        Initialize the SqliteDataStore instance, creating the database, table and indexes if missing.
+
+        Args:
+            sqlite_path (str): Path of the database file.
+            table (str): Name of the table.
+            write_mode (str): 'create' or 'upsert', see DataStore.
+            synchronous (str): SQLite synchronous level: 'off', 'normal' or 'full'. With WAL, 'normal'
+                keeps the database consistent after a crash but may lose the last transactions on power loss.
+            ingest_mode (bool): Drop the timestamp, caller and receiver indexes for the duration of the run
+                and rebuild them in close(), which is faster than updating them row by row.
+
+        Raises:
+            ValueError: If the table name is not an identifier, or the write mode or synchronous level is unknown.
+        """
+        if not table.isidentifier():
+            error_msg: str = f"Invalid SQLite table name: {table}."
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+        if write_mode not in self.WRITE_MODES:
+            error_msg: str = f"Invalid write mode for SQLite: {write_mode}. Must be one of {tuple(self.WRITE_MODES)}."
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+        if synchronous not in self.SYNCHRONOUS:
+            error_msg: str = f"Invalid SQLite synchronous level: {synchronous}. Must be one of {self.SYNCHRONOUS}."
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+        logger.info("Initializing SqliteDataStore...")
+        self.sqlite_path = Path(sqlite_path)
+        self.table: str = table
+        self.write_mode: str = write_mode
+        self.rows_written: int = 0
+        self.duplicate_documents: int = 0
+        self.__statement: str = (f"{self.WRITE_MODES[write_mode]} INTO {table} (timestamp, caller, receiver, "
+                                 f"duration, status, uniqueCallReference) VALUES (?, ?, ?, ?, ?, ?)")
+        # The transaction is managed explicitly: opened by the first insert, committed by flush().
+        # The store is used by one thread at a time, but not always the one that opened it, e.g. a FanOutDataStore worker.
+        self.connection = sqlite3.connect(self.sqlite_path, isolation_level=None, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(f"PRAGMA synchronous={synchronous.upper()}")
+        self.connection.execute("PRAGMA temp_store=MEMORY")
+        self.connection.execute("PRAGMA cache_size=-65536")
+        self.connection.executescript(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                timestamp INTEGER NOT NULL,
+                caller TEXT NOT NULL,
+                receiver TEXT NOT NULL,
+                duration INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                uniqueCallReference TEXT NOT NULL UNIQUE
+            );
+        """)
+        self.__in_transaction: bool = False
+        self.ingest_mode: bool = ingest_mode
+        if ingest_mode:
+            # The unique index stays: it is what skips or replaces the stored references.
+            for name in self.INDEXES:
+                self.connection.execute(f"DROP INDEX IF EXISTS {table}_{name}")
+            logger.info(f"Ingest mode: the indexes of {table} are rebuilt when the store is closed")
+        else:
+            self.__create_indexes()
+        logger.info(f"SQLite database set to: {self.sqlite_path} (table {table}, {write_mode} mode)")
+
+    def insert(self, json_log) -> None:
+        """
+        Insert a single JSON-formatted log entry.
+
+        Args:
+            json_log (str): A JSON-formatted string representing a call log entry.
+        """
+        self.insert_many([json_log])
+
+    def insert_many(self, json_logs: list[str]) -> None:
+        """
+        Insert a batch of JSON-formatted log entries; they are committed by the next flush().
+
+        Args:
+            json_logs (list[str]): JSON-formatted strings representing call log entries.
+        """
+        rows: list[Row] = []
+        for json_log in json_logs:
+            log = json.loads(json_log)
+            timestamp = datetime.fromisoformat(log['timestamp'])
+            if timestamp.tzinfo is not None:
+                timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+            rows.append((int((timestamp - callLog.EPOCH).total_seconds()), log['caller'], log['receiver'],
+                         log['duration'], log['status'], log['UniqueCallReference']))
+        self.insert_rendered(rows, len(rows))
+
+    def insert_batch(self, batch: callLog.CallLogBatch) -> None:
+        """
+        Insert a CallLogBatch; it is committed by the next flush().
+
+        Args:
+            batch (CallLogBatch): The call logs to insert.
+        """
+        with metrics.SERIALIZE_SECONDS.time():
+            rows = render_rows(batch)
+        self.insert_rendered(rows, len(batch))
+
+    def batch_renderer(self) -> Callable[[callLog.CallLogBatch], list[Row]]:
+        """
+        Returns:
+            Callable[[CallLogBatch], list[Row]]: render_rows.
+        """
+        return render_rows
+
+    def insert_rendered(self, payload: list[Row], documents: int) -> None:
+        """
+        Insert the rows of a batch rendered by batch_renderer() in the open transaction.
+
+        Args:
+            payload (list[Row]): The table rows.
+            documents (int): Number of call logs in the payload.
+        """
+        if not payload:
+            return
+        if not self.__in_transaction:
+            self.connection.execute("BEGIN")
+            self.__in_transaction = True
+        changes = self.connection.total_changes
+        self.connection.executemany(self.__statement, payload)
+        inserted = self.connection.total_changes - changes
+        if self.write_mode == 'create':
+            self.duplicate_documents += len(payload) - inserted
+        self.rows_written += inserted if self.write_mode == 'create' else len(payload)
+
+    def flush(self) -> None:
+        """
+        Commit the rows inserted since the last flush.
+        """
+        if self.__in_transaction:
+            self.connection.execute("COMMIT")
+            self.__in_transaction = False
+
+    def close(self) -> None:
+        """
+        Commit the pending rows, rebuild the indexes in ingest mode, checkpoint the WAL into the database file and close the connection.
+        """
+        try:
+            self.flush()
+            if self.ingest_mode:
+                self.__create_indexes()
+            self.connection.execute("PRAGMA optimize")
+            self.connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        finally:
+            if self.__in_transaction:
+                self.connection.execute("ROLLBACK")
+                self.__in_transaction = False
+            self.connection.close()
+            logger.info(f"Wrote {self.rows_written} logs to {self.sqlite_path}")
+            if self.duplicate_documents:
+                logger.info(f"{self.duplicate_documents} documents were already stored and left unchanged")
+
+    def __create_indexes(self) -> None:
+        """
+        Create the missing secondary indexes of the table.
+        """
+        for name, columns in self.INDEXES.items():
+            self.connection.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_{name} ON {self.table} ({columns})")
@@ -1,11 +1,13 @@
 from datetime import datetime, timedelta
 from pathlib import Path
+import argparse
 import logging
 import random
 import sys
 import os
 
 import randomLogs
+import vectorLogs
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import config
 
@@ -62,6 +64,31 @@ def generate_random_log_files():
         random_single_logFile(timestamp, timedelta(hours=1), file_path)
     logger.info("Logs generation completed.")
 
+def generate_vectorized_log_files(number_of_files: int, rows_per_file: int, seed: int, workers: int = 1,
+                                  chunk_rows: int = 500_000, last_hour: datetime | None = None):
+    """
+    Generate log files of full hours with the vectorized generator, for load testing.
+
+    Files are laid out like generate_random_log_files(), going backwards from last_hour in steps
+    of the configured delta, but every file covers a full hour and holds rows_per_file rows.
+    With the same seed, last_hour and chunk_rows the files are identical, whatever the number of workers.
+
+    Args:
+        number_of_files (int): Number of files to generate.
+        rows_per_file (int): Number of rows of each file.
+        seed (int): Seed of the whole set of files.
+        workers (int): Number of worker processes writing files in parallel.
+        chunk_rows (int): Number of rows generated and written at a time by each worker.
+        last_hour (datetime | None): Start of the most recent file; defaults to the current hour.
+    """
+    configs = config.Config("generator")
+    last_hour = last_hour or datetime.now().replace(minute=0, second=0, microsecond=0)
+    starting_hours = [last_hour - timedelta(hours=i * int(configs.delta_T_for_file)) for i in range(number_of_files)]
+    logger.info(f"Generating {number_of_files} files of {rows_per_file} rows with {workers} worker processes (seed {seed}).")
+    written = vectorLogs.generate_log_files(
+        configs.folder_path, starting_hours, timedelta(hours=1), rows_per_file, seed, workers, chunk_rows)
+    logger.info(f"Logs generation completed: {written / 1024 / 1024:.1f} MiB written.")
+
 def random_single_logFile(starting_hour: datetime, deltaT: timedelta, file_path: str):
     """
     Generate a single log file for a given time range and write it to file.
@@ -86,8 +113,23 @@ def random_single_logFile(starting_hour: datetime, deltaT: timedelta, file_path:
 
 if __name__ == "__main__":
     # Entry point for generating random log files.
+    parser = argparse.ArgumentParser(description="Generate random call log files in the configured folder.")
+    parser.add_argument("--vectorized", action="store_true",
+                        help="generate large, seeded files with the NumPy generator instead of 100-1000 random rows per file")
+    parser.add_argument("--files", type=int, default=24, help="vectorized mode: number of hourly files")
+    parser.add_argument("--rows-per-file", type=int, default=1_000_000, help="vectorized mode: rows in each file")
+    parser.add_argument("--seed", type=int, default=42, help="vectorized mode: seed of the files")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="vectorized mode: worker processes")
+    parser.add_argument("--chunk-rows", type=int, default=500_000, help="vectorized mode: rows generated and written at a time")
+    parser.add_argument("--last-hour", type=datetime.fromisoformat, default=None,
+                        help="vectorized mode: start of the most recent file, e.g. 2025-01-01T23:00 (default: current hour)")
+    args = parser.parse_args()
     try:
-        generate_random_log_files()
+        if args.vectorized:
+            generate_vectorized_log_files(args.files, args.rows_per_file, args.seed, args.workers,
+                                          args.chunk_rows, args.last_hour)
+        else:
+            generate_random_log_files()
     except Exception as e:
         error_message: str = f"file random generation failed: {e}"
         logger.critical(error_message, exc_info=True)
@@ -0,0 +1,190 @@
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Iterator
+from pathlib import Path
+import logging
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+#logger.setLevel(logging.DEBUG)
+
+HEADER: bytes = b"timestamp,caller,receiver,duration,status,uniqueCallReference\n"
+# Alphabet of shortuuid, whose uuid() references are 22 characters long.
+REFERENCE_ALPHABET: bytes = b"23456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+REFERENCE_LENGTH: int = 22
+# Statuses of call.Call, indexed by the codes drawn in __status_codes().
+STATUSES: tuple[bytes, ...] = (
+    b"successfully_completed",
+    b"interrupted_higherPre-emptivePriorityInterruption",
+    b"interrupted_exceededTransmissionWindow",
+    b"interrupted_hostTransmissionPrivilegeExpired",
+    b"failed_noAnswer",
+    b"failed_other",
+    b"failed_insufficientPrivilege",
+    b"failed_groupNotExist",
+    b"interrupted_connectionLost",
+    b"interrupted_other",
+)
+# Duration range of each status, both ends included.
+DURATIONS: tuple[tuple[int, int], ...] = (
+    (1, 180), (1, 90), (180, 180), (100, 300), (0, 0), (0, 0), (0, 0), (0, 0), (1, 90), (1, 30),
+)
+
+class VectorLogsfile:
+    """
+    Generates the rows of a call log file with NumPy, a whole chunk of rows per operation instead of
+    one call.Call object per row, with the same status, duration and participant distributions.
+
+    The rows depend only on the seed and the chunk size. Timestamps are drawn as the number of calls
+    per second of the period, so chunks come out already sorted and a file of any size is written
+    in constant memory.
+    References have the length and alphabet of shortuuid.uuid() but are drawn from the seeded generator.
+    """
+
+    def __init__(self, startingHour: datetime, deltaT: timedelta, number_of_logs: int, seed) -> None:
+        """
+        Initialize the generator of one file.
+
+        Args:
+            startingHour (datetime): The start time of the log entries.
+            deltaT (timedelta): The duration over which the entries are spread.
+            number_of_logs (int): Number of rows of the file.
+            seed (int | list[int] | numpy.random.SeedSequence): Seed of the rows.
+
+        Raises:
+            ValueError: If the numpy module is not installed.
+        """
+        if np is None:
+            error_msg: str = "Vectorized log generation requested but the numpy module is not installed."
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+        self.startingHour = startingHour
+        self.deltaT = int(deltaT.total_seconds())
+        self.number_of_logs = number_of_logs
+        self.__random = np.random.default_rng(seed)
+        self.__alphabet = np.frombuffer(REFERENCE_ALPHABET, dtype=np.uint8)
+        self.__statuses = np.array(STATUSES)
+        self.__low = np.array([low for low, _ in DURATIONS])
+        self.__span = np.array([high - low + 1 for low, high in DURATIONS])
+
+    def chunks(self, chunk_rows: int = 500_000) -> Iterator[bytes]:
+        """
+        Generate the rows of the file, sorted by timestamp.
+
+        Args:
+            chunk_rows (int): Maximum number of rows per chunk.
+
+        Yields:
+            bytes: CSV lines, newline terminated, without the header.
+        """
+        seconds = self.deltaT + 1
+        calls_per_second = self.__random.multinomial(self.number_of_logs, np.full(seconds, 1 / seconds))
+        last_row_of_second = np.cumsum(calls_per_second)
+        first_second = np.datetime64(self.startingHour.replace(tzinfo=None), 's')
+        for start in range(0, self.number_of_logs, chunk_rows):
+            rows = np.arange(start, min(start + chunk_rows, self.number_of_logs))
+            timestamps = first_second + np.searchsorted(last_row_of_second, rows, side='right')
+            yield self.__render(timestamps.astype('S19'), len(rows))
+
+    def __render(self, timestamps, size: int) -> bytes:
+        """
+        Draw the other columns of size rows and join them with their timestamps into CSV lines.
+        """
+        is_group_call = self.__random.random(size) < 0.75
+        caller = self.__digits(size, 10)
+        receiver = self.__digits(size, 10)
+        same = ~is_group_call & (receiver == caller)
+        while same.any():
+            receiver[same] = self.__digits(int(same.sum()), 10)
+            same = ~is_group_call & (receiver == caller)
+        receivers = np.where(is_group_call, self.__digits(size, 4), receiver)
+        codes = self.__status_codes(is_group_call, size)
+        durations = self.__low[codes] + (self.__random.random(size) * self.__span[codes]).astype(np.int64)
+        references = self.__alphabet[self.__random.integers(
+            0, len(self.__alphabet), (size, REFERENCE_LENGTH), dtype=np.uint8)].view(f'S{REFERENCE_LENGTH}').ravel()
+        separator = b","
+        columns = (timestamps, caller, receivers, durations.astype('S3'), self.__statuses[codes], references)
+        return b"\n".join(map(separator.join, zip(*(column.tolist() for column in columns)))) + b"\n"
+
+    def __digits(self, size: int, length: int):
+        """
+        Draw size numeric IDs of length digits, each digit uniform like call.Call.__generate_id().
+        """
+        digits = self.__random.integers(0, 10, (size, length), dtype=np.uint8) + ord('0')
+        return digits.view(f'S{length}').ravel()
+
+    def __status_codes(self, is_group_call, size: int):
+        """
+        Draw the status of each row with the decision tree of call.Call.__generate_random_callStatus().
+        """
+        chances = self.__random.random(size)
+        chances2_low = self.__random.random(size) < 0.5
+        completed = self.__random.random(size) < 0.6
+        interrupted = np.where(is_group_call, 3, np.where(chances2_low, 1, 2))
+        failed = np.where(is_group_call, np.where(chances2_low, 6, 7), np.where(chances2_low, 4, 5))
+        other = np.where(~is_group_call & chances2_low, 8, 9)
+        return np.select([completed, chances < 0.1, chances < 0.5], [0, interrupted, failed], other)
+
+
+def write_log_file(file_path: Path, startingHour: datetime, deltaT: timedelta, number_of_logs: int,
+                   seed, chunk_rows: int = 500_000) -> int:
+    """
+    Write one log file chunk by chunk; the unit of work of generate_log_files().
+
+    Args:
+        file_path (Path): Destination file.
+        startingHour (datetime): The start time of the log entries.
+        deltaT (timedelta): The duration over which the entries are spread.
+        number_of_logs (int): Number of rows of the file.
+        seed (int | list[int] | numpy.random.SeedSequence): Seed of the rows.
+        chunk_rows (int): Number of rows generated and written at a time.
+
+    Returns:
+        int: Number of bytes written.
+    """
+    written = len(HEADER)
+    with open(file_path, 'wb') as file:
+        file.write(HEADER)
+        for chunk in VectorLogsfile(startingHour, deltaT, number_of_logs, seed).chunks(chunk_rows):
+            written += file.write(chunk)
+    logger.debug(f"Generated log file: {file_path}")
+    return written
+
+def generate_log_files(file_path: str, startingHours: list[datetime], deltaT: timedelta, number_of_logs: int,
+                       seed: int, workers: int = 1, chunk_rows: int = 500_000) -> int:
+    """
+    Write one log file per starting hour, in parallel worker processes.
+
+    Every file gets its own seed derived from seed and its position in startingHours, so the
+    output does not depend on the number of workers.
+
+    Args:
+        file_path (str): Directory where the log files are saved.
+        startingHours (list[datetime]): The start time of each file.
+        deltaT (timedelta): The duration over which the entries of each file are spread.
+        number_of_logs (int): Number of rows per file.
+        seed (int): Seed of the whole set of files.
+        workers (int): Number of worker processes, 1 writes the files in this process.
+        chunk_rows (int): Number of rows generated and written at a time.
+
+    Returns:
+        int: Number of bytes written.
+
+    Raises:
+        ValueError: If the numpy module is not installed.
+    """
+    if np is None:
+        error_msg: str = "Vectorized log generation requested but the numpy module is not installed."
+        logger.error(error_msg)
+        raise ValueError(error_msg)
+    seeds = np.random.SeedSequence(seed).spawn(len(startingHours))
+    jobs = [(Path(file_path) / f"{startingHour.strftime('%Y-%m-%dT%H.00')}_logs.csv", startingHour, deltaT,
+             number_of_logs, file_seed, chunk_rows) for startingHour, file_seed in zip(startingHours, seeds)]
+    if workers <= 1:
+        return sum(write_log_file(*job) for job in jobs)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return sum(executor.map(write_log_file, *zip(*jobs)))
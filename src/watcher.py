@@ -0,0 +1,86 @@
+from pathlib import Path
+import ctypes.util
+import logging
+import ctypes
+import select
+import time
+import os
+
+# Set up module-level logger.
+logger = logging.getLogger(__name__)
+#logger.setLevel(logging.DEBUG)
+
+# inotify is only available on Linux; everywhere else the watcher falls back to polling.
+try:
+    _libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+    _inotify_init1 = _libc.inotify_init1
+    _inotify_add_watch = _libc.inotify_add_watch
+    _inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+except (OSError, AttributeError):
+    _inotify_init1 = None
+
+IN_MODIFY: int = 0x00000002
+IN_CLOSE_WRITE: int = 0x00000008
+IN_MOVED_TO: int = 0x00000080
+IN_CREATE: int = 0x00000100
+IN_NONBLOCK: int = 0o4000
+IN_CLOEXEC: int = 0o2000000
+
+class FolderWatcher:
+    """
+    Waits for changes in a folder, using inotify where available and polling otherwise.
+    """
+
+    def __init__(self, folder_path: str, poll_interval: float = 0.5) -> None:
+        """
+        Initialize the watcher.
+
+        Args:
+            folder_path (str): Folder to watch.
+            poll_interval (float): Seconds between two polls when inotify is not available.
+        """
+        self.__folder_path = Path(folder_path)
+        self.__poll_interval = poll_interval
+        self.__fd: int | None = None
+        if _inotify_init1 is not None:
+            fd = _inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd >= 0 and _inotify_add_watch(fd, os.fsencode(self.__folder_path),
+                                              IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE) >= 0:
+                self.__fd = fd
+            else:
+                logger.warning(f"inotify unavailable ({os.strerror(ctypes.get_errno())}), falling back to polling")
+                if fd >= 0:
+                    os.close(fd)
+        logger.info(f"Watching folder {self.__folder_path} using {'inotify' if self.__fd is not None else 'polling'}")
+
+    def wait(self, timeout: float) -> bool:
+        """
+        Block until the folder changes or the timeout expires.
+
+        Args:
+            timeout (float): Maximum number of seconds to wait.
+
+        Returns:
+            bool: True if a change may have happened, False if the timeout expired without events.
+                Polling cannot tell, so it always returns True after sleeping.
+        """
+        if self.__fd is None:
+            time.sleep(min(timeout, self.__poll_interval))
+            return True
+        readable, _, _ = select.select([self.__fd], [], [], max(timeout, 0))
+        if not readable:
+            return False
+        try:
+            while os.read(self.__fd, 64 * 1024):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def close(self) -> None:
+        """
+        Release the inotify file descriptor.
+        """
+        if self.__fd is not None:
+            os.close(self.__fd)
+            self.__fd = None
@@ -0,0 +1,6 @@
+import sys
+import os
+
+# The modules of the handler and of its benchmarks are imported by name, as the scripts do.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'benchmark')))
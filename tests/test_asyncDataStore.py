@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta
+import time
+import pytest
+
+pytest.importorskip("elasticsearch")
+pytest.importorskip("aiohttp")
+from elasticsearch import ApiError
+import fakeElasticsearch
+import asyncDataStore
+import callLog
+
+LATENCY = 0.1
+
+
+def json_logs(count: int) -> list[str]:
+    start = datetime(2025, 1, 1, 10)
+    return [callLog.CallLog(start + timedelta(seconds=i), f"39{i:08d}", "1000", i % 300, 'successfully_completed',
+                            f"ref{i:019d}").to_json()
+            for i in range(count)]
+
+@pytest.fixture
+def server():
+    with fakeElasticsearch.FakeElasticsearch(latency=LATENCY) as fake:
+        yield fake
+
+def open_store(server: fakeElasticsearch.FakeElasticsearch, max_in_flight: int) -> asyncDataStore.AsyncDataStore:
+    store = asyncDataStore.AsyncDataStore(server.address, "calls", bulk_max_docs=10, max_in_flight=max_in_flight)
+    server.max_concurrent = 0
+    return store
+
+
+def test_requests_in_flight_never_exceed_the_window(server):
+    store = open_store(server, max_in_flight=2)
+    with store:
+        store.insert_many(json_logs(60))
+    assert server.bulks == 6
+    assert server.max_concurrent == 2
+    assert server.documents["calls"] == 60
+
+def test_producer_blocks_while_the_window_is_full(server):
+    store = open_store(server, max_in_flight=2)
+    with store:
+        started = time.perf_counter()
+        store.insert_many(json_logs(60))
+        produced = time.perf_counter() - started
+    # 6 requests through 2 slots: the last 2 only start once 4 have completed, 2 latencies later.
+    assert produced >= 2 * LATENCY * 0.9
+    assert store.backpressure_seconds >= LATENCY * 0.9
+
+def test_flush_waits_for_every_request_and_raises_the_failure(server):
+    server.failing_bulks = {2}
+    store = open_store(server, max_in_flight=4)
+    try:
+        store.insert_many(json_logs(40))
+        with pytest.raises(ApiError):
+            store.flush()
+        # The requests sent after the failed one completed before flush() raised.
+        assert server.bulks == 4
+        assert server.documents["calls"] == 30
+        # The failure is not forgotten once raised: later calls cannot report the lost rows as flushed.
+        with pytest.raises(ApiError):
+            store.flush()
+        with pytest.raises(ApiError):
+            store.insert_many(json_logs(1))
+    finally:
+        with pytest.raises(ApiError):
+            store.close()
+    assert server.bulks == 4
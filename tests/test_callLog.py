@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+
+import memoryBench
+import callLog
+
+STATUSES = ('successfully_completed', 'failed_noAnswer', 'interrupted_other')
+
+
+def sample_logs(count: int) -> list[callLog.CallLog]:
+    """
+    Build call logs over one hour, with a few distinct statuses and a string in every string field.
+    """
+    start = datetime(2025, 1, 1, 10)
+    return [callLog.CallLog(start + timedelta(seconds=i % 3600), f"39{i:08d}", f"{i % 9000 + 1000}", i % 300,
+                            STATUSES[i % len(STATUSES)], f"ref{i:019d}")
+            for i in range(count)]
+
+def batch_of(logs: list[callLog.CallLog]) -> callLog.CallLogBatch:
+    batch = callLog.CallLogBatch()
+    for log in logs:
+        batch.append_log(log)
+    return batch
+
+def fields(log: callLog.CallLog) -> tuple:
+    return (log.timestamp, log.caller, log.receiver, log.duration, log.status, log.uniqueCallReference)
+
+
+def test_call_log_has_no_instance_dict():
+    log = sample_logs(1)[0]
+    assert not hasattr(log, '__dict__')
+    with pytest.raises(AttributeError):
+        log.unexpected = 1
+
+def test_batch_bytes_per_record_stays_bounded():
+    logs = sample_logs(50_000)
+    # The string fields are shared with the logs, so only the per-record overhead of each container is measured.
+    slotted = memoryBench.bytes_per_record(lambda: [callLog.CallLog(*fields(log)) for log in logs])
+    columnar = memoryBench.bytes_per_record(lambda: batch_of(logs))
+    assert columnar < 64
+    assert columnar < slotted
+
+def test_iter_round_trips_the_appended_logs():
+    logs = sample_logs(1000)
+    assert [fields(log) for log in batch_of(logs)] == [fields(log) for log in logs]
+
+def test_take_selects_records_in_the_requested_order():
+    logs = sample_logs(100)
+    batch = batch_of(logs)
+    indices = [99, 0, 42, 42, 7]
+    selected = batch.take(indices)
+    assert len(selected) == len(indices)
+    assert [fields(log) for log in selected] == [fields(logs[i]) for i in indices]
+    # The selection shares the status table, appending a known status must not add a code.
+    selected.append_log(logs[1])
+    assert selected.statuses == batch.statuses
+
+def test_to_json_list_matches_call_log_to_json():
+    logs = sample_logs(500)
+    assert batch_of(logs).to_json_list() == [log.to_json() for log in logs]
+
+@pytest.mark.parametrize("timestamp", [
+    datetime(2025, 1, 1, 10, 0, 0, 500000),
+    datetime(2025, 1, 1, 10, tzinfo=timezone.utc),
+    datetime(2025, 1, 1, 10, tzinfo=timezone(timedelta(hours=2))),
+])
+def test_append_refuses_timestamps_it_would_rewrite(timestamp):
+    batch = callLog.CallLogBatch()
+    with pytest.raises(ValueError):
+        batch.append(timestamp, "3900000000", "1000", 10, STATUSES[0], "ref")
+    assert len(batch) == 0
@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta
+import pytest
+import io
+
+import loader
+
+HEADER = b"timestamp,caller,receiver,duration,status,uniqueCallReference\n"
+ROWS = 200
+
+
+@pytest.fixture
+def csv_file(tmp_path):
+    """
+    A CSV file whose every third row has a quoted reference spanning two lines, and an escaped quote every fifth.
+    """
+    start = datetime(2025, 1, 1, 10)
+    lines = [HEADER]
+    for i in range(ROWS):
+        reference = f'"ref{i}\nline two"' if i % 3 == 0 else f'"ref ""{i}"""' if i % 5 == 0 else f"ref{i}"
+        lines.append(f"{(start + timedelta(seconds=i)).isoformat()},39{i:08d},1000,{i},successfully_completed,{reference}\n".encode())
+    path = tmp_path / "2025-01-01T10.00_logs.csv"
+    path.write_bytes(b"".join(lines))
+    return path
+
+def references(logs) -> list[str]:
+    return [log.uniqueCallReference for log in logs]
+
+def expected_references() -> list[str]:
+    return [f"ref{i}\nline two" if i % 3 == 0 else f'ref "{i}"' if i % 5 == 0 else f"ref{i}" for i in range(ROWS)]
+
+
+def test_sequential_reader_keeps_quoted_newlines_in_their_row(csv_file):
+    reader = loader.CsvFileReader(csv_file)
+    assert references(log for batch in reader.batches(64) for log in batch) == expected_references()
+    assert reader.rows == ROWS
+    assert reader.offset == csv_file.stat().st_size
+    assert reader.rejects.rejected == 0
+
+def test_raw_chunks_yield_whole_rows(csv_file):
+    reader = loader.CsvFileReader(csv_file)
+    chunks = list(reader.raw_chunks(7))
+    assert [first_row for _, first_row in chunks] == list(range(1, ROWS + 1, 7))
+    assert sum(len(lines) for lines, _ in chunks) == ROWS == reader.rows
+
+@pytest.mark.parametrize("range_lines", [1, 2, 5, 64])
+def test_byte_ranges_never_split_a_quoted_field(csv_file, range_lines):
+    reader = loader.CsvFileReader(csv_file)
+    ranges = list(reader.ranges(range_lines))
+    assert len(ranges) > 1
+    logs = []
+    for byte_range, first_row in ranges:
+        _, items, _, _, _, rejected, _ = loader.parse_byte_range(csv_file, reader.header, byte_range, first_row,
+                                                                  first_row + len(byte_range) - 1)
+        assert rejected == 0
+        logs.extend(items)
+    assert references(logs) == expected_references()
+    assert reader.rows == ROWS
+
+def test_tail_mode_waits_for_the_end_of_an_open_quoted_field(csv_file):
+    with open(csv_file, 'ab') as file:
+        file.write(b'2025-01-01T11:00:00,3900000000,1000,1,successfully_completed,"half\n')
+    complete_size = csv_file.stat().st_size - len(b'2025-01-01T11:00:00,3900000000,1000,1,successfully_completed,"half\n')
+    sequential = loader.CsvFileReader(csv_file, tail=True)
+    assert len(list(sequential)) == ROWS
+    ranged = loader.CsvFileReader(csv_file, tail=True)
+    list(ranged.ranges(16))
+    for reader in (sequential, ranged):
+        assert (reader.offset, reader.rows, reader.complete) == (complete_size, ROWS, False)
+
+@pytest.mark.parametrize("block_bytes", [1, 40, 1000, 64 * 1024])
+def test_read_records_joins_rows_across_blocks(csv_file, block_bytes):
+    data = csv_file.read_bytes()
+    rows = list(loader.read_records(io.BytesIO(data), block_bytes))
+    assert b"".join(rows) == data
+    assert rows == loader.split_records(data)
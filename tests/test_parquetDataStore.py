@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+import pytest
+
+pq = pytest.importorskip("pyarrow.parquet")
+import parquetDataStore
+import callLog
+
+ROW_GROUP_SIZE = 100
+
+
+def batch_at(start: datetime, count: int) -> callLog.CallLogBatch:
+    batch = callLog.CallLogBatch()
+    for i in range(count):
+        batch.append(start + timedelta(seconds=i), f"39{i:08d}", "1000", i % 300, 'successfully_completed',
+                     f"ref{i:019d}")
+    return batch
+
+def completed_files(path) -> list:
+    return sorted(path.rglob("*.parquet"))
+
+def open_store(path, **kwargs) -> parquetDataStore.ParquetDataStore:
+    return parquetDataStore.ParquetDataStore(str(path), row_group_size=ROW_GROUP_SIZE, compression='none', **kwargs)
+
+
+def test_file_of_the_latest_hour_stays_open_across_flushes(tmp_path):
+    store = open_store(tmp_path)
+    hour = datetime(2025, 1, 1, 10)
+    for i in range(5):
+        store.insert_batch(batch_at(hour + timedelta(minutes=i), 60))
+        store.flush()
+    assert completed_files(tmp_path) == []
+    store.close()
+    files = completed_files(tmp_path)
+    assert len(files) == 1
+    metadata = pq.ParquetFile(files[0]).metadata
+    assert metadata.num_rows == 300
+    # Whole row groups, not one per flush.
+    assert [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)] == [100, 100, 100]
+
+def test_flush_completes_the_hours_before_the_latest_one(tmp_path):
+    store = open_store(tmp_path)
+    store.insert_batch(batch_at(datetime(2025, 1, 1, 10, 59), 60))
+    store.insert_batch(batch_at(datetime(2025, 1, 1, 11), 60))
+    store.flush()
+    files = completed_files(tmp_path)
+    assert [file.parent.name for file in files] == ["hour=10"]
+    assert pq.ParquetFile(files[0]).metadata.num_rows == 60
+    store.close()
+    assert sum(pq.ParquetFile(file).metadata.num_rows for file in completed_files(tmp_path)) == 120
+
+def test_file_is_completed_once_it_holds_max_file_rows(tmp_path):
+    store = open_store(tmp_path, max_file_rows=250)
+    store.insert_batch(batch_at(datetime(2025, 1, 1, 10), 350))
+    files = completed_files(tmp_path)
+    assert len(files) == 1
+    assert pq.ParquetFile(files[0]).metadata.num_rows == 300
+    store.close()
+    assert sorted(pq.ParquetFile(file).metadata.num_rows for file in completed_files(tmp_path)) == [50, 300]
@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta
+import json
+import pytest
+
+pytest.importorskip("elasticsearch")
+import rollupDataStore
+import callLog
+
+
+def batch_of(start: datetime, count: int) -> callLog.CallLogBatch:
+    batch = callLog.CallLogBatch()
+    for i in range(count):
+        batch.append(start + timedelta(seconds=i), f"39{i:08d}", "1000", i % 300, 'successfully_completed',
+                     f"ref{i:019d}")
+    return batch
+
+def status_counts(path) -> dict[str, int]:
+    counts = {}
+    for file in sorted(path.rglob("rollups.ndjson")):
+        for line in file.read_text().splitlines():
+            document = json.loads(line)
+            if document["dimension"] == "status":
+                counts[document["hour"]] = document["count"]
+    return counts
+
+
+def test_flush_adds_runs_covering_the_same_hour(tmp_path):
+    for _ in range(2):
+        with rollupDataStore.RollupDataStore(str(tmp_path)) as store:
+            store.insert_batch(batch_of(datetime(2025, 1, 1, 10), 100))
+    assert status_counts(tmp_path) == {"2025-01-01T10:00:00": 200}
+
+def test_failed_flush_keeps_only_the_hours_not_merged(tmp_path, monkeypatch):
+    store = rollupDataStore.RollupDataStore(str(tmp_path))
+    # 30 calls at 10:59:30, the next 90 in the following hour.
+    store.insert_batch(batch_of(datetime(2025, 1, 1, 10, 59, 30), 120))
+    replace = rollupDataStore.os.replace
+    calls = []
+
+    def fail_second(source, destination):
+        calls.append(destination)
+        if len(calls) == 2:
+            raise OSError("disk full")
+        replace(source, destination)
+
+    monkeypatch.setattr(rollupDataStore.os, "replace", fail_second)
+    with pytest.raises(OSError):
+        store.flush()
+    assert status_counts(tmp_path) == {"2025-01-01T10:00:00": 30}
+    store.insert_batch(batch_of(datetime(2025, 1, 1, 11, 30), 10))
+    store.close()
+    assert status_counts(tmp_path) == {"2025-01-01T10:00:00": 30, "2025-01-01T11:00:00": 100}
+    assert store.rollups_written == 9